@@ -116,7 +116,8 @@ def simple_derivative(x, values):
 def derivative(x, values, derivative_order=1, accuracy_order=4):
 
     """Compute the derivative at the given derivative order and accuracy order. The precision of the
-    Taylor expansion is :math:`\mathcal{O}(dx^{accuracy})`.
+    Taylor expansion is :math:`\mathcal{O}(dx^{accuracy})`.  The sampling must be uniform, a
+    transient waveform can be resampled using :func:`PySpice.Math.Interpolation.resample`.
     """
 
     dx = np.diff(x)
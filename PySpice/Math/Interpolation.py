@@ -0,0 +1,219 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module provides algorithms to resample functions sampled on a non-uniform grid, like the
+waveforms of a transient analysis computed with an adaptive time step, on another grid.
+
+The waveforms of several runs can be resampled at once on a common grid, cf. :func:`resample`.  The
+intervals of the grid points are searched once for all the waveforms sharing the same abscissa.
+
+"""
+
+####################################################################################################
+
+import numpy as np
+
+####################################################################################################
+
+def interval_indexes(x, grid):
+
+    """Return the index *i* of the interval :math:`[x_i, x_{i+1}]` which contains each point of the
+    grid, and a boolean array which is set if the point is within the range of *x*.  The abscissa
+    *x* must be increasing.
+    """
+
+    x = np.asarray(x)
+    grid = np.asarray(grid)
+    if x.size < 2:
+        raise ValueError("The abscissa must have at least two points")
+    indexes = np.clip(np.searchsorted(x, grid, side='right') - 1, 0, x.size - 2)
+    valid = (grid >= x[0]) & (grid <= x[-1])
+    return indexes, valid
+
+####################################################################################################
+
+def _interval_positions(x, grid, indexes):
+
+    x0 = x[indexes]
+    h = x[indexes + 1] - x0
+    return (grid - x0) / h, h
+
+####################################################################################################
+
+def linear_interpolation(x, values, grid, indexes=None):
+
+    """Interpolate linearly the values sampled on *x* at the grid points.  *values* can be an array
+    of shape (..., number of points) for several waveforms sharing the abscissa *x*.  The interval
+    indexes can be passed if they were already computed by :func:`interval_indexes`.
+    """
+
+    x = np.asarray(x)
+    values = np.asarray(values)
+    grid = np.asarray(grid)
+    if indexes is None:
+        indexes = interval_indexes(x, grid)[0]
+    t, h = _interval_positions(x, grid, indexes)
+    y0 = values[..., indexes]
+    y1 = values[..., indexes + 1]
+    return y0 + t*(y1 - y0)
+
+####################################################################################################
+
+def hermite_slopes(x, values):
+
+    """Return the slopes at the sample points estimated by the three-point finite difference on a
+    non-uniform grid, and by the one-sided finite difference at the ends.
+    """
+
+    h = np.diff(x)
+    secants = np.diff(values, axis=-1) / h
+    slopes = np.empty(values.shape, dtype=secants.dtype)
+    slopes[..., 0] = secants[..., 0]
+    slopes[..., -1] = secants[..., -1]
+    slopes[..., 1:-1] = (secants[..., :-1]*h[1:] + secants[..., 1:]*h[:-1]) / (h[:-1] + h[1:])
+    return slopes
+
+####################################################################################################
+
+def cubic_interpolation(x, values, grid, indexes=None):
+
+    """Interpolate the values sampled on *x* at the grid points using a cubic Hermite spline, the
+    slopes are computed by :func:`hermite_slopes`.  The parameters are the same than
+    :func:`linear_interpolation`.
+    """
+
+    x = np.asarray(x)
+    values = np.asarray(values)
+    grid = np.asarray(grid)
+    if indexes is None:
+        indexes = interval_indexes(x, grid)[0]
+    slopes = hermite_slopes(x, values)
+    t, h = _interval_positions(x, grid, indexes)
+    t2 = t*t
+    t3 = t2*t
+    h00 = 2*t3 - 3*t2 + 1
+    h10 = (t3 - 2*t2 + t)*h
+    h01 = 3*t2 - 2*t3
+    h11 = (t3 - t2)*h
+    return (h00*values[..., indexes] + h10*slopes[..., indexes] +
+            h01*values[..., indexes + 1] + h11*slopes[..., indexes + 1])
+
+####################################################################################################
+
+_interpolations = {
+    'linear': linear_interpolation,
+    'cubic': cubic_interpolation,
+}
+
+####################################################################################################
+
+def _group_by_abscissa(abscissas):
+
+    """Return a list of (abscissa, list of waveform indexes) pairs.
+
+    The abscissas are grouped by a hash of their values in a dictionary, thus the cost is linear in
+    the number of waveforms.  An object is only hashed once, it is kept in *groups_by_id* so as its
+    id cannot be reused by a temporary object, like a row of a 2-D array.
+    """
+
+    buckets = {}
+    groups_by_id = {}
+    for i, abscissa in enumerate(abscissas):
+        reference, group = groups_by_id.get(id(abscissa), (None, None))
+        if reference is not abscissa:
+            array = np.asarray(abscissa)
+            bucket = buckets.setdefault((array.shape, array.dtype.str, hash(array.tobytes())), [])
+            # the abscissas of a bucket are compared so as to handle the hash collisions
+            for reference, group in bucket:
+                if np.array_equal(array, reference):
+                    break
+            else:
+                group = []
+                bucket.append((array, group))
+            groups_by_id[id(abscissa)] = (abscissa, group)
+        group.append(i)
+    return [pair for bucket in buckets.values() for pair in bucket]
+
+####################################################################################################
+
+def resample(grid, abscissas, values, method='linear', fill_value=np.nan):
+
+    """Resample waveforms on a common grid and return an array of shape (number of waveforms, grid
+    size).
+
+    *abscissas* is the abscissa shared by all the waveforms, or a sequence of abscissas, one for each
+    waveform.  *values* is an array of shape (number of waveforms, number of points) or a sequence
+    of waveforms, which can have different sizes.  *method* is 'linear' or 'cubic'.  The grid
+    points out of the range of an abscissa are set to *fill_value*, or to the value at the nearest
+    end if it is :obj:`None`.
+
+    The waveforms are grouped by abscissa, thus the interval search and the interpolation are done
+    once for the waveforms which share the same abscissa.  A waveform whose abscissa is the grid is
+    copied.
+    """
+
+    try:
+        interpolation = _interpolations[method]
+    except KeyError:
+        raise ValueError("Invalid interpolation method {}".format(method))
+
+    grid = np.asarray(grid, dtype=np.float64)
+    if isinstance(values, np.ndarray) and values.ndim == 1:
+        values = values[np.newaxis]
+    number_of_waveforms = len(values)
+    if isinstance(abscissas, np.ndarray) and abscissas.ndim == 1:
+        abscissas = [abscissas] * number_of_waveforms
+    elif len(abscissas) != number_of_waveforms:
+        raise ValueError("The number of abscissas doesn't match the number of waveforms")
+
+    groups = _group_by_abscissa(abscissas)
+
+    if any(np.iscomplexobj(waveform) for waveform in values):
+        dtype = np.complex128
+    else:
+        dtype = np.float64
+    array = np.empty((number_of_waveforms, grid.size), dtype=dtype)
+    for abscissa, group in groups:
+        if isinstance(values, np.ndarray):
+            group_values = values[group]
+        else:
+            group_values = np.array([values[i] for i in group])
+        if group_values.shape[-1] != abscissa.size:
+            raise ValueError("The waveforms and the abscissa have different sizes")
+        if abscissa.shape == grid.shape and np.array_equal(abscissa, grid):
+            array[group] = group_values
+        elif method == 'linear' and len(group) == 1 and dtype == np.float64:
+            # the abscissa is not shared, thus a single call to np.interp is faster
+            array[group[0]] = np.interp(grid, abscissa, group_values[0], left=fill_value, right=fill_value)
+        elif fill_value is None:
+            group_grid = np.clip(grid, abscissa[0], abscissa[-1])
+            indexes = interval_indexes(abscissa, group_grid)[0]
+            array[group] = interpolation(abscissa, group_values, group_grid, indexes)
+        else:
+            indexes, valid = interval_indexes(abscissa, grid)
+            array[group] = np.where(valid, interpolation(abscissa, group_values, grid, indexes), fill_value)
+
+    return array
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,377 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements measurements on waveforms, like the *.meas* command of Spice.
+
+A measurement is computed on a waveform, where the abscissa is the :attr:`abscissa` attribute of the
+waveform or the *x* parameter, or on a batch of waveforms stacked in an array of shape (number of
+waveforms, number of points) sharing the same abscissa, for example the waveforms of a Monte Carlo
+analysis::
+
+    rise_time(analysis.out)
+    result = monte_carlo.run()
+    rise_time(result['out'], x=result.abscissa) # array of shape (number of runs,)
+
+The measurements are vectorised along the last axis, the result is a float for a waveform and an
+array for a batch.  A crossing is located by linear interpolation between the samples, a
+measurement which cannot be done, e.g. a missing crossing, is NaN.
+
+"""
+
+####################################################################################################
+
+import numpy as np
+
+####################################################################################################
+
+_directions = ('rise', 'fall', 'cross')
+
+####################################################################################################
+
+def _prepare(waveform, x=None):
+
+    """Return the values and the abscissa as arrays."""
+
+    if x is None:
+        x = getattr(waveform, 'abscissa', None)
+        if x is None:
+            raise ValueError("The abscissa is not defined")
+    y = np.asarray(waveform)
+    x = np.asarray(x, dtype=np.float64)
+    if y.shape[-1] != x.shape[-1]:
+        raise ValueError("The waveform has {} points instead of {}".format(y.shape[-1], x.shape[-1]))
+    if y.shape[-1] < 2:
+        raise ValueError("The waveform must have at least two points")
+    return y, x
+
+####################################################################################################
+
+def _result(value):
+
+    if np.ndim(value) == 0:
+        return float(value)
+    else:
+        return value
+
+####################################################################################################
+
+def _crossings(y, level, direction):
+
+    """Return a boolean array which is set for each interval where *y* crosses *level* in the given
+    direction, the last axis has one item less than *y*.
+
+    """
+
+    if direction not in _directions:
+        raise ValueError("Invalid direction {}".format(direction))
+    delta = y - np.expand_dims(level, -1)
+    below = delta < 0
+    rising = below[..., :-1] & ~below[..., 1:]
+    falling = ~below[..., :-1] & below[..., 1:]
+    if direction == 'rise':
+        return rising
+    elif direction == 'fall':
+        return falling
+    else:
+        return rising | falling
+
+####################################################################################################
+
+def _take(array, indexes):
+
+    """Take the items at *indexes* along the last axis, *array* can be broadcasted."""
+
+    array = np.broadcast_to(array, indexes.shape[:-1] + array.shape[-1:])
+    return np.take_along_axis(array, indexes, axis=-1)
+
+####################################################################################################
+
+def _crossing_interval(crossings, occurrence):
+
+    """Return the index of the interval of the n-th crossing, the last crossing for -1, and a
+    boolean array which is set if the crossing exists.
+
+    """
+
+    counts = np.cumsum(crossings, axis=-1)
+    number_of_crossings = counts[..., -1]
+    if occurrence > 0:
+        rank = np.full(number_of_crossings.shape, occurrence)
+    elif occurrence < 0:
+        rank = number_of_crossings + occurrence + 1
+    else:
+        raise ValueError("The occurrence cannot be 0")
+    valid = (rank >= 1) & (rank <= number_of_crossings)
+    # the first interval where the count reaches the rank
+    index = np.argmax(counts >= np.expand_dims(rank, -1), axis=-1)
+    return index, valid
+
+####################################################################################################
+
+def _interpolate_crossing(y, x, level, index, valid):
+
+    index = np.expand_dims(index, -1)
+    y0 = _take(y, index)[..., 0]
+    y1 = _take(y, index + 1)[..., 0]
+    x0 = _take(x, index)[..., 0]
+    x1 = _take(x, index + 1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+    return np.where(valid, t, np.nan)
+
+####################################################################################################
+
+def _crossing_time(y, x, level, direction='rise', occurrence=1):
+
+    level = np.broadcast_to(np.asarray(level, dtype=np.float64), y.shape[:-1])
+    index, valid = _crossing_interval(_crossings(y, level, direction), occurrence)
+    return _interpolate_crossing(y, x, level, index, valid)
+
+####################################################################################################
+
+def crossing_time(waveform, level, direction='rise', occurrence=1, x=None):
+
+    """Return the abscissa where the waveform crosses *level* for the n-th time, the last time if
+    *occurrence* is -1.  *direction* is 'rise', 'fall' or 'cross' for both.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    return _result(_crossing_time(y, x, level, direction, occurrence))
+
+####################################################################################################
+
+def _states(y, initial=None, final=None):
+
+    """Return the initial and final values, by default the first and the last samples."""
+
+    if initial is None:
+        initial = y[..., 0]
+    if final is None:
+        final = y[..., -1]
+    return np.asarray(initial, dtype=np.float64), np.asarray(final, dtype=np.float64)
+
+####################################################################################################
+
+def _transition_levels(y, low, high, initial, final):
+
+    initial, final = _states(y, initial, final)
+    low_state = np.minimum(initial, final)
+    amplitude = np.abs(final - initial)
+    return low_state + low*amplitude, low_state + high*amplitude
+
+####################################################################################################
+
+def rise_time(waveform, low=.1, high=.9, initial=None, final=None, x=None):
+
+    """Return the time for the first rising edge to go from *low* to *high* fractions of the step
+    from the initial to the final value.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    low_level, high_level = _transition_levels(y, low, high, initial, final)
+    return _result(_crossing_time(y, x, high_level, 'rise') - _crossing_time(y, x, low_level, 'rise'))
+
+####################################################################################################
+
+def fall_time(waveform, low=.1, high=.9, initial=None, final=None, x=None):
+
+    """Return the time for the first falling edge to go from *high* to *low* fractions of the step
+    from the initial to the final value.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    low_level, high_level = _transition_levels(y, low, high, initial, final)
+    return _result(_crossing_time(y, x, low_level, 'fall') - _crossing_time(y, x, high_level, 'fall'))
+
+####################################################################################################
+
+def delay(trigger, target, trigger_level, target_level=None,
+          trigger_direction='rise', target_direction=None, x=None):
+
+    """Return the delay between the first crossing of *trigger_level* by the *trigger* waveform and
+    the first crossing of *target_level* by the *target* waveform.  The target level and direction
+    are those of the trigger by default.
+
+    """
+
+    if target_level is None:
+        target_level = trigger_level
+    if target_direction is None:
+        target_direction = trigger_direction
+    trigger_y, trigger_x = _prepare(trigger, x)
+    target_y, target_x = _prepare(target, x)
+    return _result(_crossing_time(target_y, target_x, target_level, target_direction) -
+                   _crossing_time(trigger_y, trigger_x, trigger_level, trigger_direction))
+
+####################################################################################################
+
+def overshoot(waveform, initial=None, final=None):
+
+    """Return the overshoot in percent of the step from the initial to the final value."""
+
+    y = np.asarray(waveform)
+    initial, final = _states(y, initial, final)
+    step = final - initial
+    peak = np.where(step >= 0, y.max(axis=-1), y.min(axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.maximum((peak - final) / step * 100, 0)
+    return _result(value)
+
+####################################################################################################
+
+def settling_time(waveform, tolerance=.02, initial=None, final=None, start=None, x=None):
+
+    """Return the time after which the waveform stays within *tolerance*, a fraction of the step,
+    around the final value.  The time is measured from *start*, by default the first abscissa, and
+    is resolved to the first sample within the band.  It is NaN if the last sample is outside the
+    band.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    initial, final = _states(y, initial, final)
+    band = tolerance * np.abs(final - initial)
+    outside = np.abs(y - np.expand_dims(final, -1)) > np.expand_dims(band, -1)
+    number_of_points = y.shape[-1]
+    # index of the first sample after the last sample outside the band
+    index = number_of_points - np.argmax(outside[..., ::-1], axis=-1)
+    index = np.where(outside.any(axis=-1), index, 0)
+    valid = index < number_of_points
+    index = np.minimum(index, number_of_points - 1)
+    settled_x = _take(x, np.expand_dims(index, -1))[..., 0]
+    if start is None:
+        start = x[..., 0]
+    return _result(np.where(valid, settled_x - start, np.nan))
+
+####################################################################################################
+
+def _segment_integrals(y, x):
+
+    return (y[..., 1:] + y[..., :-1]) * np.diff(x, axis=-1) / 2
+
+####################################################################################################
+
+def average(waveform, x=None):
+
+    """Return the mean value over the abscissa, using the trapezoidal rule."""
+
+    y, x = _prepare(waveform, x)
+    duration = x[..., -1] - x[..., 0]
+    return _result(_segment_integrals(y, x).sum(axis=-1) / duration)
+
+####################################################################################################
+
+def rms(waveform, x=None):
+
+    """Return the root mean square value over the abscissa, using the trapezoidal rule."""
+
+    y, x = _prepare(waveform, x)
+    duration = x[..., -1] - x[..., 0]
+    return _result(np.sqrt(_segment_integrals(np.abs(y)**2, x).sum(axis=-1) / duration))
+
+####################################################################################################
+
+def peak_to_peak(waveform):
+
+    """Return the difference between the maximum and the minimum."""
+
+    y = np.asarray(waveform)
+    return _result(y.max(axis=-1) - y.min(axis=-1))
+
+####################################################################################################
+
+def _middle_level(y, level):
+
+    if level is None:
+        return (y.max(axis=-1) + y.min(axis=-1)) / 2
+    else:
+        return np.broadcast_to(np.asarray(level, dtype=np.float64), y.shape[:-1])
+
+####################################################################################################
+
+def _periods(y, x, level):
+
+    """Return the interval indexes and the abscissas of the first and the last rising crossings, and
+    the number of periods between them.
+
+    """
+
+    crossings = _crossings(y, level, 'rise')
+    first_index = _crossing_interval(crossings, 1)[0]
+    last_index = _crossing_interval(crossings, -1)[0]
+    number_of_periods = crossings.sum(axis=-1) - 1
+    valid = number_of_periods >= 1
+    first_x = _interpolate_crossing(y, x, level, first_index, valid)
+    last_x = _interpolate_crossing(y, x, level, last_index, valid)
+    return first_index, last_index, first_x, last_x, number_of_periods
+
+####################################################################################################
+
+def frequency(waveform, level=None, x=None):
+
+    """Return the frequency computed from the rising crossings of *level*, by default the middle of
+    the waveform range.  It is NaN if there is less than two crossings.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    level = _middle_level(y, level)
+    first_index, last_index, first_x, last_x, number_of_periods = _periods(y, x, level)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _result(number_of_periods / (last_x - first_x))
+
+####################################################################################################
+
+def duty_cycle(waveform, level=None, x=None):
+
+    """Return the fraction of the period where the waveform is above *level*, by default the middle
+    of the waveform range.  It is computed over the whole periods between the first and the last
+    rising crossings.  It is NaN if there is less than two crossings.
+
+    """
+
+    y, x = _prepare(waveform, x)
+    level = _middle_level(y, level)
+    first_index, last_index, first_x, last_x, number_of_periods = _periods(y, x, level)
+
+    # fraction of each interval above the level, using a linear interpolation
+    delta = y - np.expand_dims(level, -1)
+    delta0 = delta[..., :-1]
+    delta1 = delta[..., 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(delta0 >= 0,
+                            np.where(delta1 >= 0, 1., delta0 / (delta0 - delta1)),
+                            np.where(delta1 >= 0, delta1 / (delta1 - delta0), 0.))
+    # the part above the level of a rising crossing interval is after the crossing
+    interval_index = np.arange(y.shape[-1] - 1)
+    window = ((interval_index >= np.expand_dims(first_index, -1)) &
+              (interval_index < np.expand_dims(last_index, -1)))
+    high_time = (fraction * np.diff(x, axis=-1) * window).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _result(high_time / (last_x - first_x))
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
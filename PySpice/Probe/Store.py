@@ -0,0 +1,224 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements a HDF5 store for the analyses, it requires the *h5py* module.
+
+An analysis is saved in a file by::
+
+    analysis.save('analysis.h5', desk=str(simulator), metadata=dict(run=123))
+
+and loaded by::
+
+    analysis = Analysis.load('analysis.h5')
+    analysis.desk
+    analysis.metadata['run']
+
+The layout of the file is::
+
+    /                 attributes: analysis class and desk
+    /metadata         attributes: metadata
+    /abscissa         time, frequency or sweep values
+    /nodes/{name}     attributes: name, unit, title and abscissa
+    /branches/{name}
+    /elements/{name}
+
+Each waveform is a chunked dataset compressed with gzip.  Its abscissa attribute is the path of the
+abscissa dataset, if the waveform is defined on the abscissa of the analysis.
+
+By default an analysis is loaded lazily: a waveform is read from its dataset at the first access,
+and the file stays open until the analysis is closed::
+
+    with Analysis.load('analysis.h5') as analysis:
+        out = analysis.out
+
+"""
+
+####################################################################################################
+
+from collections import OrderedDict
+import logging
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+####################################################################################################
+
+from .WaveForm import (OperatingPoint, SensitivityAnalysis,
+                       DcAnalysis, AcAnalysis, TransientAnalysis,
+                       LazyWaveFormDict, WaveForm)
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+_analysis_classes = {cls.__name__:cls for cls in (OperatingPoint, SensitivityAnalysis,
+                                                    DcAnalysis, AcAnalysis, TransientAnalysis)}
+
+_waveform_groups = ('nodes', 'branches', 'elements')
+
+ABSCISSA_PATH = '/abscissa'
+
+####################################################################################################
+
+def _import_h5py():
+
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("The h5py module is required to save and load analyses")
+    return h5py
+
+####################################################################################################
+
+def _write_waveform(group, key, waveform, compression):
+
+    data = np.asarray(waveform)
+    if data.size > 1:
+        dataset = group.create_dataset(key, data=data, chunks=True,
+                                       compression=compression, shuffle=compression is not None)
+    else:
+        dataset = group.create_dataset(key, data=data)
+    dataset.attrs['name'] = waveform.name
+    dataset.attrs['unit'] = waveform.unit
+    if waveform.title is not None:
+        dataset.attrs['title'] = str(waveform.title)
+    return dataset
+
+####################################################################################################
+
+def _read_waveform(dataset, abscissa=None):
+
+    attributes = dataset.attrs
+    if 'abscissa' not in attributes:
+        abscissa = None
+    return WaveForm(attributes['name'], attributes['unit'], dataset[()],
+                    title=attributes.get('title', None), abscissa=abscissa)
+
+####################################################################################################
+
+def save_analysis(analysis, path, desk=None, metadata=None, compression='gzip'):
+
+    """Save the analysis in the HDF5 file *path*."""
+
+    h5py = _import_h5py()
+
+    with h5py.File(path, 'w') as h5_file:
+        h5_file.attrs['analysis'] = type(analysis).__name__
+        if desk is not None:
+            h5_file.attrs['desk'] = str(desk)
+        metadata_group = h5_file.create_group('metadata')
+        if metadata is not None:
+            for key, value in metadata.items():
+                metadata_group.attrs[key] = value
+
+        abscissa = None
+        if analysis._abscissa_name is not None:
+            abscissa = getattr(analysis, analysis._abscissa_name)
+            _write_waveform(h5_file, ABSCISSA_PATH[1:], abscissa, compression)
+
+        for group_name in _waveform_groups:
+            group = h5_file.create_group(group_name, track_order=True)
+            for waveform in getattr(analysis, group_name).values():
+                dataset = _write_waveform(group, quote(waveform.name, safe=''), waveform, compression)
+                if waveform.abscissa is not None:
+                    if waveform.abscissa is abscissa:
+                        dataset.attrs['abscissa'] = ABSCISSA_PATH
+                    else:
+                        _module_logger.warning("The abscissa of {} is not saved".format(waveform.name))
+
+####################################################################################################
+
+class WaveFormDataSets(LazyWaveFormDict):
+
+    """This class implements a dictionary of waveforms which are read from the datasets of a HDF5
+    group at their first access.
+
+    """
+
+    ##############################################
+
+    def __init__(self, group, abscissa=None):
+
+        super().__init__((unquote(key), key) for key in group)
+        self._group = group
+        self._abscissa = abscissa
+
+    ##############################################
+
+    def _make_waveform(self, name, key):
+
+        if not self._group.id.valid:
+            raise NameError("The file of the analysis is closed, cannot read {}".format(name))
+        return _read_waveform(self._group[key], self._abscissa)
+
+####################################################################################################
+
+def load_analysis(path, lazy=True):
+
+    """Load an analysis from the HDF5 file *path*, the waveforms are read at their first access if
+    *lazy* is set.
+
+    """
+
+    h5py = _import_h5py()
+
+    h5_file = h5py.File(path, 'r')
+    try:
+        analysis_class = _analysis_classes[h5_file.attrs['analysis']]
+        if ABSCISSA_PATH in h5_file:
+            abscissa = _read_waveform(h5_file[ABSCISSA_PATH])
+        else:
+            abscissa = None
+
+        # the constructors of the analyses differ, thus the attributes are set directly
+        analysis = analysis_class.__new__(analysis_class)
+        for group_name in _waveform_groups:
+            group = h5_file[group_name]
+            if lazy:
+                waveforms = WaveFormDataSets(group, abscissa)
+            else:
+                waveforms = OrderedDict()
+                for dataset in group.values():
+                    waveform = _read_waveform(dataset, abscissa)
+                    waveforms[waveform.name] = waveform
+            setattr(analysis, group_name, waveforms)
+        if analysis_class._abscissa_name is not None:
+            setattr(analysis, '_' + analysis_class._abscissa_name, abscissa)
+
+        analysis.desk = h5_file.attrs.get('desk', None)
+        analysis.metadata = dict(h5_file['metadata'].attrs)
+    except BaseException:
+        h5_file.close()
+        raise
+
+    if lazy:
+        analysis._file = h5_file
+    else:
+        h5_file.close()
+
+    return analysis
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
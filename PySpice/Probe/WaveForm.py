@@ -60,10 +60,17 @@
 
 ####################################################################################################
 
+from collections import OrderedDict
+from collections.abc import Mapping
+
 import numpy as np
 
 ####################################################################################################
 
+from ..Math.Interpolation import resample
+
+####################################################################################################
+
 class WaveForm(np.ndarray):
 
     ##############################################
@@ -93,6 +100,22 @@ class WaveForm(np.ndarray):
 
     ##############################################
 
+    def __reduce__(self):
+
+        # ndarray only pickles the array, thus append the attributes to the state
+        reconstruct, arguments, state = super().__reduce__()
+        return reconstruct, arguments, (state, self.name, self.unit, self.title, self.abscissa)
+
+    ##############################################
+
+    def __setstate__(self, state):
+
+        if isinstance(state[0], tuple):
+            state, self.name, self.unit, self.title, self.abscissa = state
+        super().__setstate__(state)
+
+    ##############################################
+
     def __repr__(self):
 
         return 'variable {self.name} [{self.unit}]'.format(self=self)
@@ -112,25 +135,183 @@ class WaveForm(np.ndarray):
 
         return super().__repr__()
 
+    ##############################################
+
+    def resample(self, grid, method='linear', fill_value=np.nan):
+
+        """Return the waveform resampled on the grid, whose abscissa is the grid.  *method* is
+        'linear' or 'cubic', cf. :func:`PySpice.Math.Interpolation.resample`.
+
+        """
+
+        if self.abscissa is None:
+            raise ValueError("The abscissa of {} is not defined".format(self.name))
+        if not isinstance(grid, WaveForm):
+            abscissa = self.abscissa
+            grid = WaveForm(getattr(abscissa, 'name', 'abscissa'), getattr(abscissa, 'unit', None), grid)
+        values = resample(grid, np.asarray(self.abscissa), np.asarray(self), method, fill_value)[0]
+        return WaveForm(self.name, self.unit, values, title=self.title, abscissa=grid)
+
+####################################################################################################
+
+class LazyWaveFormDict(Mapping):
+
+    """This class implements a read-only dictionary of waveforms which are created at their first
+    access.
+
+    The index maps a waveform name to a key, which is passed to :meth:`_make_waveform` in
+    subclasses.  The created waveforms are cached.
+
+    """
+
+    ##############################################
+
+    def __init__(self, index):
+
+        self._index = OrderedDict(index)
+        self._waveforms = {}
+
+    ##############################################
+
+    def _make_waveform(self, name, key):
+        raise NotImplementedError
+
+    ##############################################
+
+    def __getitem__(self, name):
+
+        try:
+            return self._waveforms[name]
+        except KeyError:
+            pass
+        waveform = self._make_waveform(name, self._index[name])
+        self._waveforms[name] = waveform
+        return waveform
+
+    ##############################################
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    ##############################################
+
+    def copy(self):
+
+        """Return a dictionary of all the waveforms."""
+
+        return OrderedDict(self.items())
+
+####################################################################################################
+
+class WaveFormArray(LazyWaveFormDict):
+
+    """This class implements a dictionary of waveforms stored in the rows of a 2-D array, of shape
+    (number of rows, number of points).
+
+    A waveform is a view on its row, thus the waveforms are not copied.  The array can contain other
+    rows, for example the array of a raw file is the transposed (points, variables) matrix, and
+    *rows* gives the row of each waveform.  The rows are gathered in a new array only on request,
+    then an operation over all the waveforms is a single Numpy call, for example::
+
+        analysis.nodes.to_array().max(axis=1)
+
+    Public Attributes:
+
+      :attr:`array`
+
+      :attr:`index`
+        dictionary which maps a waveform name to its row
+
+    """
+
+    ##############################################
+
+    def __init__(self, array, names, units, abscissa=None, rows=None):
+
+        if rows is None:
+            if len(array) != len(names):
+                raise ValueError("Expected {} rows instead of {}".format(len(names), len(array)))
+            rows = range(len(names))
+        elif len(rows) != len(names):
+            raise ValueError("Expected {} rows instead of {}".format(len(names), len(rows)))
+        super().__init__(zip(names, rows))
+        self.array = array
+        self._units = dict(zip(names, units))
+        self._abscissa = abscissa
+
+    ##############################################
+
+    @property
+    def index(self):
+        return self._index
+
+    ##############################################
+
+    def _make_waveform(self, name, row):
+        return WaveForm(name, self._units[name], self.array[row], abscissa=self._abscissa)
+
+    ##############################################
+
+    def to_array(self, names=None):
+
+        """Return the rows of the given waveforms, by default all the waveforms, as a new array."""
+
+        if names is None:
+            names = self._index
+        return self.array[[self._index[name] for name in names]]
+
 ####################################################################################################
 
 class Analysis:
 
+    _accessed_names = None
+    _abscissa_name = None # e.g. 'time' for a transient analysis
+    _file = None # file of an analysis loaded lazily
+
     ##############################################
 
     def __init__(self, nodes=(), branches=(), elements=()):
 
+        """The waveforms are given as an iterable of waveforms or a dictionary, like a
+        :class:`WaveFormArray` instance.
+        """
+
         # Fixme: branches are elements in fact, and elements is not yet supported ...
 
-        # Fixme: to func?
-        self.nodes = {waveform.name:waveform for waveform in nodes}
-        self.branches = {waveform.name:waveform for waveform in branches}
-        self.elements = {waveform.name:waveform for waveform in elements}
+        self.nodes = self._to_dict(nodes)
+        self.branches = self._to_dict(branches)
+        self.elements = self._to_dict(elements)
+
+    ##############################################
+
+    @staticmethod
+    def _to_dict(waveforms):
+
+        if isinstance(waveforms, Mapping):
+            return waveforms
+        else:
+            return {waveform.name:waveform for waveform in waveforms}
+
+    ##############################################
+
+    def record_accesses(self, names):
+
+        """Add the name of each waveform which is accessed by name to the set *names*."""
+
+        self._accessed_names = names
 
     ##############################################
 
     def __getitem__(self, name):
 
+        if self._accessed_names is not None:
+            self._accessed_names.add(name)
         if name in self.nodes:
             return self.nodes[name]
         elif name in self.branches:
@@ -144,11 +325,67 @@ class Analysis:
 
     def __getattr__(self, name):
 
+        # private and special attributes are not waveforms, e.g. __setstate__ for pickle
+        if name.startswith('_'):
+            raise AttributeError(name)
         try:
             return self.__getitem__(name)
         except IndexError:
             raise AttributeError(name)
 
+    ##############################################
+
+    def save(self, path, desk=None, metadata=None):
+
+        """Save the analysis in a HDF5 file, cf. :mod:`PySpice.Probe.Store`.
+
+        *desk* is the simulated desk and *metadata* a dictionary of strings or numbers.
+
+        """
+
+        # imported here since the store imports this module
+        from .Store import save_analysis
+        save_analysis(self, path, desk, metadata)
+
+    ##############################################
+
+    @staticmethod
+    def load(path, lazy=True):
+
+        """Load an analysis from a HDF5 file, cf. :mod:`PySpice.Probe.Store`.
+
+        If *lazy* is set, a waveform is read from the file at its first access and the file stays
+        open until :meth:`close` is called, the analysis is also a context manager::
+
+            with Analysis.load('analysis.h5') as analysis:
+                out = analysis.out
+
+        """
+
+        from .Store import load_analysis
+        return load_analysis(path, lazy)
+
+    ##############################################
+
+    def close(self):
+
+        """Close the file of an analysis loaded lazily, the waveforms which were not yet read cannot
+        be accessed afterwards.
+
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    ##############################################
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 ####################################################################################################
 
 class OperatingPoint(Analysis):
@@ -182,6 +419,10 @@ class DcAnalysis(Analysis):
 
     ##############################################
 
+    _abscissa_name = 'v_sweep'
+
+    ##############################################
+
     # Fixme: can be current sweep too
 
     def __init__(self, v_sweep, nodes, branches):
@@ -200,6 +441,8 @@ class DcAnalysis(Analysis):
 
 class AcAnalysis(Analysis):
 
+    _abscissa_name = 'frequency'
+
     ##############################################
 
     def __init__(self, frequency, nodes, branches):
@@ -218,6 +461,8 @@ class AcAnalysis(Analysis):
 
 class TransientAnalysis(Analysis):
 
+    _abscissa_name = 'time'
+
     ##############################################
 
     def __init__(self, time, nodes, branches):
@@ -0,0 +1,394 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements a content-addressed cache for simulation outputs.
+
+A simulation output is identified by a hash of the ngspice version, the analysis and the desk, cf.
+:meth:`SimulationCache.key`.  The cache has two tiers:
+
+ * an in-memory LRU cache limited by a byte budget,
+ * an optional on-disk store, where each entry is a compressed file and a metadata file, which is
+   written after the data so as an entry is complete if its metadata file exists.
+
+The cached objects are :obj:`PySpice.Spice.RawFile.RawFile` instances, they are stored in pickled
+form so as to return a fresh copy for each hit.  Identical requests that are in flight share the
+same simulation, cf. :meth:`SimulationCache.get_or_run` and :meth:`SimulationCache.get_or_run_async`.
+
+The lock of the cache only protects the in-memory structures, the compression and the file I/O are
+done outside the lock.
+
+Example of usage::
+
+    cache = SimulationCache(memory_budget=512*1024**2, directory='/path/to/cache')
+    simulator = circuit.simulator(cache=cache)
+
+"""
+
+####################################################################################################
+
+from collections import OrderedDict
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class SimulationCache:
+
+    """This class implements a two-tier cache for simulation outputs.
+
+    Public Attributes:
+
+      :attr:`hits`
+        number of hits
+
+      :attr:`misses`
+        number of misses
+
+    """
+
+    _logger = _module_logger.getChild('SimulationCache')
+
+    DATA_EXTENSION = '.pickle.z'
+    METADATA_EXTENSION = '.json'
+
+    ##############################################
+
+    def __init__(self, memory_budget=256*1024**2, directory=None, compression_level=6):
+
+        self._memory_budget = int(memory_budget)
+        self._memory_size = 0
+        self._memory_cache = OrderedDict()
+
+        self._directory = directory
+        self._compression_level = compression_level
+        self._index = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._read_index()
+
+        self._lock = threading.RLock()
+        self._in_flight = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    ##############################################
+
+    @property
+    def memory_budget(self):
+        return self._memory_budget
+
+    @property
+    def memory_size(self):
+        return self._memory_size
+
+    @property
+    def directory(self):
+        return self._directory
+
+    ##############################################
+
+    @staticmethod
+    def key(*parts):
+
+        """Return the key for the given parts, e.g. ngspice version, analysis and desk."""
+
+        sha = hashlib.sha256()
+        for part in parts:
+            sha.update(str(part).encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    ##############################################
+
+    def _entry_path(self, key):
+        return os.path.join(self._directory, key + self.DATA_EXTENSION)
+
+    def _metadata_path(self, key):
+        return os.path.join(self._directory, key + self.METADATA_EXTENSION)
+
+    ##############################################
+
+    def _read_index(self):
+
+        for filename in os.listdir(self._directory):
+            if filename.endswith(self.METADATA_EXTENSION):
+                key = filename[:-len(self.METADATA_EXTENSION)]
+                try:
+                    with open(self._metadata_path(key)) as f:
+                        self._index[key] = json.load(f)
+                except (OSError, ValueError):
+                    self._logger.warning('Cannot read cache metadata {}'.format(key))
+
+    ##############################################
+
+    @staticmethod
+    def _write_file(path, data, mode='wb'):
+
+        # write then rename so as the file is never truncated, the temporary file name is unique
+        # since the same entry can be written by several threads
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    ##############################################
+
+    def _put_in_memory(self, key, data):
+
+        size = len(data)
+        if size > self._memory_budget:
+            return
+        if key in self._memory_cache:
+            self._memory_size -= len(self._memory_cache.pop(key))
+        self._memory_cache[key] = data
+        self._memory_size += size
+        while self._memory_size > self._memory_budget:
+            old_key, old_data = self._memory_cache.popitem(last=False)
+            self._memory_size -= len(old_data)
+            self._logger.debug('Evict {}'.format(old_key))
+
+    ##############################################
+
+    def _get_from_memory(self, key):
+
+        with self._lock:
+            data = self._memory_cache.get(key, None)
+            if data is not None:
+                self._memory_cache.move_to_end(key)
+            return data
+
+    ##############################################
+
+    def _get_pickle(self, key):
+
+        data = self._get_from_memory(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            on_disk = self._directory is not None and key in self._index
+        if not on_disk:
+            return None
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            self._logger.warning('Cannot read cache entry {}'.format(key))
+            with self._lock:
+                self._index.pop(key, None)
+            return None
+        with self._lock:
+            self._put_in_memory(key, data)
+        return data
+
+    ##############################################
+
+    def _put_pickle(self, key, data, metadata=None):
+
+        with self._lock:
+            self._put_in_memory(key, data)
+        if self._directory is not None:
+            entry = dict(size=len(data), time=time.time())
+            if metadata is not None:
+                entry.update(metadata)
+            self._write_file(self._entry_path(key), zlib.compress(data, self._compression_level))
+            self._write_file(self._metadata_path(key), json.dumps(entry), mode='w')
+            with self._lock:
+                self._index[key] = entry
+
+    ##############################################
+
+    def __contains__(self, key):
+
+        with self._lock:
+            return key in self._memory_cache or key in self._index
+
+    ##############################################
+
+    def get(self, key, count_miss=False):
+
+        """Return the object for the given key or :obj:`None`, a miss is only counted if
+        *count_miss* is set.
+
+        """
+
+        data = self._get_pickle(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            return pickle.loads(data)
+        else:
+            if count_miss:
+                with self._lock:
+                    self.misses += 1
+            return None
+
+    ##############################################
+
+    def put(self, key, obj, metadata=None):
+
+        """Store the object for the given key, *metadata* is a dictionary which is recorded in the
+        metadata file of the entry.
+
+        """
+
+        self._put_pickle(key, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), metadata)
+
+    ##############################################
+
+    def _lookup(self, key):
+
+        """Return a (data, future, owner) tuple: the pickled data in case of hit, else the future of
+        the in-flight request and if the caller owns it, i.e. must run the simulation.
+
+        """
+
+        data = self._get_pickle(key)
+        with self._lock:
+            if data is None:
+                # the entry could be put since the look up
+                data = self._memory_cache.get(key, None)
+            if data is not None:
+                self.hits += 1
+                return data, None, False
+            future = self._in_flight.get(key, None)
+            if future is None:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+                self.misses += 1
+                return None, future, True
+            else:
+                self.hits += 1
+                return None, future, False
+
+    ##############################################
+
+    def get_or_run(self, key, function, metadata=None):
+
+        """Return the object for the given key, call *function* to compute it in case of miss.
+
+        Concurrent calls for the same key share the same call to *function*.
+
+        """
+
+        data, future, owner = self._lookup(key)
+        if data is not None:
+            return pickle.loads(data)
+
+        if owner:
+            try:
+                obj = function()
+            except BaseException as exception:
+                self._finish(key, future, exception=exception)
+                raise
+            self._finish(key, future, obj, metadata=metadata)
+            return obj
+        else:
+            return pickle.loads(future.result())
+
+    ##############################################
+
+    async def get_or_run_async(self, key, coroutine_function, metadata=None):
+
+        """Asyncio variant of :meth:`get_or_run`, *coroutine_function* returns a coroutine.  The file
+        I/O is done in the default executor of the event loop.
+
+        """
+
+        loop = asyncio.get_running_loop()
+        data, future, owner = await loop.run_in_executor(None, self._lookup, key)
+        if data is not None:
+            return pickle.loads(data)
+
+        if owner:
+            try:
+                obj = await coroutine_function()
+            except BaseException as exception:
+                self._finish(key, future, exception=exception)
+                raise
+            await loop.run_in_executor(None, lambda: self._finish(key, future, obj, metadata=metadata))
+            return obj
+        else:
+            return pickle.loads(await asyncio.wrap_future(future))
+
+    ##############################################
+
+    def _finish(self, key, future, obj=None, exception=None, metadata=None):
+
+        """Store the object of an in-flight request and wake up the waiting requests."""
+
+        try:
+            if exception is None:
+                try:
+                    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+                except BaseException as pickle_exception:
+                    future.set_exception(pickle_exception)
+                    raise
+                # a store error, like a full disk, must not fail the simulation
+                try:
+                    self._put_pickle(key, data, metadata)
+                except Exception:
+                    self._logger.exception('Cannot store cache entry {}'.format(key))
+                future.set_result(data)
+            else:
+                future.set_exception(exception)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    ##############################################
+
+    def clear(self, disk=False):
+
+        """Clear the memory cache and also the on-disk store if *disk* is set."""
+
+        with self._lock:
+            self._memory_cache.clear()
+            self._memory_size = 0
+            keys = []
+            if disk and self._directory is not None:
+                keys = list(self._index)
+                self._index.clear()
+        for key in keys:
+            # the metadata first, so as an entry is never seen without its data
+            for path in (self._metadata_path(key), self._entry_path(key)):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
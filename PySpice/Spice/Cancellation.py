@@ -0,0 +1,185 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the timeout and cancellation of simulations.
+
+A :class:`CancellationToken` is passed to a simulation, for example::
+
+    token = CancellationToken()
+    # in another thread
+    token.cancel()
+
+    analysis = simulator.transient(step_time=micro(1), end_time=milli(1),
+                                   timeout=60, cancellation_token=token)
+
+The simulation raises :exc:`SimulationTimeout` if it runs longer than the timeout, and
+:exc:`SimulationCancelled` if the token is cancelled.  In both cases the ngspice subprocess is
+killed, or the background thread of the shared library is halted.
+
+"""
+
+####################################################################################################
+
+import contextlib
+import logging
+import threading
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class SimulationTimeout(NameError):
+    """Exception raised when a simulation runs longer than its timeout."""
+    pass
+
+class SimulationCancelled(NameError):
+    """Exception raised when a simulation is cancelled."""
+    pass
+
+####################################################################################################
+
+class CancellationToken:
+
+    """This class implements a thread safe cancellation token.
+
+    The callbacks registered on the token are called when the token is cancelled, from the
+    cancelling thread.
+
+    """
+
+    _logger = _module_logger.getChild('CancellationToken')
+
+    ##############################################
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks = []
+        self._parent = None
+
+    ##############################################
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    ##############################################
+
+    def cancel(self):
+
+        """Cancel the token and call the callbacks."""
+
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                self._logger.exception("Cancellation callback failed")
+
+        self.release()
+
+    ##############################################
+
+    def register(self, callback):
+
+        """Register a callback, it is called immediately if the token is already cancelled."""
+
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    ##############################################
+
+    def unregister(self, callback):
+
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    ##############################################
+
+    def raise_if_cancelled(self):
+
+        if self._cancelled:
+            raise SimulationCancelled("Simulation was cancelled")
+
+    ##############################################
+
+    def child(self):
+
+        """Return a new token which is cancelled when this token is cancelled.
+
+        The child is registered on this token until it is cancelled or released, cf. :meth:`release`.
+
+        """
+
+        token = CancellationToken()
+        token._parent = self
+        self.register(token.cancel)
+        return token
+
+    ##############################################
+
+    def release(self):
+
+        """Unregister a child token from its parent, it must be called when the operation
+        associated to the child is finished, else a long-lived parent keeps the child alive.
+
+        """
+
+        parent, self._parent = self._parent, None
+        if parent is not None:
+            parent.unregister(self.cancel)
+
+####################################################################################################
+
+@contextlib.contextmanager
+def registered(cancellation_token, callback):
+
+    """Context manager which registers the callback on the token for the duration of the block, the
+    token can be :obj:`None`.
+
+    """
+
+    if cancellation_token is None:
+        yield
+    else:
+        cancellation_token.register(callback)
+        try:
+            yield
+        finally:
+            cancellation_token.unregister(callback)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -74,6 +74,7 @@ class ParameterDescriptor:
 
     def __set__(self, instance, value):
         setattr(instance, '_' + self._attribute_name, value)
+        instance.parameter_modified(self)
 
     ##############################################
 
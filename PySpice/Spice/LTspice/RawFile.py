@@ -0,0 +1,327 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements a reader for the raw files written by LTspice.
+
+The header of a LTspice raw file is encoded in UTF-16, for example::
+
+    Title: * circuit.asc
+    Date: Thu Jun  4 23:40:58 2015
+    Plotname: Transient Analysis
+    Flags: real forward
+    No. Variables: 3
+    No. Points:          1234
+    Offset:   0.0000000000000000e+000
+    Command: Linear Technology Corporation LTspice XVII
+    Variables:
+            0       time    time
+            1       V(out)  voltage
+            2       I(R1)   device_current
+    Binary:
+
+The binary data follows the header.  For a real plot, the first variable is written as a double and
+the other variables as a float, or as a double if the flags contain *double*.  For a complex plot,
+all the variables are written as a pair of doubles.
+
+The values are written point by point, or variable by variable if the flags contain *fastaccess*.
+In both cases, the variables are read as views on a memory map of the file, thus only the pages of
+the accessed variables are read.  The time is the exception: LTspice uses the sign bit to flag
+compressed points, thus its absolute value is copied.
+
+The steps of a stepped simulation are concatenated in the same plot.
+
+"""
+
+####################################################################################################
+
+from collections import OrderedDict
+import logging
+import re
+
+import numpy as np
+
+####################################################################################################
+
+from ...Probe.WaveForm import AcAnalysis, TransientAnalysis, WaveForm
+from ..RawFile import RawFile as NgSpiceRawFile, map_raw_file
+from ..RawFile import _header_field_re, _variables_line_re, _variable_line_re
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+_probe_re = re.compile(r'^([VI])\((.+)\)$', re.I)
+
+####################################################################################################
+
+class Variable:
+
+    """This class implements a variable of a LTspice raw file.
+
+    Public Attributes:
+
+      :attr:`index`
+        index in the raw file
+
+      :attr:`name`
+        e.g. V(out), I(R1)
+
+      :attr:`unit`
+        e.g. voltage, device_current
+
+      :attr:`data`
+
+    """
+
+    ##############################################
+
+    def __init__(self, index, name, unit):
+
+        self.index = int(index)
+        self.name = str(name)
+        self.unit = str(unit)
+        self.data = None
+
+    ##############################################
+
+    def __repr__(self):
+        return 'variable[{self.index}]: {self.name} [{self.unit}]'.format(self=self)
+
+    ##############################################
+
+    @property
+    def probe_type(self):
+
+        """Return 'v' for a node voltage, 'i' for a current, else :obj:`None`."""
+
+        match = _probe_re.match(self.name)
+        if match is not None:
+            return match.group(1).lower()
+        else:
+            return None
+
+    ##############################################
+
+    @property
+    def simplified_name(self):
+
+        match = _probe_re.match(self.name)
+        if match is not None:
+            return match.group(2)
+        else:
+            return self.name
+
+    ##############################################
+
+    def to_waveform(self, abscissa=None, to_real=False):
+
+        """ Return a :obj:`PySpice.Probe.WaveForm` instance. """
+
+        data = self.data
+        if to_real:
+            data = data.real
+        return WaveForm(self.simplified_name, self.unit, data, abscissa=abscissa)
+
+####################################################################################################
+
+class RawFile:
+
+    """This class reads a LTspice raw file.
+
+    Public Attributes:
+
+      :attr:`command`
+
+      :attr:`date`
+
+      :attr:`flags`
+        list of flags, e.g. ['real', 'forward', 'fastaccess']
+
+      :attr:`number_of_points`
+
+      :attr:`number_of_variables`
+
+      :attr:`plot_name`
+        Transient Analysis, AC Analysis, ...
+
+      :attr:`title`
+
+      :attr:`variables`
+        ordered dictionary of :class:`Variable` instances
+
+    """
+
+    _logger = _module_logger.getChild('RawFile')
+
+    ##############################################
+
+    def __init__(self, data):
+
+        """*data* is a bytes object or a memory map, cf. :meth:`from_file`."""
+
+        data_offset = self._read_header(data)
+        self._read_variable_data(data, data_offset)
+
+    ##############################################
+
+    @classmethod
+    def from_file(cls, path):
+
+        """Read a raw file using a memory map, cf. :func:`PySpice.Spice.RawFile.map_raw_file`."""
+
+        return cls(map_raw_file(path))
+
+    ##############################################
+
+    @staticmethod
+    def _encoding(data):
+
+        # the header starts with "Title:", an ASCII character is followed by a null byte in UTF-16
+        if len(data) > 1 and data[1] == 0:
+            return 'utf-16-le'
+        else:
+            return 'latin-1'
+
+    ##############################################
+
+    def _read_header(self, data):
+
+        """ Parse the header and return the offset of the data """
+
+        encoding = self._encoding(data)
+        location = NgSpiceRawFile._find(data, 'Binary:\n'.encode(encoding))
+        if location < 0:
+            if NgSpiceRawFile._find(data, 'Values:\n'.encode(encoding)) >= 0:
+                raise NotImplementedError("ASCII LTspice raw files are not supported")
+            raise NameError('Cannot locate binary data')
+        data_offset = location + len('Binary:\n'.encode(encoding))
+        header = bytes(data[:location]).decode(encoding)
+
+        match = _variables_line_re.search(header)
+        if match is None:
+            raise NameError("Cannot locate the variables in the header")
+        field_header, variable_header = header[:match.start()], header[match.end():]
+
+        fields = {}
+        for label, value in _header_field_re.findall(field_header):
+            fields.setdefault(label, value)
+        for label in ('Title', 'Plotname', 'Flags', 'No. Variables', 'No. Points'):
+            if label not in fields:
+                raise NameError("Missing header field {}".format(label))
+        self.title = fields['Title']
+        self.date = fields.get('Date', None)
+        self.command = fields.get('Command', None)
+        self.plot_name = fields['Plotname']
+        self.flags = fields['Flags'].split()
+        self.number_of_variables = int(fields['No. Variables'])
+        self.number_of_points = int(fields['No. Points'])
+
+        self.variables = OrderedDict()
+        for index, name, unit in _variable_line_re.findall(variable_header):
+            self.variables[name] = Variable(index, name, unit)
+        if len(self.variables) != self.number_of_variables:
+            raise NameError("Expected {} variables instead of {}".format(self.number_of_variables,
+                                                                         len(self.variables)))
+
+        return data_offset
+
+    ##############################################
+
+    def _dtypes(self):
+
+        """ Return the data type of each variable. """
+
+        if 'complex' in self.flags:
+            return ['<c16']*self.number_of_variables
+        elif 'double' in self.flags:
+            return ['<f8']*self.number_of_variables
+        else:
+            return ['<f8'] + ['<f4']*(self.number_of_variables - 1)
+
+    ##############################################
+
+    def _read_variable_data(self, data, offset):
+
+        """ Read the binary data from *offset* and set the variable values. """
+
+        dtypes = self._dtypes()
+        size = sum(np.dtype(dtype).itemsize for dtype in dtypes)*self.number_of_points
+        if len(data) - offset < size:
+            raise NameError("Expected {} bytes of data instead of {}".format(size, len(data) - offset))
+
+        buffer_ = memoryview(data)
+        if 'fastaccess' in self.flags:
+            # the values are written variable by variable
+            for variable, dtype in zip(self.variables.values(), dtypes):
+                variable.data = np.frombuffer(buffer_, dtype=dtype, count=self.number_of_points, offset=offset)
+                offset += variable.data.nbytes
+        else:
+            # the values are written point by point, a point is read as a packed record
+            names = ['v{}'.format(i) for i in range(self.number_of_variables)]
+            records = np.frombuffer(buffer_, dtype=np.dtype(dict(names=names, formats=dtypes)),
+                                    count=self.number_of_points, offset=offset)
+            for name, variable in zip(names, self.variables.values()):
+                variable.data = records[name]
+
+        time = self.variables.get('time', None)
+        if time is not None:
+            time.data = np.abs(time.data)
+
+    ##############################################
+
+    def nodes(self, abscissa=None):
+
+        return [variable.to_waveform(abscissa)
+                for variable in self.variables.values()
+                if variable.probe_type == 'v']
+
+    ##############################################
+
+    def branches(self, abscissa=None):
+
+        return [variable.to_waveform(abscissa)
+                for variable in self.variables.values()
+                if variable.probe_type == 'i']
+
+    ##############################################
+
+    def to_analysis(self):
+
+        """Return a :obj:`PySpice.Probe.WaveForm.TransientAnalysis` or
+        :obj:`PySpice.Probe.WaveForm.AcAnalysis` instance.
+
+        """
+
+        if self.plot_name == 'Transient Analysis':
+            time = self.variables['time'].to_waveform()
+            return TransientAnalysis(time, nodes=self.nodes(abscissa=time), branches=self.branches(abscissa=time))
+        elif self.plot_name == 'AC Analysis':
+            frequency = self.variables['frequency'].to_waveform(to_real=True)
+            return AcAnalysis(frequency, nodes=self.nodes(), branches=self.branches())
+        else:
+            raise NotImplementedError("Unsupported plot name {}".format(self.plot_name))
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
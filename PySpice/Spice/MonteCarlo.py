@@ -0,0 +1,377 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements Monte Carlo analyses.
+
+Tolerances are set on element and model parameters::
+
+    circuit.R1.set_tolerance('resistance', GaussianTolerance(5))
+    circuit.C1.set_tolerance('capacitance', UniformTolerance(10))
+    diode_model = circuit.model('Diode', 'D', IS=4.352e-9, RS=0.6458)
+    diode_model.set_tolerance('IS', GaussianTolerance(20, number_of_sigmas=3))
+
+then a Monte Carlo analysis runs the same analysis with random parameter values::
+
+    monte_carlo = MonteCarlo(circuit, 100, 'transient', step_time=micro(1), end_time=milli(1),
+                             seed=1234)
+    result = monte_carlo.run(measurements={'vmax': lambda analysis: float(analysis.out.max())})
+    result['out'] # array of shape (number of runs, number of points)
+    result.measurements['vmax'] # array of shape (number of runs,)
+
+A run which timed out, cf. the *timeout* parameter of the analysis, is masked: its analysis is
+:obj:`None`, its waveforms and its measurements are NaN and its index is listed in
+:attr:`MonteCarloResult.failed`.
+
+The values of all the runs are drawn at once for each parameter using a seeded random generator, thus
+a run is reproducible.  The runs are dispatched to a thread pool, cf.
+:meth:`PySpice.Spice.Simulation.SubprocessCircuitSimulator.run_parameter_sets`.
+
+"""
+
+####################################################################################################
+
+from collections import OrderedDict
+import inspect
+import logging
+
+import numpy as np
+
+####################################################################################################
+
+from ..Math.Interpolation import resample
+from ..Unit.Units import parse_spice_number
+from .Sweep import CircuitParameterSetter
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class Tolerance:
+
+    """This class is the base class for tolerances.
+
+    A tolerance is defined by a percentage of the nominal value.
+
+    """
+
+    ##############################################
+
+    def __init__(self, percent):
+
+        self._percent = float(percent)
+
+    ##############################################
+
+    @property
+    def percent(self):
+        return self._percent
+
+    ##############################################
+
+    def deviation(self, size, random_state):
+
+        """Return an array of *size* relative deviations."""
+
+        raise NotImplementedError
+
+    ##############################################
+
+    def sample(self, nominal, size, random_state):
+
+        """Return an array of *size* values around the nominal value."""
+
+        if isinstance(nominal, str):
+            nominal = parse_spice_number(nominal)
+        return float(nominal) * (1 + self.deviation(size, random_state))
+
+####################################################################################################
+
+class UniformTolerance(Tolerance):
+
+    """This class implements a tolerance with an uniform distribution within ±percent."""
+
+    ##############################################
+
+    def deviation(self, size, random_state):
+
+        relative_tolerance = self._percent / 100
+        return random_state.uniform(-relative_tolerance, relative_tolerance, size)
+
+####################################################################################################
+
+class GaussianTolerance(Tolerance):
+
+    """This class implements a tolerance with a normal distribution, where ±percent corresponds to
+    *number_of_sigmas* standard deviations.
+
+    """
+
+    ##############################################
+
+    def __init__(self, percent, number_of_sigmas=3):
+
+        super().__init__(percent)
+        self._number_of_sigmas = number_of_sigmas
+
+    ##############################################
+
+    @property
+    def number_of_sigmas(self):
+        return self._number_of_sigmas
+
+    ##############################################
+
+    def deviation(self, size, random_state):
+
+        sigma = self._percent / 100 / self._number_of_sigmas
+        return random_state.normal(0, sigma, size)
+
+####################################################################################################
+
+class MonteCarloResult:
+
+    """This class stores the result of a Monte Carlo analysis.
+
+    Public Attributes:
+
+      :attr:`parameters`
+        dictionary of the sampled values, each value is an array of shape (number of runs,)
+
+      :attr:`analyses`
+        list of the analyses, :obj:`None` for a failed run
+
+      :attr:`measurements`
+        dictionary of the measured values, each value is an array of shape (number of runs,)
+
+      :attr:`failed`
+        array of the indexes of the failed runs
+
+    """
+
+    ##############################################
+
+    def __init__(self, parameters, analyses, measurements):
+
+        self.parameters = parameters
+        self.analyses = analyses
+        self.measurements = measurements
+        self.failed = np.array([i for i, analysis in enumerate(analyses) if analysis is None],
+                               dtype=np.int64)
+
+    ##############################################
+
+    @property
+    def number_of_runs(self):
+        return len(self.analyses)
+
+    ##############################################
+
+    @staticmethod
+    def _abscissa(analysis):
+
+        for attribute_name in ('time', 'frequency', 'v_sweep'):
+            abscissa = getattr(analysis, attribute_name, None)
+            if abscissa is not None:
+                return np.asarray(abscissa)
+        return None
+
+    ##############################################
+
+    def _successful_analyses(self):
+
+        analyses = [analysis for analysis in self.analyses if analysis is not None]
+        if not analyses:
+            raise NameError("All the runs failed")
+        return analyses
+
+    ##############################################
+
+    @property
+    def abscissa(self):
+
+        """Return the abscissa of the first successful run, the waveforms are stacked on it."""
+
+        return self._abscissa(self._successful_analyses()[0])
+
+    ##############################################
+
+    def __getitem__(self, name):
+
+        """Return the waveforms of the given node or branch as an array of shape (number of runs,
+        number of points).
+
+        The waveforms of a transient analysis are linearly interpolated on the abscissa of the first
+        successful run if the time steps differ, cf. :func:`PySpice.Math.Interpolation.resample`,
+        the values out of range are clamped.  For an operating point, the shape is (number of
+        runs,).  The rows of the failed runs are set to NaN.
+
+        """
+
+        analyses = self._successful_analyses()
+        waveforms = [np.asarray(analysis[name]) for analysis in analyses]
+        reference = self._abscissa(analyses[0])
+        if reference is None:
+            values = np.array([float(waveform) for waveform in waveforms])
+        else:
+            abscissas = [self._abscissa(analysis) for analysis in analyses]
+            values = resample(reference, abscissas, waveforms, fill_value=None)
+        if not self.failed.size:
+            return values
+
+        array = np.full((len(self.analyses),) + values.shape[1:], np.nan, dtype=values.dtype)
+        array[[i for i, analysis in enumerate(self.analyses) if analysis is not None]] = values
+        return array
+
+####################################################################################################
+
+class MonteCarlo:
+
+    """This class implements a Monte Carlo analysis.
+
+    The parameters having a tolerance are collected from the elements and the models of the circuit
+    at the instantiation.  The analysis is specified by the name of a
+    :class:`PySpice.Spice.Simulation.CircuitSimulation` method and its arguments.
+
+    """
+
+    _logger = _module_logger.getChild('MonteCarlo')
+
+    ##############################################
+
+    def __init__(self, circuit, number_of_runs, analysis_method, *args,
+                 seed=None, simulator=None, **kwargs):
+
+        self._circuit = circuit
+        self._number_of_runs = int(number_of_runs)
+        self._analysis_method = analysis_method
+        self._args = args
+        self._kwargs = kwargs
+        self._seed = seed
+        if simulator is None:
+            simulator = circuit.simulator()
+        self._simulator = simulator
+
+        self._tolerances = OrderedDict()
+        for element in circuit.element_iterator():
+            for attribute_name, tolerance in element.tolerances.items():
+                self._tolerances['{}.{}'.format(element.name, attribute_name)] = tolerance
+        for model in circuit.model_iterator():
+            for parameter_name, tolerance in model.tolerances.items():
+                self._tolerances['{}.{}'.format(model.name, parameter_name)] = tolerance
+        if not self._tolerances:
+            self._logger.warning("No tolerance is defined on the circuit")
+
+    ##############################################
+
+    @property
+    def number_of_runs(self):
+        return self._number_of_runs
+
+    @property
+    def tolerances(self):
+        return self._tolerances
+
+    ##############################################
+
+    def sample(self):
+
+        """Return a dictionary of the sampled values for each parameter having a tolerance, each
+        value is an array of shape (number of runs,).
+
+        """
+
+        random_state = np.random.RandomState(self._seed)
+        with CircuitParameterSetter(self._circuit) as setter:
+            return OrderedDict((name, tolerance.sample(setter[name], self._number_of_runs, random_state))
+                               for name, tolerance in self._tolerances.items())
+
+    ##############################################
+
+    def parameter_sets(self, parameters=None):
+
+        """Yield a dictionary of parameter values for each run."""
+
+        if parameters is None:
+            parameters = self.sample()
+        names = list(parameters.keys())
+        for values in zip(*parameters.values()):
+            yield OrderedDict(zip(names, (float(value) for value in values)))
+
+    ##############################################
+
+    def run(self, executor=None, measurements=None):
+
+        """Run the analyses and return a :class:`MonteCarloResult` instance.
+
+        *measurements* is a dictionary which maps a name to a function which takes an analysis and
+        returns a float.  For an asyncio simulator, use :meth:`run_async`.
+
+        """
+
+        if inspect.iscoroutinefunction(self._simulator.run_parameter_sets):
+            raise NameError("The simulator is asynchronous, use run_async()")
+
+        parameters = self.sample()
+        analyses = self._simulator.run_parameter_sets(list(self.parameter_sets(parameters)),
+                                                      self._analysis_method, *self._args,
+                                                      executor=executor, **self._kwargs)
+        return self._make_result(parameters, analyses, measurements)
+
+    ##############################################
+
+    async def run_async(self, max_concurrency=None, measurements=None):
+
+        """Asyncio variant of :meth:`run` for a
+        :class:`PySpice.Spice.Simulation.AsyncSubprocessCircuitSimulator` instance, at most
+        *max_concurrency* simulations run at the same time.
+
+        """
+
+        if not inspect.iscoroutinefunction(self._simulator.run_parameter_sets):
+            raise NameError("The simulator is not asynchronous, use run()")
+
+        parameters = self.sample()
+        analyses = await self._simulator.run_parameter_sets(list(self.parameter_sets(parameters)),
+                                                            self._analysis_method, *self._args,
+                                                            max_concurrency=max_concurrency,
+                                                            **self._kwargs)
+        return self._make_result(parameters, analyses, measurements)
+
+    ##############################################
+
+    @staticmethod
+    def _make_result(parameters, analyses, measurements):
+
+        measurement_table = OrderedDict()
+        if measurements is not None:
+            for name, function in measurements.items():
+                measurement_table[name] = np.array([function(analysis) if analysis is not None else np.nan
+                                                    for analysis in analyses],
+                                                   dtype=np.float64)
+
+        return MonteCarloResult(parameters, analyses, measurement_table)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
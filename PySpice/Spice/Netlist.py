@@ -101,9 +101,11 @@ import os
 
 from ..Tools.StringTools import join_lines, join_list, join_dict
 from .ElementParameter import (ParameterDescriptor,
-                               PositionalElementParameter,
+                               PositionalElementParameter, FloatPositionalParameter,
                                FlagParameter, KeyValueParameter)
-from .Simulation import SubprocessCircuitSimulator, NgSpiceSharedCircuitSimulator
+from .Simulation import (SubprocessCircuitSimulator,
+                         AsyncSubprocessCircuitSimulator,
+                         NgSpiceSharedCircuitSimulator)
 
 ####################################################################################################
 
@@ -162,6 +164,7 @@ class DeviceModel:
         self._name = str(name)
         self._model_type = str(modele_type)
         self._parameters = dict(**parameters)
+        self._tolerances = {}
 
     ##############################################
 
@@ -177,6 +180,62 @@ class DeviceModel:
 
     ##############################################
 
+    @property
+    def parameters(self):
+        return self._parameters
+
+    ##############################################
+
+    def __getattr__(self, name):
+
+        # Implement attribute access for parameters
+        if not name.startswith('_') and name in self._parameters:
+            return self._parameters[name]
+        else:
+            raise AttributeError(name)
+
+    ##############################################
+
+    def __setattr__(self, name, value):
+
+        # Implement attribute access for parameters, a new parameter must be added to
+        # :attr:`parameters`
+        if not name.startswith('_') and name in self._parameters:
+            self._parameters[name] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    ##############################################
+
+    def set_tolerance(self, parameter_name, tolerance):
+
+        """Set the tolerance of a parameter, cf. :mod:`PySpice.Spice.MonteCarlo`."""
+
+        if parameter_name not in self._parameters:
+            raise NameError("Model {} has no parameter {}".format(self._name, parameter_name))
+        self._tolerances[parameter_name] = tolerance
+
+    ##############################################
+
+    @property
+    def tolerances(self):
+        return self._tolerances
+
+    ##############################################
+
+    def alter_command(self, parameter_name, value=None):
+
+        """Return the ngspice command to set the parameter to *value*, the current value if
+        :obj:`None`.
+
+        """
+
+        if value is None:
+            value = self._parameters[parameter_name]
+        return 'altermod {} {} = {}'.format(self._name, parameter_name, value)
+
+    ##############################################
+
     def __repr__(self):
 
         return str(self.__class__) + ' ' + self.name
@@ -357,6 +416,9 @@ class Element(metaclass=ElementParameterMetaClass):
     _parameters_from_args = None
     _spice_to_parameters = None
 
+    # elements where "alter name = value" sets the first positional parameter
+    _principal_value_prefixes = ('R', 'C', 'L', 'V', 'I')
+
     # Fixme: _prefix
 
     #: SPICE element prefix
@@ -368,6 +430,8 @@ class Element(metaclass=ElementParameterMetaClass):
 
         self._name = str(name)
         self._pins = list(pins) # Fixme: pins is not a ordered dict, cf. property
+        self._modified_parameters = set()
+        self._tolerances = {}
 
         # self._parameters = list(args)
 
@@ -422,6 +486,82 @@ class Element(metaclass=ElementParameterMetaClass):
 
     ##############################################
 
+    def parameter_modified(self, parameter):
+
+        """Called by the parameter descriptors each time a parameter is set."""
+
+        self._modified_parameters.add(parameter.attribute_name)
+
+    ##############################################
+
+    @property
+    def modified_parameters(self):
+
+        """Return the set of the attribute names of the parameters set since the last call to
+        :meth:`clear_modified_parameters`.
+
+        """
+
+        return self._modified_parameters
+
+    ##############################################
+
+    def clear_modified_parameters(self):
+
+        self._modified_parameters.clear()
+
+    ##############################################
+
+    def alter_command(self, attribute_name, value=None):
+
+        """Return the ngspice command to set the parameter to *value*, the current value if
+        :obj:`None`, or :obj:`None` if the parameter cannot be altered.
+
+        """
+
+        element_class = self.__class__
+        current_value = getattr(self, attribute_name)
+        if current_value is None:
+            return None
+        if attribute_name in element_class.positional_parameters:
+            parameter = element_class.positional_parameters[attribute_name]
+            if (isinstance(parameter, FloatPositionalParameter)
+                and parameter.position == 0
+                and self.prefix in self._principal_value_prefixes):
+                if value is None:
+                    value = current_value
+                return 'alter {} = {}'.format(self.name, value)
+        elif attribute_name in element_class.optional_parameters:
+            parameter = element_class.optional_parameters[attribute_name]
+            if isinstance(parameter, KeyValueParameter):
+                if value is None:
+                    value = parameter.str_value(self)
+                return 'alter {} {} = {}'.format(self.name, parameter.spice_name, value)
+        return None
+
+    ##############################################
+
+    def set_tolerance(self, attribute_name, tolerance):
+
+        """Set the tolerance of a parameter, cf. :mod:`PySpice.Spice.MonteCarlo`."""
+
+        if attribute_name in self._spice_to_parameters:
+            attribute_name = self._spice_to_parameters[attribute_name].attribute_name
+        elif not hasattr(self, attribute_name):
+            raise NameError("Element {} has no parameter {}".format(self.name, attribute_name))
+        self.tolerances[attribute_name] = tolerance
+
+    ##############################################
+
+    @property
+    def tolerances(self):
+
+        """Return the dictionary of the tolerances, the keys are attribute names."""
+
+        return self._tolerances
+
+    ##############################################
+
     def format_node_names(self):
         """ Return the formatted list of nodes. """
         return join_list((self.name, join_list(self.nodes)))
@@ -665,6 +805,8 @@ class Netlist:
         else:
             raise NameError("Model name {} is already defined".format(name))
 
+        return model
+
     ##############################################
 
     @property
@@ -827,6 +969,7 @@ class Circuit(Netlist):
         self._global_nodes = set(global_nodes) # .global
         self._includes = [] # .include
         self._parameters = {} # .param
+        self._modified_parameters = set()
         self._subcircuits = {}
 
         # Fixme: not implemented
@@ -857,7 +1000,40 @@ class Circuit(Netlist):
 
         """Set a parameter."""
 
-        self._parameters[str(name)] = str(expression)
+        name = str(name)
+        expression = str(expression)
+        if self._parameters.get(name, None) != expression:
+            self._parameters[name] = expression
+            self._modified_parameters.add(name)
+
+    ##############################################
+
+    @property
+    def parameters(self):
+        """Parameters"""
+        return self._parameters
+
+    ##############################################
+
+    @property
+    def modified_parameters(self):
+
+        """Return the set of the parameter names set since the last call to
+        :meth:`clear_modified_parameters`.
+
+        """
+
+        return self._modified_parameters
+
+    ##############################################
+
+    def clear_modified_parameters(self):
+
+        """Clear the modified flags of the circuit and element parameters."""
+
+        self._modified_parameters.clear()
+        for element in self.element_iterator():
+            element.clear_modified_parameters()
 
     ##############################################
 
@@ -889,7 +1065,8 @@ class Circuit(Netlist):
         if self._global_nodes:
             netlist += '.global ' + join_list(self._global_nodes) + '\n'
         if self._parameters:
-            netlist += join_lines(self._parameters, prefix='.param ') + '\n'
+            parameters = ['{}={}'.format(key, value) for key, value in self._parameters.items()]
+            netlist += join_lines(parameters, prefix='.param ') + '\n'
         if self._subcircuits:
             netlist += join_lines(self.subcircuit_iterator())
         netlist += super().__str__()
@@ -905,10 +1082,11 @@ class Circuit(Netlist):
 
     def simulator(self, *args, **kwargs):
 
-        """Return a :obj:`PySpice.Spice.Simulation.SubprocessCircuitSimulator` or
+        """Return a :obj:`PySpice.Spice.Simulation.SubprocessCircuitSimulator`,
+        :obj:`PySpice.Spice.Simulation.AsyncSubprocessCircuitSimulator` or
         :obj:`PySpice.Spice.Simulation.NgSpiceSharedCircuitSimulator` instance depending of the
-        value of the *simulator* parameter: ``subprocess`` or ``shared``, respectively. If this
-        parameter is not specified then a subprocess simulator is returned.
+        value of the *simulator* parameter: ``subprocess``, ``async`` or ``shared``,
+        respectively. If this parameter is not specified then a subprocess simulator is returned.
 
         """
 
@@ -920,6 +1098,8 @@ class Circuit(Netlist):
             simulator = 'subprocess'
         if simulator == 'subprocess':
             return SubprocessCircuitSimulator(self, *args, **kwargs)
+        elif simulator == 'async':
+            return AsyncSubprocessCircuitSimulator(self, *args, **kwargs)
         elif simulator == 'shared':
             return NgSpiceSharedCircuitSimulator(self, *args, **kwargs)
         else:
@@ -36,7 +36,8 @@ within the Pypy interpreter which implements JIT optimisation for Python.
 
 It can also be used to experiment parallel simulation as explained in the Ngspice user manual. But
 it seems the Ngspice source code was designed with global variables which imply to use one copy of
-the shared library by worker as explained in the manual.
+the shared library by worker as explained in the manual.  The :class:`NgSpiceSharedPool` class
+implements this scheme.
 
 .. warning:: This interface can strongly slow down the simulation if the input or output callbacks
   is used.  If the simulation time goes wrong for you then you need to implement the callbacks at a
@@ -46,8 +47,14 @@ the shared library by worker as explained in the manual.
 
 ####################################################################################################
 
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import asyncio
+import concurrent.futures
 import logging
 import os
+import queue
+import threading
 import time
 
 import numpy as np
@@ -57,6 +64,10 @@ import numpy as np
 from cffi import FFI
 ffi = FFI()
 
+# The API must be declared only once, it is shared by all the library copies
+with open(os.path.join(os.path.dirname(__file__), 'api.h')) as f:
+    ffi.cdef(f.read())
+
 ####################################################################################################
 
 _module_logger = logging.getLogger(__name__)
@@ -66,6 +77,7 @@ _module_logger = logging.getLogger(__name__)
 from PySpice.Probe.WaveForm import (OperatingPoint, SensitivityAnalysis,
                                     DcAnalysis, AcAnalysis, TransientAnalysis,
                                     WaveForm)
+from PySpice.Spice.Cancellation import SimulationTimeout, registered
 from PySpice.Tools.EnumFactory import EnumFactory
 
 ####################################################################################################
@@ -79,6 +91,10 @@ class Vector:
 
     """ This class implements a vector in a simulation output.
 
+    A borrowed vector is a view on the memory of the simulator, it is only valid until the next
+    command, cf. :meth:`NgSpiceShared.plot`.  Then an access to its data raises a
+    :exc:`NameError`.
+
     Public Attributes:
 
       :attr:`data`
@@ -92,11 +108,38 @@ class Vector:
 
     ##############################################
 
-    def __init__(self, name, type_, data):
+    def __init__(self, name, type_, data, ngspice_shared=None, generation=None):
+
+        """ *ngspice_shared* and *generation* are set for a borrowed vector. """
 
         self.name = str(name)
         self.type = type_
-        self.data = data
+        self._data = data
+        self._ngspice_shared = ngspice_shared
+        self._generation = generation
+
+    ##############################################
+
+    @property
+    def is_borrowed(self):
+        return self._ngspice_shared is not None
+
+    @property
+    def is_valid(self):
+        return self._ngspice_shared is None or self._ngspice_shared.generation == self._generation
+
+    ##############################################
+
+    @property
+    def data(self):
+        if not self.is_valid:
+            raise NameError("Vector {} was invalidated by a later command".format(self.name))
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._ngspice_shared = None
 
     ##############################################
 
@@ -154,15 +197,26 @@ class Vector:
             data = data.real
         if to_float:
             data = float(data[0])
+        elif self.is_borrowed:
+            # the memory of a borrowed vector is released by ngspice, the waveform must outlive it
+            data = data.copy()
 
         return WaveForm(self.simplified_name, self.unit, data, abscissa=abscissa)
 
 ####################################################################################################
 
-class Plot(dict):
+class Plot(MutableMapping):
 
     """ This class implements a plot in a simulation output.
 
+    The plot is a dictionary of :class:`Vector` instances, but the vectors are only retrieved from
+    the simulator when they are accessed, thus the plot of a large circuit is cheap if only a few
+    vectors are used.
+
+    Since the plots can be destroyed and their names reused by the next commands, the vectors must
+    be retrieved before the next command, even for an owned plot.  Then the retrieval of a vector
+    raises a :exc:`NameError`.
+
     Public Attributes:
 
       :attr:`plot_name`
@@ -171,11 +225,130 @@ class Plot(dict):
 
     ##############################################
 
-    def __init__(self, plot_name):
-
-        super().__init__()
+    def __init__(self, plot_name, vector_names=(), ngspice_shared=None, ownership='owned'):
 
         self.plot_name = plot_name
+        self._vector_names = list(vector_names)
+        self._vectors = {}
+        self._ngspice_shared = ngspice_shared
+        self._ownership = ownership
+        if ngspice_shared is not None:
+            self._generation = ngspice_shared.generation
+
+    ##############################################
+
+    @property
+    def is_valid(self):
+
+        """ Return :obj:`True` if the vectors can be retrieved from the simulator. """
+
+        return self._ngspice_shared is not None and self._ngspice_shared.generation == self._generation
+
+    ##############################################
+
+    def _check_validity(self):
+
+        if not self.is_valid:
+            raise NameError("Plot {} was invalidated by a later command".format(self.plot_name))
+
+    ##############################################
+
+    def __getitem__(self, name):
+
+        try:
+            return self._vectors[name]
+        except KeyError:
+            pass
+        if self._ngspice_shared is None or name not in self._vector_names:
+            raise KeyError(name)
+        self._check_validity()
+        vector = self._ngspice_shared._get_vector(self.plot_name, name, self._ownership)
+        self._vectors[name] = vector
+        return vector
+
+    ##############################################
+
+    def __setitem__(self, name, vector):
+
+        if name not in self._vector_names:
+            self._vector_names.append(name)
+        self._vectors[name] = vector
+
+    ##############################################
+
+    def __delitem__(self, name):
+
+        self._vector_names.remove(name)
+        self._vectors.pop(name, None)
+
+    ##############################################
+
+    def __contains__(self, name):
+        return name in self._vector_names
+
+    def __iter__(self):
+        return iter(self._vector_names)
+
+    def __len__(self):
+        return len(self._vector_names)
+
+    ##############################################
+
+    def copy(self):
+
+        """ Return a dictionary of all the vectors. """
+
+        return OrderedDict(self.items())
+
+    ##############################################
+
+    def detach(self):
+
+        """ Return a plot which is not bound to the simulator, thus it stays valid after the next
+        commands.  All the vectors are retrieved and the borrowed data are copied.
+        """
+
+        plot = Plot(self.plot_name)
+        for name, vector in self.items():
+            if vector.is_borrowed:
+                vector = Vector(vector.name, vector.type, vector.data.copy())
+            plot[name] = vector
+        return plot
+
+    ##############################################
+
+    def to_array(self, names=None):
+
+        """Return the values of the given vectors, all the vectors by default, as an array of shape
+        (number of vectors, number of points).
+
+        The values are copied in a single buffer without creating :class:`Vector` instances.  The
+        array is complex if one vector is complex.
+
+        """
+
+        if names is None:
+            names = self._vector_names
+        if self._ngspice_shared is None:
+            # a detached plot
+            if not names:
+                return np.empty((0, 0))
+            return np.array([self[name].data for name in names])
+        self._check_validity()
+        vector_infos = [self._ngspice_shared._get_vector_info(self.plot_name, name) for name in names]
+        if not vector_infos:
+            return np.empty((0, 0))
+
+        length = vector_infos[0].v_length
+        for name, vector_info in zip(names, vector_infos):
+            if vector_info.v_length != length:
+                raise NameError("Vector {} has {} points instead of {}".format(name, vector_info.v_length, length))
+        is_complex = any(vector_info.v_compdata != ffi.NULL for vector_info in vector_infos)
+        array = np.empty((len(vector_infos), length), dtype=np.complex128 if is_complex else np.float64)
+        for row, vector_info in zip(array, vector_infos):
+            row[...] = NgSpiceShared._vector_view(vector_info)
+
+        return array
 
     ##############################################
 
@@ -259,6 +432,159 @@ class Plot(dict):
 
 ####################################################################################################
 
+class DataCapture:
+
+    """This class implements a columnar buffer to capture the vector values sent by the *send_data*
+    callback during a simulation.
+
+    The values are written in a preallocated 2D Numpy array of shape (capacity, number of vectors)
+    whose capacity is doubled when it is full, so as to amortise the allocations.  A consumer
+    thread can iterate over the chunks while the simulation runs::
+
+        ngspice_shared = NgSpiceShared(capture_data=True)
+        ngspice_shared.load_circuit(desk)
+        ngspice_shared.run(background=True)
+        for chunk in ngspice_shared.data_capture.chunks():
+            ... # chunk is an array of shape (number of points, number of vectors)
+
+    Public Attributes:
+
+      :attr:`names`
+        list of the vector names, i.e. the column names
+
+      :attr:`is_complex`
+        flag set if the buffer is complex
+
+    """
+
+    ##############################################
+
+    def __init__(self, initial_capacity=1024, chunk_size=256):
+
+        self._initial_capacity = int(initial_capacity)
+        self._chunk_size = int(chunk_size)
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._finished = True
+        self.reset(())
+
+    ##############################################
+
+    def reset(self, names, is_complex=False):
+
+        """ Reset the buffer for the given vector names. """
+
+        with self._condition:
+            self.names = list(names)
+            self._column_index = {name:i for i, name in enumerate(self.names)}
+            self.is_complex = bool(is_complex)
+            dtype = np.complex128 if self.is_complex else np.float64
+            self._buffer = np.empty((self._initial_capacity, len(self.names)), dtype=dtype)
+            self._size = 0
+            self._notified_size = 0
+
+    ##############################################
+
+    def start(self):
+
+        """ Mark the start of a simulation. """
+
+        with self._condition:
+            self._size = 0
+            self._notified_size = 0
+            self._generation += 1
+            self._finished = False
+            self._condition.notify_all()
+
+    ##############################################
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def finished(self):
+        return self._finished
+
+    ##############################################
+
+    @property
+    def data(self):
+
+        """ Return a view on the captured values. """
+
+        return self._buffer[:self._size]
+
+    ##############################################
+
+    def __getitem__(self, name):
+
+        """ Return a view on the captured values of the given vector. """
+
+        return self._buffer[:self._size, self._column_index[name]]
+
+    ##############################################
+
+    def append(self, values):
+
+        """ Append a row of values. """
+
+        if self._size == self._buffer.shape[0]:
+            with self._condition:
+                buffer_ = np.empty((2*self._buffer.shape[0], self._buffer.shape[1]), dtype=self._buffer.dtype)
+                buffer_[:self._size] = self._buffer[:self._size]
+                self._buffer = buffer_
+        self._buffer[self._size] = values
+        self._size += 1
+        if self._size - self._notified_size >= self._chunk_size:
+            with self._condition:
+                self._notified_size = self._size
+                self._condition.notify_all()
+
+    ##############################################
+
+    def finish(self):
+
+        """ Mark the end of the simulation. """
+
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    ##############################################
+
+    def chunks(self, timeout=None):
+
+        """ Yield copies of the rows appended since the last chunk, until the simulation is finished
+        or a new simulation is started.
+
+        If *timeout* is not :obj:`None` and no values are appended within this delay, the iteration
+        stops.
+
+        """
+
+        start = 0
+        with self._condition:
+            generation = self._generation
+        while True:
+            with self._condition:
+                if self._generation != generation:
+                    # a new simulation started
+                    return
+                if not self._finished and self._size - start < self._chunk_size:
+                    if not self._condition.wait(timeout) and self._size == start:
+                        return
+                stop = self._size
+                finished = self._finished
+                chunk = np.array(self._buffer[start:stop]) if stop > start else None
+            if chunk is not None:
+                start = stop
+                yield chunk
+            if finished and start == stop:
+                return
+
+####################################################################################################
+
 class NgSpiceShared:
 
     _logger = _module_logger.getChild('NgSpiceShared')
@@ -288,25 +614,68 @@ class NgSpiceShared:
 
     ##############################################
 
-    def __init__(self, ngspice_id=0, send_data=False):
+    def __init__(self, ngspice_id=0, send_data=False, capture_data=False,
+                 max_plots=None, retain_circuits=True, memory_high_water_mark=None):
 
         """ Set the *send_data* flag if you want to enable the output callback.
 
+        Set the *capture_data* flag if you want to capture the vector values in a
+        :class:`DataCapture` buffer, cf. :attr:`data_capture`, instead of the output callback.
+
         Set the *ngspice_id* to an integer value if you want to run NgSpice in parallel.
+
+        The plots and the circuits stay in memory by default.  For a long-lived instance, the
+        retention policy is set by *max_plots*, the number of plots to keep, *retain_circuits*,
+        which removes the previous circuit when a circuit is loaded if it is not set, and
+        *memory_high_water_mark*, the size of the vector data in bytes beyond which all the plots
+        are destroyed, cf. :meth:`collect_garbage`.
         """
 
         self._ngspice_id = ngspice_id
 
+        if max_plots is not None and max_plots < 1:
+            raise ValueError("max_plots must be at least 1")
+        self._max_plots = max_plots
+        self._retain_circuits = retain_circuits
+        self._memory_high_water_mark = memory_high_water_mark
+        self._number_of_circuits = 0
+        self._plot_sizes = {}
+        self._collected_generation = None
+
+        if capture_data:
+            self._data_capture = DataCapture()
+        else:
+            self._data_capture = None
+
+        # set when the background thread is not running
+        self._simulation_done = threading.Event()
+        self._simulation_done.set()
+        self._pending_futures = []
+        self._pending_futures_lock = threading.Lock()
+        self._generation = 0
+
         self._load_library()
         self._init_ngspice(send_data)
 
     ##############################################
 
-    def _load_library(self):
+    @property
+    def ngspice_id(self):
+        return self._ngspice_id
 
-        api_path = os.path.join(os.path.dirname(__file__), 'api.h')
-        with open(api_path) as f:
-            ffi.cdef(f.read())
+    @property
+    def generation(self):
+        """ Counter incremented by each command, it invalidates the borrowed vectors. """
+        return self._generation
+
+    @property
+    def data_capture(self):
+        """ :class:`DataCapture` instance if the capture is enabled, else :obj:`None`. """
+        return self._data_capture
+
+    ##############################################
+
+    def _load_library(self):
 
         if not self._ngspice_id:
             library_prefix = ''
@@ -324,11 +693,15 @@ class NgSpiceShared:
         self._exit_c = ffi.callback('int (int, bool, bool, int, void *)', self._exit)
         self._send_init_data_c = ffi.callback('int (pvecinfoall, int, void *)', self._send_init_data)
         
-        if send_data:
+        if self._data_capture is not None:
+            self._send_data_c = ffi.callback('int (pvecvaluesall, int, int, void *)', self._capture_data)
+        elif send_data:
             self._send_data_c = ffi.callback('int (pvecvaluesall, int, int, void *)', self._send_data)
         else:
             self._send_data_c = ffi.NULL
 
+        self._background_thread_running_c = ffi.callback('int (bool, int, void *)',
+                                                         self._background_thread_running)
         self._get_vsrc_data_c = ffi.callback('int (double *, double, char *, int, void *)', self._get_vsrc_data)
         self._get_isrc_data_c = ffi.callback('int (double *, double, char *, int, void *)', self._get_isrc_data)
 
@@ -339,7 +712,7 @@ class NgSpiceShared:
                                                self._exit_c,
                                                self._send_data_c,
                                                self._send_init_data_c,
-                                               ffi.NULL, # BGThreadRunning
+                                               self._background_thread_running_c,
                                                self_c)
         if rc:
             raise NameError("Ngspice_Init returned {}".format(rc))
@@ -383,21 +756,41 @@ class NgSpiceShared:
     @staticmethod
     def _send_data(data, number_of_vectors, ngspice_id, user_data):
         self = ffi.from_handle(user_data)
-        self._logger.debug('ngspice_id-{} send_data [{}]'.format(ngspice_id, data.vecindex))
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug('ngspice_id-{} send_data [{}]'.format(ngspice_id, data.vecindex))
         actual_vector_values = {}
         for i in range(int(number_of_vectors)):
             actual_vector_value = data.vecsa[i]
             vector_name = ffi_string_utf8(actual_vector_value.name)
             value = complex(actual_vector_value.creal, actual_vector_value.cimag)
             actual_vector_values[vector_name] = value
-            self._logger.debug('    Vector: {} {}'.format(vector_name, value))
+            if debug:
+                self._logger.debug('    Vector: {} {}'.format(vector_name, value))
         return self.send_data(actual_vector_values, number_of_vectors, ngspice_id)
 
     ##############################################
 
+    @staticmethod
+    def _capture_data(data, number_of_vectors, ngspice_id, user_data):
+        self = ffi.from_handle(user_data)
+        vectors = data.vecsa
+        if self._data_capture.is_complex:
+            values = [complex(vectors[i].creal, vectors[i].cimag) for i in range(number_of_vectors)]
+        else:
+            values = [vectors[i].creal for i in range(number_of_vectors)]
+        self._data_capture.append(values)
+        return 0
+
+    ##############################################
+
     @staticmethod
     def _send_init_data(data,  ngspice_id, user_data): 
         self = ffi.from_handle(user_data)
+        if self._data_capture is not None:
+            vectors = [data.vecs[i] for i in range(data.veccount)]
+            self._data_capture.reset([ffi_string_utf8(vector.vecname) for vector in vectors],
+                                     is_complex=not all(vector.is_real for vector in vectors))
         if self._logger.isEnabledFor(logging.DEBUG):
             self._logger.debug('ngspice_id-{} send_init_data'.format(ngspice_id))
             number_of_vectors = data.veccount
@@ -407,6 +800,31 @@ class NgSpiceShared:
 
     ##############################################
 
+    @staticmethod
+    def _background_thread_running(noruns, ngspice_id, user_data):
+        # Ngspice calls this function with false when the background thread starts and with true
+        # when it exits.
+        self = ffi.from_handle(user_data)
+        self._logger.debug('ngspice_id-{} background thread running {}'.format(ngspice_id, not noruns))
+        if noruns:
+            if self._data_capture is not None:
+                self._data_capture.finish()
+            self._simulation_done.set()
+            with self._pending_futures_lock:
+                pending_futures, self._pending_futures = self._pending_futures, []
+            for loop, future in pending_futures:
+                loop.call_soon_threadsafe(self._set_future_result, future)
+        return self.background_thread_running(not noruns, ngspice_id)
+
+    ##############################################
+
+    @staticmethod
+    def _set_future_result(future):
+        if not future.done():
+            future.set_result(None)
+
+    ##############################################
+
     @staticmethod
     def _get_vsrc_data(voltage, time, node, ngspice_id, user_data):
         self = ffi.from_handle(user_data)
@@ -447,6 +865,14 @@ class NgSpiceShared:
 
     ##############################################
 
+    def background_thread_running(self, is_running, ngspice_id):
+        """ Reimplement this callback in a subclass to process the start and the end of the background
+        thread.
+        """
+        return 0
+
+    ##############################################
+
     def get_vsrc_data(self, voltage, time, node, ngspice_id):
         """ Reimplement this callback in a subclass to provide external voltage source. """
         self._logger.debug('ngspice_id-{} get_vsrc_data @{} node {}'.format(ngspice_id, time, node))
@@ -465,14 +891,18 @@ class NgSpiceShared:
 
         """ Load the given circuit string. """
 
+        self.collect_garbage(circuit_loading=True)
+
         circuit_lines = [line for line in str(circuit).split('\n') if line]
         circuit_lines_keepalive = [ffi.new("char[]", line.encode('utf8'))
                                    for line in circuit_lines]
         circuit_lines_keepalive += [ffi.NULL]
         circuit_array = ffi.new("char *[]", circuit_lines_keepalive)
+        self._generation += 1
         rc = self._ngspice_shared.ngSpice_Circ(circuit_array)
         if rc:
             raise NameError("ngSpice_Circ returned {}".format(rc))
+        self._number_of_circuits += 1
 
         # for line in circuit_lines:
         #     rc = self._ngspice_shared.ngSpice_Command('circbyline ' + line)
@@ -481,21 +911,139 @@ class NgSpiceShared:
 
     ##############################################
 
-    def run(self):
+    def exec_command(self, command):
+
+        """ Execute a command in the interpreter of ngspice. """
+
+        self._logger.debug('exec command {}'.format(command))
+        self._generation += 1
+        rc = self._ngspice_shared.ngSpice_Command(command.encode('utf8'))
+        if rc:
+            raise NameError("ngSpice_Command '{}' returned {}".format(command, rc))
+
+    ##############################################
 
-        """ Run the simulation in the background thread and wait until the simulation is done. """
+    def _bg_command(self, command):
 
-        rc = self._ngspice_shared.ngSpice_Command(b'bg_run')
+        command = 'bg_' + command
+        self._logger.debug('exec command {}'.format(command))
+        self._simulation_done.clear()
+        self._generation += 1
+        if self._data_capture is not None:
+            self._data_capture.start()
+        rc = self._ngspice_shared.ngSpice_Command(command.encode('utf8'))
         if rc:
-            raise NameError("ngSpice_Command bg_run returned {}".format(rc))
+            self._simulation_done.set()
+            raise NameError("ngSpice_Command '{}' returned {}".format(command, rc))
+
+    ##############################################
 
-        time.sleep(.1) # required before to test if the simulation is running
-        while (self._ngspice_shared.ngSpice_running()):
-            time.sleep(.1)
+    def _bg_run(self):
+
+        # the garbage could be already collected before, e.g. to record the plot names
+        if self._collected_generation != self._generation:
+            self.collect_garbage()
+        self._bg_command('run')
+
+    ##############################################
+
+    def _wait_thread_exit(self):
+
+        # The callback is called just before the background thread exits
+        while self._ngspice_shared.ngSpice_running():
+            time.sleep(.001)
         self._logger.debug("Simulation is done")
 
     ##############################################
 
+    def run(self, background=False, timeout=None, cancellation_token=None):
+
+        """ Run the simulation in the background thread and wait until the simulation is done.
+
+        If *background* is set, return immediately after the start of the simulation, use
+        :meth:`wait` to wait the end.
+
+        The simulation is halted if it runs longer than *timeout* seconds or if the
+        :obj:`PySpice.Spice.Cancellation.CancellationToken` is cancelled, cf. :meth:`wait`.
+        """
+
+        self._bg_run()
+        if not background:
+            self.wait(timeout, cancellation_token)
+
+    ##############################################
+
+    def exec_background_command(self, command, timeout=None, cancellation_token=None):
+
+        """ Execute a command, e.g. an analysis, in the background thread and wait until it is done.
+
+        The command is halted if it runs longer than *timeout* seconds or if the
+        :obj:`PySpice.Spice.Cancellation.CancellationToken` is cancelled, cf. :meth:`wait`.
+        """
+
+        self._bg_command(command)
+        self.wait(timeout, cancellation_token)
+
+    ##############################################
+
+    def halt(self):
+
+        """ Halt the simulation running in the background thread. """
+
+        self.exec_command('bg_halt')
+
+    ##############################################
+
+    def wait(self, timeout=None, cancellation_token=None):
+
+        """ Wait until the simulation is done.
+
+        Halt the simulation and raise :exc:`PySpice.Spice.Cancellation.SimulationTimeout` if it
+        runs longer than *timeout* seconds, or raise
+        :exc:`PySpice.Spice.Cancellation.SimulationCancelled` if the token is cancelled.
+        """
+
+        with registered(cancellation_token, self.halt):
+            done = self._simulation_done.wait(timeout)
+            if not done:
+                self._logger.warning("Halt the simulation after {} s".format(timeout))
+                self.halt()
+                self._simulation_done.wait()
+        self._wait_thread_exit()
+        if not done:
+            raise SimulationTimeout("Simulation timeout after {} s".format(timeout))
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+
+    ##############################################
+
+    async def run_async(self):
+
+        """ Run the simulation in the background thread and return when the simulation is done
+        without blocking the event loop.
+
+        Usage::
+
+            await ngspice_shared.run_async()
+
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._pending_futures_lock:
+            self._pending_futures.append((loop, future))
+        try:
+            self._bg_run()
+        except Exception:
+            with self._pending_futures_lock:
+                self._pending_futures.remove((loop, future))
+            raise
+        await future
+        # the callback is called just before the thread exits, do not block the event loop
+        await loop.run_in_executor(None, self._wait_thread_exit)
+
+    ##############################################
+
     def _convert_string_array(self, array):
 
         strings = []
@@ -519,44 +1067,317 @@ class NgSpiceShared:
 
     ##############################################
 
-    def plot(self, plot_name):
+    @property
+    def current_plot(self):
+
+        """ Return the name of the current plot, i.e. the plot of the last simulation. """
+
+        return ffi_string_utf8(self._ngspice_shared.ngSpice_CurPlot())
+
+    ##############################################
+
+    def plot(self, plot_name, ownership='owned'):
 
-        """ Return the corresponding plot. """
+        """ Return the corresponding plot, the vectors are retrieved on demand.
 
-        plot = Plot(plot_name)
-        all_vectors_c = self._ngspice_shared.ngSpice_AllVecs(plot_name.encode('utf8'))
-        i = 0
-        while (True):
-            if all_vectors_c[i] == ffi.NULL:
-                break
+        If *ownership* is 'owned', the data of a vector are copied from the simulator memory.  If
+        it is 'borrowed', they are a view on the simulator memory, which is freed by the next
+        commands, thus the data of a borrowed vector cannot be accessed after the next command.  In
+        both cases, the vectors must be retrieved before the next command, cf. :class:`Plot`.
+        """
+
+        if ownership not in ('owned', 'borrowed'):
+            raise ValueError("Invalid ownership {}".format(ownership))
+        return Plot(plot_name, self._vector_names(plot_name), ngspice_shared=self, ownership=ownership)
+
+    ##############################################
+
+    def _vector_names(self, plot_name):
+
+        return self._convert_string_array(self._ngspice_shared.ngSpice_AllVecs(plot_name.encode('utf8')))
+
+    ##############################################
+
+    def _get_vector_info(self, plot_name, vector_name):
+
+        name = '.'.join((plot_name, vector_name))
+        vector_info = self._ngspice_shared.ngGet_Vec_Info(name.encode('utf8'))
+        if vector_info == ffi.NULL:
+            raise NameError("Vector {} not found".format(name))
+        self._logger.debug("vector {} type {} flags {} length {}".format(name,
+                                                                         vector_info.v_type,
+                                                                         vector_info.v_flags,
+                                                                         vector_info.v_length))
+        return vector_info
+
+    ##############################################
+
+    @staticmethod
+    def _vector_pointer(vector_info):
+
+        """ Return the data pointer and the dtype of the vector. """
+
+        # flags: VF_REAL = 1 << 0, VF_COMPLEX = 1 << 1
+        if vector_info.v_compdata == ffi.NULL:
+            return vector_info.v_realdata, np.float64
+        else:
+            # ngcomplex_t has the memory layout of complex128
+            return vector_info.v_compdata, np.complex128
+
+    ##############################################
+
+    @classmethod
+    def _vector_view(cls, vector_info):
+
+        """ Return the data of the vector as an array view on the simulator memory. """
+
+        pointer, dtype = cls._vector_pointer(vector_info)
+        size = vector_info.v_length*np.dtype(dtype).itemsize
+        return np.frombuffer(ffi.buffer(pointer, size), dtype=dtype)
+
+    ##############################################
+
+    @classmethod
+    def _vector_copy(cls, vector_info):
+
+        """ Return a copy of the data of the vector. """
+
+        pointer, dtype = cls._vector_pointer(vector_info)
+        array = np.empty(vector_info.v_length, dtype=dtype)
+        if array.nbytes:
+            ffi.memmove(ffi.from_buffer(array), pointer, array.nbytes)
+        return array
+
+    ##############################################
+
+    def _get_vector(self, plot_name, vector_name, ownership='owned'):
+
+        vector_info = self._get_vector_info(plot_name, vector_name)
+        vector_type = self.simulation_type[vector_info.v_type]
+        if ownership == 'borrowed':
+            return Vector(vector_name, vector_type, self._vector_view(vector_info),
+                          ngspice_shared=self, generation=self._generation)
+        else:
+            return Vector(vector_name, vector_type, self._vector_copy(vector_info))
+
+    ##############################################
+
+    @property
+    def number_of_circuits(self):
+        """ Number of circuits loaded in the simulator. """
+        return self._number_of_circuits
+
+    ##############################################
+
+    def destroy(self, plot_name='all'):
+
+        """ Destroy the given plot, all the plots by default, and free the vectors. """
+
+        self.exec_command('destroy {}'.format(plot_name))
+        if plot_name == 'all':
+            self._plot_sizes.clear()
+        else:
+            self._plot_sizes.pop(plot_name, None)
+
+    ##############################################
+
+    def remove_circuit(self):
+
+        """ Remove the current circuit. """
+
+        if self._number_of_circuits:
+            self.exec_command('remcirc')
+            self._number_of_circuits -= 1
+
+    ##############################################
+
+    def remove_circuits(self):
+
+        """ Remove all the circuits. """
+
+        while self._number_of_circuits:
+            self.remove_circuit()
+
+    ##############################################
+
+    def reset(self):
+
+        """ Destroy all the plots and remove all the circuits. """
+
+        self.destroy()
+        self.remove_circuits()
+
+    ##############################################
+
+    def _plot_size(self, plot_name):
+
+        size = 0
+        for vector_name in self._vector_names(plot_name):
+            vector_info = self._get_vector_info(plot_name, vector_name)
+            if vector_info.v_compdata == ffi.NULL:
+                size += vector_info.v_length*8
             else:
-                vector_name = ffi_string_utf8(all_vectors_c[i])
-                name = '.'.join((plot_name, vector_name))
-                vector_info = self._ngspice_shared.ngGet_Vec_Info(name.encode('utf8'))
-                vector_type = vector_info.v_type
-                length = vector_info.v_length
-                self._logger.debug("vector[{}] {} type {} flags {} length {}".format(i,
-                                                                                     vector_name,
-                                                                                     vector_type,
-                                                                                     vector_info.v_flags,
-                                                                                     length))
-                # flags: VF_REAL = 1 << 0, VF_COMPLEX = 1 << 1
-                if vector_info.v_compdata == ffi.NULL:
-                    # for k in xrange(length):
-                    #     print("  [{}] {}".format(k, vector_info.v_realdata[k]))
-                    array = np.frombuffer(ffi.buffer(vector_info.v_realdata, length*8), dtype=np.float64)
-                else:
-                    # for k in xrange(length):
-                    #     value = vector_info.v_compdata[k]
-                    #     print(ffi.addressof(value, field='cx_real'), ffi.addressof(value, field='cx_imag'))
-                    #     print("  [{}] {} + i {}".format(k, value.cx_real, value.cx_imag))
-                    tmp_array = np.frombuffer(ffi.buffer(vector_info.v_compdata, length*8*2), dtype=np.float64)
-                    array = np.array(tmp_array[0::2], dtype=np.complex64)
-                    array.imag = tmp_array[1::2]
-                plot[vector_name] = Vector(vector_name, self.simulation_type[vector_type], array)
-            i += 1
+                size += vector_info.v_length*16
+        return size
 
-        return plot
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the size of the vector data of the plots in bytes.
+
+        The size of a plot is computed once, when the simulation which creates it is done, except
+        for the constant plot which can be modified by commands.
+        """
+
+        plot_names = self.plot_names
+        # forget the plots destroyed by a command
+        for plot_name in set(self._plot_sizes) - set(plot_names):
+            del self._plot_sizes[plot_name]
+
+        size = 0
+        simulation_done = self._simulation_done.is_set()
+        for plot_name in plot_names:
+            plot_size = self._plot_sizes.get(plot_name, None)
+            if plot_size is None:
+                plot_size = self._plot_size(plot_name)
+                # a running simulation appends points to the current plot
+                if simulation_done and plot_name != 'const':
+                    self._plot_sizes[plot_name] = plot_size
+            size += plot_size
+        return size
+
+    ##############################################
+
+    def collect_garbage(self, number_of_new_plots=1, circuit_loading=False):
+
+        """ Apply the retention policy before a simulation which creates *number_of_new_plots* plots,
+        or before the loading of a circuit if *circuit_loading* is set, in this case the circuits
+        are removed, and the plots too if the memory usage exceeds the high-water mark.
+
+        This method is called by :meth:`load_circuit` and :meth:`run`, unless it was called after
+        the last command, thus a plot returned by :meth:`plot` must be read before it is destroyed
+        by the next simulations.
+        """
+
+        if self._memory_high_water_mark is not None:
+            # the plot sizes are cached, thus this check is cheap
+            memory_usage = self.memory_usage()
+            if memory_usage > self._memory_high_water_mark:
+                self._logger.info("Memory usage {} exceeds the high-water mark {}, reset".format(
+                    memory_usage, self._memory_high_water_mark))
+                if circuit_loading:
+                    self.reset()
+                    return
+                self.destroy()
+
+        if circuit_loading:
+            if not self._retain_circuits:
+                self.remove_circuits()
+            return
+
+        if self._max_plots is not None:
+            # the plots are listed from the newest to the oldest, the constant plot is kept
+            plot_names = [plot_name for plot_name in self.plot_names if plot_name != 'const']
+            for plot_name in plot_names[max(self._max_plots - number_of_new_plots, 0):]:
+                self.destroy(plot_name)
+
+        self._collected_generation = self._generation
+
+####################################################################################################
+
+class NgSpiceSharedPool:
+
+    """This class implements a pool of :class:`NgSpiceShared` instances to run simulations in
+    parallel within the same process.
+
+    Ngspice uses global variables, thus each instance must load its own copy of the shared library,
+    i.e. *libngspice1.so*, *libngspice2.so*, etc.  These copies are loaded once at the creation of
+    the pool.  By default the identifiers 1 to *number_of_instances* are used, so as to keep
+    *libngspice.so* for a standalone instance.
+
+    Each instance runs one simulation at a time in its own background thread.  The pool hands out
+    the instances to the calling threads, thus it can be used from a
+    :obj:`concurrent.futures.ThreadPoolExecutor`, for example::
+
+        ngspice_shared_pool = NgSpiceSharedPool(number_of_instances=4)
+        plots = ngspice_shared_pool.map(desks)
+
+    The returned plots own a copy of the vector data, since the memory of the library is reused
+    by the next simulation.
+
+    """
+
+    _logger = _module_logger.getChild('NgSpiceSharedPool')
+
+    ##############################################
+
+    def __init__(self, number_of_instances=None, ngspice_ids=None, ngspice_shared_class=None):
+
+        if ngspice_ids is None:
+            if number_of_instances is None:
+                number_of_instances = os.cpu_count() or 1
+            ngspice_ids = range(1, number_of_instances +1)
+        if ngspice_shared_class is None:
+            ngspice_shared_class = NgSpiceShared
+
+        self._instances = [ngspice_shared_class(ngspice_id=ngspice_id, send_data=False)
+                           for ngspice_id in ngspice_ids]
+        self._idle_instances = queue.Queue()
+        for instance in self._instances:
+            self._idle_instances.put(instance)
+
+    ##############################################
+
+    @property
+    def number_of_instances(self):
+        return len(self._instances)
+
+    ##############################################
+
+    def acquire(self):
+
+        """ Return an idle instance, wait if all the instances are busy. """
+
+        return self._idle_instances.get()
+
+    ##############################################
+
+    def release(self, instance):
+
+        """ Give back an instance to the pool. """
+
+        self._idle_instances.put(instance)
+
+    ##############################################
+
+    def simulate(self, desk, timeout=None, cancellation_token=None):
+
+        """ Simulate the given desk on an idle instance and return the current plot detached from the
+        instance, cf. :meth:`Plot.detach`.  See :meth:`NgSpiceShared.run` for the timeout and the
+        cancellation.
+        """
+
+        instance = self.acquire()
+        try:
+            instance.load_circuit(desk)
+            try:
+                instance.run(timeout=timeout, cancellation_token=cancellation_token)
+                return instance.plot(instance.current_plot).detach()
+            finally:
+                # free the memory of the library for the next simulation
+                instance.reset()
+        finally:
+            self.release(instance)
+
+    ##############################################
+
+    def map(self, desks):
+
+        """ Simulate the desks in parallel and return the list of plots. """
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.number_of_instances) as executor:
+            return list(executor.map(self.simulate, desks))
 
 ####################################################################################################
 #
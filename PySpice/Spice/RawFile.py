@@ -82,13 +82,16 @@ Time, node voltages and source branch currents:
 ####################################################################################################
 
 import logging
+import os
+import re
+
 import numpy as np
 
 ####################################################################################################
 
 from ..Probe.WaveForm import (OperatingPoint, SensitivityAnalysis,
                               DcAnalysis, AcAnalysis, TransientAnalysis,
-                              WaveForm)
+                              WaveForm, WaveFormArray)
 
 ####################################################################################################
 
@@ -96,6 +99,31 @@ _module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
+# a label ends at the first colon, the title and the date can contain colons
+_header_field_re = re.compile(r'^[ \t]*([A-Za-z][^:\n]*?)[ \t]*:[ \t]*(.*?)[ \t\r]*$', re.M)
+_temperature_line_re = re.compile(r'^[ \t]*Doing analysis at TEMP.*$', re.M)
+_variables_line_re = re.compile(r'^[ \t]*Variables:[ \t\r]*$', re.M)
+_variable_line_re = re.compile(r'^[ \t]*(\d+)[ \t]+(\S+)[ \t]+(\S+)', re.M)
+
+_required_header_fields = ('Title', 'Date', 'Plotname', 'Flags', 'No. Variables', 'No. Points')
+
+####################################################################################################
+
+def map_raw_file(path):
+
+    """Return a read-only memory map of the raw file as an array of bytes.
+
+    The pages are only read when the variable data are accessed, thus a raw file can be larger than
+    the memory.  On Posix systems the file can be removed after the mapping.
+
+    """
+
+    if os.path.getsize(path) == 0:
+        return b''
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+####################################################################################################
+
 class Variable:
 
     """This class implements a variable or probe in a SPICE simulation output.
@@ -109,16 +137,43 @@ class Variable:
 
       :attr:`unit`
 
+      :attr:`data`
+        the values, they are read from the raw file at the first access
+
     """
 
     ##############################################
 
-    def __init__(self, index, name, unit):
+    def __init__(self, index, name, unit, raw_file=None):
 
         self.index = int(index)
         self.name = str(name)
         self.unit = str(unit) # could be guessed from name also for voltage node and branch current
-        self.data = None
+        self._raw_file = raw_file
+        self._data = None
+
+    ##############################################
+
+    @property
+    def data(self):
+        if self._data is None and self._raw_file is not None:
+            self._raw_file.decode()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    ##############################################
+
+    def __getstate__(self):
+
+        # the data of a raw file variable is a view on the data matrix, which is pickled by the raw
+        # file, thus it is sliced again at unpickling
+        state = self.__dict__.copy()
+        if self._raw_file is not None:
+            state['_data'] = None
+        return state
 
     ##############################################
 
@@ -193,13 +248,23 @@ class RawFile:
 
     Public Attributes:
 
+      :attr:`binary`
+        set if the data are in binary format, else in ASCII format
+
       :attr:`circuit`
         same as title
 
       :attr:`data`
+        array of shape (number of points, number of variables)
+
+      :attr:`data_offset`
+        offset of the data in the buffer
 
       :attr:`date`
 
+      :attr:`end`
+        offset just after the data in the buffer
+
       :attr:`flags`
         'real' or 'complex'
 
@@ -207,6 +272,9 @@ class RawFile:
 
       :attr:`number_of_variables`
 
+      :attr:`offset`
+        offset of the header in the buffer
+
       :attr:`plot_name`
         AC Analysis, Operating Point, Sensitivity Analysis, DC transfer characteristic
 
@@ -222,127 +290,313 @@ class RawFile:
 
     _logger = _module_logger.getChild('RawFile')
 
+    _binary_line = b'Binary:\n'
+    _values_line = b'Values:\n'
+
     ##############################################
 
-    def __init__(self, stdout, number_of_points):
+    def __init__(self, stdout, number_of_points=None, offset=0, data_section=None):
 
+        """The number of points is read from the header if *number_of_points* is :obj:`None`, this
+        is the case for a raw file written by the *write* command.  But in server mode, ngspice
+        writes the header before the simulation and the number of points must be provided.
+
+        The plot is read from the byte *offset*, the attribute :attr:`end` is set to the offset
+        just after the plot, cf. :meth:`read_plots`.  Only the header is parsed, the data are
+        decoded at the first access to a variable data, cf. :meth:`decode`.
+
+        *stdout* is a bytes object or a memory map, cf. :meth:`from_file`.
+
+        *data_section* is the location and the label line of the data section if it was already
+        found, cf. :meth:`_find_data_section`.
+
+        """
+
+        self._raw_data = stdout
+        self.offset = offset
+        self.data_offset = self._read_header(stdout, offset, data_section)
+        if number_of_points is None:
+            number_of_points = self._header_number_of_points
         self.number_of_points = number_of_points
-        
-        raw_data = self._read_header(stdout)
-        self._read_variable_data(raw_data)
+
+        self.end = self._data_end()
         # self._to_analysis()
 
     ##############################################
 
-    def _read_header(self, stdout):
+    @classmethod
+    def from_file(cls, path):
 
-        """ Parse the header """
-        
-        binary_line = b'Binary:\n'
-        binary_location = stdout.find(binary_line)
+        """Read a raw file using a memory map, cf. :func:`map_raw_file`."""
+
+        return cls(map_raw_file(path))
+
+    ##############################################
+
+    @staticmethod
+    def _find(data, pattern, offset=0):
+
+        """Return the location of *pattern* in *data* from *offset*, or -1.  *data* can be a bytes
+        object or a buffer like a memory map, which is then searched by chunks.
+
+        """
+
+        if isinstance(data, bytes):
+            return data.find(pattern, offset)
+
+        chunk_size = 64*1024
+        start = offset
+        while start < len(data):
+            chunk = bytes(data[start:start + chunk_size + len(pattern) - 1])
+            location = chunk.find(pattern)
+            if location >= 0:
+                return start + location
+            start += chunk_size
+        return -1
+
+    ##############################################
+
+    @classmethod
+    def _find_data_section(cls, data, offset=0):
+
+        """Return the location and the label line of the first data section from *offset*, the
+        location is -1 if there is no data section.
+
+        The header lines are walked up to the first *Binary:* or *Values:* line, thus only the
+        header is read, even if *data* is a memory map.  The lines can end with CRLF, the returned
+        label line is the line as it is written.
+
+        """
+
+        labels = (cls._binary_line, cls._values_line)
+        chunk_size = 4*1024
+        start = offset
+        while start < len(data):
+            chunk = bytes(data[start:start + chunk_size])
+            line_start = 0
+            line_end = chunk.find(b'\n')
+            while line_end >= 0:
+                line = chunk[line_start:line_end + 1]
+                if line.endswith(b'\r\n'):
+                    label = line[:-2] + b'\n'
+                else:
+                    label = line
+                if label in labels:
+                    return start + line_start, line
+                line_start = line_end + 1
+                line_end = chunk.find(b'\n', line_start)
+            if start + len(chunk) >= len(data):
+                break
+            if line_start:
+                start += line_start
+            else:
+                # the line is longer than the chunk
+                chunk_size *= 2
+        return -1, None
+
+    ##############################################
+
+    @classmethod
+    def read_plots(cls, data):
+
+        """Read a raw file which contains several plots, like the file written by the *write* command
+        when the *appendwrite* option is set, and return a list of :class:`RawFile` instances.
+
+        Only the headers are parsed, the plots are indexed by their byte offsets and the data of a
+        plot are decoded when one of its variables is accessed.
+
+        """
+
+        raw_files = []
+        offset = 0
+        while offset < len(data):
+            data_section = cls._find_data_section(data, offset)
+            if data_section[0] < 0:
+                break
+            raw_file = cls(data, offset=offset, data_section=data_section)
+            raw_files.append(raw_file)
+            offset = raw_file.end
+        return raw_files
+
+    ##############################################
+
+    def _read_header(self, stdout, offset=0, data_section=None):
+
+        """ Parse the header and return the offset of the data """
+
+        if data_section is None:
+            data_section = self._find_data_section(stdout, offset)
+        binary_location, data_line = data_section
         if binary_location < 0:
             raise NameError('Cannot locate binary data')
-        raw_data_start = binary_location + len(binary_line)
-        # self._logger.debug('\n' + stdout[:raw_data_start].decode('utf-8'))
-        header_lines = stdout[:binary_location].splitlines()
-        raw_data = stdout[raw_data_start:]
-        header_line_iterator = iter(header_lines)
-        
-        self.circuit = self._read_header_field_line(header_line_iterator, 'Circuit')
-        self.temperature = self._read_header_line(header_line_iterator, 'Doing analysis at TEMP')
-        self.warnings = [self._read_header_field_line(header_line_iterator, 'Warning')
-                         for i in range(stdout.count(b'Warning'))]
+        self.binary = data_line.rstrip() == self._binary_line.rstrip()
+        raw_data_start = binary_location + len(data_line)
+        header = bytes(stdout[offset:binary_location]).decode('utf-8')
+        # self._logger.debug('\n' + header)
+
+        match = _variables_line_re.search(header)
+        if match is None:
+            raise NameError("Cannot locate the variables in the header")
+        field_header, variable_header = header[:match.start()], header[match.end():]
+
+        fields = {}
+        self.warnings = []
+        for label, value in _header_field_re.findall(field_header):
+            if label == 'Warning':
+                self.warnings.append(value)
+            else:
+                fields.setdefault(label, value)
         for warning in self.warnings:
-            self._logger.warn(warning)
-        self.title = self._read_header_field_line(header_line_iterator, 'Title')
-        self.date = self._read_header_field_line(header_line_iterator, 'Date')
-        self.plot_name = self._read_header_field_line(header_line_iterator, 'Plotname')
-        self.flags = self._read_header_field_line(header_line_iterator, 'Flags')
-        self.number_of_variables = int(self._read_header_field_line(header_line_iterator, 'No. Variables'))
-        self._read_header_field_line(header_line_iterator, 'No. Points')
-        self._read_header_field_line(header_line_iterator, 'Variables', has_value=False)
-        self._read_header_field_line(header_line_iterator, 'No. of Data Columns ')
+            self._logger.warning(warning)
+        for label in _required_header_fields:
+            if label not in fields:
+                raise NameError("Missing header field {}".format(label))
+
+        # The circuit and temperature lines are only written in server mode
+        self.title = fields['Title']
+        self.circuit = fields.get('Circuit', self.title)
+        match = _temperature_line_re.search(field_header)
+        self.temperature = match.group(0).strip() if match is not None else None
+        self.date = fields['Date']
+        self.plot_name = fields['Plotname']
+        self.flags = fields['Flags']
+        self.number_of_variables = int(fields['No. Variables'])
+        self._header_number_of_points = int(fields['No. Points'])
+
         self.variables = {}
-        for i in range(self.number_of_variables):
-            line = (next(header_line_iterator)).decode('utf-8')
-            self._logger.debug(line)
-            items = [x.strip() for x in line.split('\t') if x]
-            # 0 frequency frequency grid=3
-            index, name, unit = items[:3]
-            self.variables[name] = Variable(index, name, unit)
-        # self._read_header_field_line(header_line_iterator, 'Binary', has_value=False)
-        
-        return raw_data
+        # 0 frequency frequency grid=3
+        for index, name, unit in _variable_line_re.findall(variable_header):
+            self.variables[name] = Variable(index, name, unit, raw_file=self)
+        if len(self.variables) != self.number_of_variables:
+            raise NameError("Expected {} variables instead of {}".format(self.number_of_variables,
+                                                                         len(self.variables)))
+
+        return raw_data_start
 
     ##############################################
 
-    def _read_line(self, header_line_iterator):
+    def _data_end(self):
+
+        """ Return the offset of the end of the data without reading them. """
+
+        if not self.binary:
+            # the section ends at the next plot
+            end = self._find(self._raw_data, b'Title:', self.data_offset)
+            return end if end >= 0 else len(self._raw_data)
+        itemsize = 16 if self.flags == 'complex' else 8
+        return self.data_offset + self.number_of_variables*self.number_of_points*itemsize
 
-        """ Return the next line """
+    ##############################################
+
+    @property
+    def data(self):
+        self.decode()
+        return self._data
 
-        # Fixme: self._header_line_iterator, etc.
+    ##############################################
 
-        line = None
-        while not line:
-            line = next(header_line_iterator)
-        return line.decode('utf-8')
+    @property
+    def decoded(self):
+        return self._raw_data is None
 
     ##############################################
 
-    def _read_header_line(self, header_line_iterator, head_line):
+    def decode(self):
 
-        """ Read an header line and check it starts with *head_line*. """
+        """ Read the variable data, it is done once at the first access to a variable data. """
 
-        line = self._read_line(header_line_iterator)
-        self._logger.debug(line)
-        if not line.startswith(head_line):
-            raise NameError("Unexpected line: %s" % (line))
+        if self._raw_data is not None:
+            self._read_variable_data(self._raw_data, self.data_offset)
+            self._raw_data = None
 
     ##############################################
 
-    def _read_header_field_line(self, header_line_iterator, expected_label, has_value=True):
+    def __getstate__(self):
 
-        """ Read an header line and check it starts with *expected_label*.
+        # the buffer is not pickled, the data are decoded before
+        self.decode()
+        return self.__dict__
 
-        Return the values next to the label if the flag *has_value* is set.
-        """
+    ##############################################
 
-        line = self._read_line(header_line_iterator)
-        self._logger.debug(line)
-        if has_value:
-            # a title can have ': ' after 'title: '
-            location = line.find(': ') # first occurence
-            label, value = line[:location], line[location+2:]
-        else:
-            label = line[:-1]
-        if label != expected_label:
-            raise NameError("Expected label %s instead of %s" % (expected_label, label))
-        if has_value:
-            return value.strip()
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self._set_variable_data()
+
+    ##############################################
+
+    def _set_variable_data(self):
+
+        """ Set the data of each variable as a column view on the data matrix. """
+
+        for variable in self.variables.values():
+            variable.data = self._data[:, variable.index]
 
     ##############################################
 
-    def _read_variable_data(self, raw_data):
+    def _read_variable_data(self, raw_data, offset=0):
+
+        """ Read the raw data from *offset*, set the variable values and return the offset of the
+        end of the data.
 
-        """ Read the raw data and set the variable values. """
+        The data are not copied: the binary section is a (points, columns) array of float64 values,
+        or of complex128 values for complex data, and each variable is a strided column view on the
+        buffer.  Thus these views are read-only if the buffer is immutable.
+        """
 
         if self.flags == 'real':
-            number_of_columns = self.number_of_variables
+            dtype = np.float64
         elif self.flags == 'complex':
-            number_of_columns = 2*self.number_of_variables
+            dtype = np.complex128
         else:
             raise NotImplementedError
+
+        if not self.binary:
+            return self._read_ascii_variable_data(raw_data, offset)
         
-        input_data = np.fromstring(raw_data, count=number_of_columns*self.number_of_points, dtype='f8')
-        input_data = input_data.reshape((self.number_of_points, number_of_columns))
-        input_data = input_data.transpose()
+        count = self.number_of_variables*self.number_of_points
+        input_data = np.frombuffer(memoryview(raw_data), count=count, dtype=dtype, offset=offset)
+        end = offset + input_data.nbytes
+        input_data = input_data.reshape((self.number_of_points, self.number_of_variables))
         # np.savetxt('raw.txt', input_data)
+        self._data = input_data
+        self._set_variable_data()
+
+        return end
+
+    ##############################################
+
+    def _read_ascii_variable_data(self, raw_data, offset=0):
+
+        """ Read the values of a raw file in ASCII format, see :meth:`_read_variable_data`.
+
+        Each point is written as the point index followed by a value per line, a complex value is
+        written as *real,imaginary*.  The whole section is parsed at once.
+        """
+
+        end = self.end
+        text = bytes(raw_data[offset:end]).replace(b',', b' ').decode('ascii')
+        values = np.fromstring(text, dtype=np.float64, sep=' ')
+
         if self.flags == 'complex':
-            raw_data = input_data
-            input_data = np.array(raw_data[0::2], dtype='complex64')
-            input_data.imag = raw_data[1::2]
-        for variable in self.variables.values():
-            variable.data = input_data[variable.index]
+            number_of_columns = 1 + 2*self.number_of_variables
+        else:
+            number_of_columns = 1 + self.number_of_variables
+        if not self.number_of_points:
+            self.number_of_points = values.size // number_of_columns
+        count = number_of_columns*self.number_of_points
+        if values.size < count:
+            raise NameError("Expected {} values instead of {}".format(count, values.size))
+
+        # drop the point index column
+        input_data = values[:count].reshape((self.number_of_points, number_of_columns))[:, 1:]
+        if self.flags == 'complex':
+            input_data = np.ascontiguousarray(input_data).view(np.complex128)
+        self._data = input_data
+        self._set_variable_data()
+
+        return end
 
     ##############################################
 
@@ -413,6 +667,27 @@ class RawFile:
 
     ##############################################
 
+    def _waveform_arrays(self, abscissa=None):
+
+        """Return the node and branch waveforms as :class:`PySpice.Probe.WaveForm.WaveFormArray`
+        instances, which are backed by the transposed data matrix, thus the waveforms are strided
+        views on the data and are not copied.
+
+        """
+
+        array = self.data.T
+        waveform_arrays = []
+        for predicate in (Variable.is_voltage_node, Variable.is_branch_current):
+            variables = [variable for variable in self.variables.values() if predicate(variable)]
+            waveform_arrays.append(WaveFormArray(array,
+                                                 [variable.simplified_name for variable in variables],
+                                                 [variable.unit for variable in variables],
+                                                 abscissa,
+                                                 rows=[variable.index for variable in variables]))
+        return waveform_arrays
+
+    ##############################################
+
     def _to_dc_analysis(self):
 
         if 'v(v-sweep)' in self.variables:
@@ -423,21 +698,24 @@ class RawFile:
             # 
             raise NotImplementedError
         sweep = sweep_variable.to_waveform()
-        return DcAnalysis(sweep, nodes=self.nodes(), branches=self.branches())
+        nodes, branches = self._waveform_arrays()
+        return DcAnalysis(sweep, nodes=nodes, branches=branches)
 
     ##############################################
 
     def _to_ac_analysis(self):
 
         frequency = self.variables['frequency'].to_waveform(to_real=True)
-        return AcAnalysis(frequency, nodes=self.nodes(), branches=self.branches())
+        nodes, branches = self._waveform_arrays()
+        return AcAnalysis(frequency, nodes=nodes, branches=branches)
 
     ##############################################
 
     def _to_transient_analysis(self):
 
         time = self.variables['time'].to_waveform(to_real=True)
-        return TransientAnalysis(time, nodes=self.nodes(abscissa=time), branches=self.branches(abscissa=time))
+        nodes, branches = self._waveform_arrays(abscissa=time)
+        return TransientAnalysis(time, nodes=nodes, branches=branches)
 
 ####################################################################################################
 #
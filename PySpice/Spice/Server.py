@@ -38,17 +38,31 @@ The line "run simulation(s) aborted" in the standard error indicates the simulat
 Any line starting with *Warning* in the standard error indicates non critical error in the
 simulation process.
 
+Alternatively, ngspice can run in batch mode and write the simulation output in a raw file, which is
+then memory-mapped, cf. the *raw_file* parameter of :class:`SpiceServer`.  Thus the output is not
+held in memory and only the pages of the accessed variables are read.
+
+A simulation can be limited by a wall-clock timeout and cancelled using a
+:class:`PySpice.Spice.Cancellation.CancellationToken`, ngspice is then killed and
+:exc:`PySpice.Spice.Cancellation.SimulationTimeout` or
+:exc:`PySpice.Spice.Cancellation.SimulationCancelled` is raised.
+
 """
 
 ####################################################################################################
 
+import asyncio
 import logging
+import os
 import re
+import shutil
 import subprocess
+import tempfile
 
 ####################################################################################################
 
-from .RawFile import RawFile
+from .Cancellation import CancellationToken, SimulationTimeout, registered
+from .RawFile import RawFile, map_raw_file
 
 ####################################################################################################
 
@@ -56,6 +70,28 @@ _module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
+_spice_versions = {}
+
+def spice_version(spice_command='ngspice'):
+
+    """Return the version banner of ngspice, i.e. the output of ``ngspice -v``, or an empty string if
+    ngspice cannot be run.  The result is cached for each command.
+
+    """
+
+    version = _spice_versions.get(spice_command, None)
+    if version is None:
+        try:
+            output = subprocess.check_output((spice_command, '-v'), stderr=subprocess.STDOUT)
+            version = output.decode('utf-8', errors='replace').strip()
+        except (OSError, subprocess.CalledProcessError):
+            _module_logger.warning("Cannot get the version of {}".format(spice_command))
+            version = ''
+        _spice_versions[spice_command] = version
+    return version
+
+####################################################################################################
+
 class SpiceServer:
 
     """This class wraps the execution of ngspice in server mode and convert the output to a Python data
@@ -68,15 +104,62 @@ class SpiceServer:
 
     It returns a :obj:`PySpice.Spice.RawFile` instance.
 
+    The *timeout* parameter sets the default wall-clock timeout of a simulation in seconds.
+
+    If the *raw_file* parameter is set, ngspice runs in batch mode and writes a raw file which is
+    memory-mapped, cf. :func:`PySpice.Spice.RawFile.map_raw_file`.  The raw file is written in a
+    temporary directory which is removed after the mapping, or in a new directory in *directory*
+    which is kept, for example to use a cache path or on a system where a mapped file cannot be
+    removed.
+
     """
 
     _logger = _module_logger.getChild('SpiceServer')
 
     ##############################################
 
-    def __init__(self, spice_command='ngspice'):
+    def __init__(self, spice_command='ngspice', timeout=None, raw_file=False, directory=None):
 
         self._spice_command = spice_command
+        self._timeout = timeout
+        self._raw_file = raw_file
+        self._directory = directory
+
+    ##############################################
+
+    @property
+    def spice_command(self):
+        return self._spice_command
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def raw_file(self):
+        return self._raw_file
+
+    ##############################################
+
+    def _communicate(self, process, input_=None, timeout=None, cancellation_token=None):
+
+        """Wait the end of the process, kill it on timeout or cancellation."""
+
+        if timeout is None:
+            timeout = self._timeout
+
+        with registered(cancellation_token, process.kill):
+            try:
+                stdout, stderr = process.communicate(input_, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._logger.warning("Kill the spice subprocess after {} s".format(timeout))
+                process.kill()
+                process.communicate()
+                raise SimulationTimeout("Simulation timeout after {} s".format(timeout))
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+
+        return stdout, stderr
 
     ##############################################
 
@@ -131,13 +214,16 @@ class SpiceServer:
 
     ##############################################
 
-    def __call__(self, spice_input):
+    def __call__(self, spice_input, timeout=None, cancellation_token=None):
 
         """Run SPICE in server mode as a subprocess for the given input and return a
         :obj:`PySpice.RawFile.RawFile` instance.
 
         """
 
+        if self._raw_file:
+            return self._run_raw_file(spice_input, timeout, cancellation_token)
+
         self._logger.info("Start the spice subprocess")
         
         process = subprocess.Popen((self._spice_command, '-s'),
@@ -145,7 +231,16 @@ class SpiceServer:
                                    stdout=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
         input_ = str(spice_input).encode('utf-8')
-        stdout, stderr = process.communicate(input_)
+        stdout, stderr = self._communicate(process, input_, timeout, cancellation_token)
+        
+        return self._to_raw_file(stdout, stderr)
+
+    ##############################################
+
+    def _to_raw_file(self, stdout, stderr):
+
+        """Check the output of ngspice and return a :obj:`PySpice.RawFile.RawFile` instance."""
+
         # stdout = stdout.decode('utf-8')
         stderr = stderr.decode('utf-8')
         
@@ -158,6 +253,167 @@ class SpiceServer:
         
         return RawFile(stdout, number_of_points)
 
+    ##############################################
+
+    def _check_batch_output(self, stdout, stderr):
+
+        """Check the output of ngspice in batch mode."""
+
+        stderr = stderr.decode('utf-8', errors='replace')
+        self._parse_stdout(stdout)
+        # in batch mode, errors are also reported on stderr
+        for line in stderr.splitlines():
+            if line.startswith('Error'):
+                raise NameError("Errors was found by Spice\n" + stderr)
+        self._parse_stderr(stderr)
+
+        return stderr
+
+    ##############################################
+
+    def _run_batch(self, spice_input, arguments, raw_file_name, timeout, cancellation_token):
+
+        """Run SPICE in batch mode in a new directory and return a memory map of the raw file."""
+
+        directory = tempfile.mkdtemp(prefix='pyspice-', dir=self._directory)
+        try:
+            desk_path = os.path.join(directory, 'desk.cir')
+            with open(desk_path, 'w') as f:
+                f.write(str(spice_input))
+            raw_file_path = os.path.join(directory, raw_file_name)
+            arguments = [argument.format(raw_file_path=raw_file_path) for argument in arguments]
+            process = subprocess.Popen([self._spice_command, '-b'] + arguments + [desk_path],
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       cwd=directory)
+            stdout, stderr = self._communicate(process, None, timeout, cancellation_token)
+            stderr = self._check_batch_output(stdout, stderr)
+            if not os.path.exists(raw_file_path):
+                raise NameError("The raw file was not written, ngspice returned:\n" + stderr)
+            return map_raw_file(raw_file_path)
+        finally:
+            if self._directory is None:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    ##############################################
+
+    def _run_raw_file(self, spice_input, timeout=None, cancellation_token=None):
+
+        """Run SPICE in batch mode as a subprocess for the given input and return a
+        :obj:`PySpice.RawFile.RawFile` instance backed by a memory map of the raw file.
+
+        """
+
+        self._logger.info("Start the spice subprocess in batch mode")
+
+        data = self._run_batch(spice_input, ['-r', '{raw_file_path}'], 'output.raw',
+                               timeout, cancellation_token)
+        return RawFile(data)
+
+    ##############################################
+
+    def batch(self, spice_input, raw_file_name, timeout=None, cancellation_token=None):
+
+        """Run SPICE in batch mode as a subprocess for the given input and return the list of
+        :obj:`PySpice.RawFile.RawFile` instances read from the file *raw_file_name*.
+
+        The input must have a *.control* block which writes the plots in the file *raw_file_name*
+        relatively to the working directory.
+
+        """
+
+        self._logger.info("Start the spice subprocess in batch mode")
+
+        data = self._run_batch(spice_input, [], raw_file_name, timeout, cancellation_token)
+        return RawFile.read_plots(data)
+
+####################################################################################################
+
+class AsyncSpiceServer(SpiceServer):
+
+    """This class implements an asyncio variant of :class:`SpiceServer`.
+
+    Calling an instance or :meth:`batch` returns a coroutine, the simulation runs in a subprocess
+    without blocking the event loop, ngspice is killed if the coroutine is cancelled.
+
+    Example of usage::
+
+      spice_server = AsyncSpiceServer(spice_command='/path/to/ngspice')
+      raw_file = await spice_server(spice_input)
+
+    """
+
+    _logger = _module_logger.getChild('AsyncSpiceServer')
+
+    ##############################################
+
+    def __init__(self, spice_command='ngspice', timeout=None):
+
+        super().__init__(spice_command, timeout)
+
+    ##############################################
+
+    async def __call__(self, spice_input, timeout=None, cancellation_token=None):
+
+        """Run SPICE in server mode as a subprocess for the given input and return a
+        :obj:`PySpice.RawFile.RawFile` instance.
+
+        """
+
+        self._logger.info("Start the spice subprocess")
+
+        if timeout is None:
+            timeout = self._timeout
+
+        process = await asyncio.create_subprocess_exec(self._spice_command, '-s',
+                                                       stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE)
+        input_ = str(spice_input).encode('utf-8')
+
+        def kill():
+            if process.returncode is None:
+                process.kill()
+
+        # the token can be cancelled from another thread
+        loop = asyncio.get_running_loop()
+        kill_threadsafe = lambda: loop.call_soon_threadsafe(kill)
+        with registered(cancellation_token, kill_threadsafe):
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(input_), timeout)
+            except asyncio.TimeoutError:
+                self._logger.warning("Kill the spice subprocess after {} s".format(timeout))
+                kill()
+                await process.wait()
+                raise SimulationTimeout("Simulation timeout after {} s".format(timeout))
+            except asyncio.CancelledError:
+                kill()
+                await process.wait()
+                raise
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+
+        return self._to_raw_file(stdout, stderr)
+
+    ##############################################
+
+    async def batch(self, spice_input, raw_file_name, timeout=None, cancellation_token=None):
+
+        """Asyncio variant of :meth:`SpiceServer.batch`, ngspice runs in a thread of the default
+        executor and is killed if the coroutine is cancelled.
+
+        """
+
+        token = CancellationToken()
+        loop = asyncio.get_running_loop()
+        with registered(cancellation_token, token.cancel):
+            try:
+                return await loop.run_in_executor(None, super().batch,
+                                                  spice_input, raw_file_name, timeout, token)
+            except asyncio.CancelledError:
+                token.cancel()
+                raise
+
 ####################################################################################################
 #
 # End
@@ -0,0 +1,458 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module provides a pool of long-lived ngspice processes running in pipe mode.
+
+The :class:`SpiceServer` class launches a new ngspice process for each simulation, the startup of
+the process, the loading of the model libraries and the setup of the pipes can thus cost more than
+the simulation itself for small circuits.
+
+The :class:`SpiceServerPool` class keeps a set of ngspice processes running in pipe mode (``ngspice
+-p``) and feeds them with commands.  For each simulation, a worker writes the desk in a temporary
+file and sends these commands::
+
+    source /path/to/desk.cir
+    run
+    write /path/to/output.raw
+    destroy all
+    remcirc
+    echo @@@ PySpice <job id>
+
+The last line is used as a sentinel to detect the end of the job in the standard output.  The raw
+file is then read using :class:`PySpice.Spice.RawFile.RawFile`.
+
+The :meth:`SpiceServerPool.batch` method runs a desk having a *.control* block, like the desks of
+:meth:`PySpice.Spice.Simulation.CircuitSimulator.batched_sweep`, the *run* and *write* commands are
+then omitted and the raw file is written relatively to the working directory of the worker.
+
+A worker is recycled after a given number of jobs or if the process died.  On timeout or
+cancellation, the process is killed and restarted for the next job.
+
+Example of usage::
+
+    spice_server_pool = SpiceServerPool(spice_command='/path/to/ngspice', number_of_workers=4)
+    simulator = circuit.simulator(spice_server=spice_server_pool)
+    analysis = simulator.transient(...)
+    ...
+    spice_server_pool.close()
+
+The pool is thread safe, thus it can be used within a :obj:`concurrent.futures.ThreadPoolExecutor`.
+
+"""
+
+####################################################################################################
+
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+####################################################################################################
+
+from .Cancellation import SimulationTimeout, SimulationCancelled, registered
+from .RawFile import RawFile
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class SpiceWorker:
+
+    """This class wraps a long-lived ngspice process running in pipe mode.
+
+    Public Attributes:
+
+      :attr:`number_of_jobs`
+        number of jobs done by the current process
+
+    """
+
+    _logger = _module_logger.getChild('SpiceWorker')
+
+    _sentinel = '@@@ PySpice'
+
+    ##############################################
+
+    def __init__(self, spice_command='ngspice', worker_id=0):
+
+        self._spice_command = spice_command
+        self._worker_id = worker_id
+
+        self._process = None
+        self._synchronised = True
+        self._kill_reason = None
+        self._job_id = 0
+        self.number_of_jobs = 0
+
+        self._directory = tempfile.mkdtemp(prefix='pyspice-worker-{}-'.format(worker_id))
+        self._desk_path = os.path.join(self._directory, 'desk.cir')
+        self._raw_file_path = os.path.join(self._directory, 'output.raw')
+
+    ##############################################
+
+    @property
+    def worker_id(self):
+        return self._worker_id
+
+    ##############################################
+
+    def is_alive(self):
+
+        return self._process is not None and self._process.poll() is None
+
+    ##############################################
+
+    @property
+    def synchronised(self):
+
+        """Flag set if the standard output was read up to the sentinel of the last job."""
+
+        return self._synchronised
+
+    ##############################################
+
+    def start(self):
+
+        """Start the ngspice process."""
+
+        self._logger.info("Start the spice worker {}".format(self._worker_id))
+
+        # stderr is merged to stdout so as to read a single pipe and avoid a dead lock
+        self._process = subprocess.Popen((self._spice_command, '-p'),
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT,
+                                         cwd=self._directory)
+        self._synchronised = True
+        self.number_of_jobs = 0
+
+    ##############################################
+
+    def stop(self):
+
+        """Stop the ngspice process."""
+
+        if self._process is None:
+            return
+
+        self._logger.info("Stop the spice worker {}".format(self._worker_id))
+
+        if self._process.poll() is None:
+            try:
+                self._send('quit\n')
+                self._process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+        self._process = None
+
+    ##############################################
+
+    def restart(self):
+
+        self.stop()
+        self.start()
+
+    ##############################################
+
+    def close(self):
+
+        """Stop the process and remove the temporary directory."""
+
+        self.stop()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    ##############################################
+
+    def _kill(self, reason):
+
+        """Kill the process, the pending read then reaches the end of file."""
+
+        process = self._process
+        if process is not None and process.poll() is None:
+            self._logger.warning("Kill the spice worker {}: {}".format(self._worker_id, reason))
+            self._kill_reason = reason
+            process.kill()
+
+    ##############################################
+
+    def _cancel(self):
+        self._kill('cancel')
+
+    ##############################################
+
+    def _send(self, commands):
+
+        self._process.stdin.write(commands.encode('utf-8'))
+        self._process.stdin.flush()
+
+    ##############################################
+
+    def _read_until_sentinel(self, sentinel):
+
+        """Read the standard output up to the sentinel and return the lines."""
+
+        lines = []
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                raise NameError("Spice worker {} died, ngspice returned:\n".format(self._worker_id) +
+                                b''.join(lines).decode('utf-8', errors='replace'))
+            if line.rstrip().endswith(sentinel):
+                break
+            lines.append(line)
+
+        return lines
+
+    ##############################################
+
+    def _parse_output(self, lines):
+
+        """Parse the output for errors and warnings."""
+
+        error_found = False
+        for line in lines:
+            line = line.decode('utf-8', errors='replace').rstrip()
+            if line.startswith('Error'):
+                error_found = True
+                self._logger.error(line)
+            elif line.startswith('Warning'):
+                self._logger.warning(line)
+            elif line == 'run simulation(s) aborted':
+                error_found = True
+        if error_found:
+            raise NameError("Errors was found by Spice")
+
+    ##############################################
+
+    def _run_job(self, spice_input, commands, raw_file_path, timeout, cancellation_token):
+
+        """Source the desk, send the commands and return the content of the raw file."""
+
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+
+        if not self.is_alive():
+            self.restart()
+
+        self._job_id += 1
+        self.number_of_jobs += 1
+        sentinel = '{} {}'.format(self._sentinel, self._job_id)
+
+        with open(self._desk_path, 'w') as f:
+            f.write(str(spice_input))
+        if os.path.exists(raw_file_path):
+            os.unlink(raw_file_path)
+
+        self._synchronised = False
+        self._kill_reason = None
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self._kill, ('timeout',))
+            timer.start()
+        try:
+            with registered(cancellation_token, self._cancel):
+                self._send('\n'.join(['source ' + self._desk_path] +
+                                     commands +
+                                     ['destroy all',
+                                      'remcirc',
+                                      'echo ' + sentinel,
+                                      '']))
+                lines = self._read_until_sentinel(sentinel.encode('utf-8'))
+        except (NameError, OSError):
+            if self._kill_reason == 'timeout':
+                raise SimulationTimeout("Simulation timeout after {} s".format(timeout))
+            elif self._kill_reason == 'cancel':
+                raise SimulationCancelled("Simulation was cancelled")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        self._synchronised = True
+        self._parse_output(lines)
+
+        if not os.path.exists(raw_file_path):
+            raise NameError("The raw file was not written, ngspice returned:\n" +
+                            b''.join(lines).decode('utf-8', errors='replace'))
+        with open(raw_file_path, 'rb') as f:
+            return f.read()
+
+    ##############################################
+
+    def __call__(self, spice_input, timeout=None, cancellation_token=None):
+
+        """Simulate the given desk and return a :obj:`PySpice.RawFile.RawFile` instance."""
+
+        raw_data = self._run_job(spice_input, ['run', 'write ' + self._raw_file_path],
+                                 self._raw_file_path, timeout, cancellation_token)
+        return RawFile(raw_data)
+
+    ##############################################
+
+    def batch(self, spice_input, raw_file_name, timeout=None, cancellation_token=None):
+
+        """Source a desk having a *.control* block which writes the plots in the file
+        *raw_file_name*, relatively to the working directory of the worker, and return the list of
+        :obj:`PySpice.RawFile.RawFile` instances.
+
+        """
+
+        raw_file_path = os.path.join(self._directory, raw_file_name)
+        raw_data = self._run_job(spice_input, [], raw_file_path, timeout, cancellation_token)
+        return RawFile.read_plots(raw_data)
+
+####################################################################################################
+
+class SpiceServerPool:
+
+    """This class implements a pool of ngspice workers running in pipe mode.
+
+    It has the same interface than :class:`PySpice.Spice.Server.SpiceServer`: call the pool with a
+    desk to get a :obj:`PySpice.RawFile.RawFile` instance.
+
+    A worker is recycled after *max_jobs_per_worker* jobs, if this parameter is not :obj:`None`, or
+    if its process died.
+
+    The *timeout* parameter sets the default wall-clock timeout of a simulation in seconds.
+
+    """
+
+    _logger = _module_logger.getChild('SpiceServerPool')
+
+    ##############################################
+
+    def __init__(self, spice_command='ngspice', number_of_workers=None, max_jobs_per_worker=1000,
+                 timeout=None):
+
+        if number_of_workers is None:
+            number_of_workers = os.cpu_count() or 1
+
+        self._spice_command = spice_command
+        self._timeout = timeout
+        self._max_jobs_per_worker = max_jobs_per_worker
+
+        self._workers = [SpiceWorker(spice_command, i) for i in range(number_of_workers)]
+        self._idle_workers = queue.Queue()
+        for worker in self._workers:
+            self._idle_workers.put(worker)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    ##############################################
+
+    @property
+    def spice_command(self):
+        return self._spice_command
+
+    @property
+    def number_of_workers(self):
+        return len(self._workers)
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    ##############################################
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ##############################################
+
+    def close(self):
+
+        """Stop the workers."""
+
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                for worker in self._workers:
+                    worker.close()
+
+    ##############################################
+
+    def _recycle(self, worker):
+
+        if (self._max_jobs_per_worker is not None
+            and worker.number_of_jobs >= self._max_jobs_per_worker):
+            self._logger.info("Recycle the spice worker {}".format(worker.worker_id))
+            worker.stop()
+
+    ##############################################
+
+    def _run(self, method, *args):
+
+        """Call the given worker method on an idle worker."""
+
+        if self._closed:
+            raise NameError("Spice server pool is closed")
+
+        worker = self._idle_workers.get()
+        try:
+            return method(worker, *args)
+        finally:
+            if not worker.synchronised:
+                # we don't know the state of the process
+                worker.stop()
+            self._recycle(worker)
+            self._idle_workers.put(worker)
+
+    ##############################################
+
+    def __call__(self, spice_input, timeout=None, cancellation_token=None):
+
+        """Run the given desk on an idle worker and return a :obj:`PySpice.RawFile.RawFile`
+        instance.
+
+        """
+
+        if timeout is None:
+            timeout = self._timeout
+
+        return self._run(SpiceWorker.__call__, spice_input, timeout, cancellation_token)
+
+    ##############################################
+
+    def batch(self, spice_input, raw_file_name, timeout=None, cancellation_token=None):
+
+        """Run the given desk, which must have a *.control* block writing the plots in the file
+        *raw_file_name*, on an idle worker and return the list of :obj:`PySpice.RawFile.RawFile`
+        instances.  See :meth:`PySpice.Spice.Server.SpiceServer.batch`.
+
+        """
+
+        if timeout is None:
+            timeout = self._timeout
+
+        return self._run(SpiceWorker.batch, spice_input, raw_file_name, timeout, cancellation_token)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -20,13 +20,22 @@
 
 ####################################################################################################
 
+from collections import OrderedDict
+import asyncio
+import concurrent.futures
+import inspect
 import logging
+import os
+import statistics
+import time
 
 ####################################################################################################
 
 from ..Tools.StringTools import join_list, join_dict
+from .Cancellation import CancellationToken, SimulationTimeout, SimulationCancelled
 from .NgSpice.Shared import NgSpiceShared
-from .Server import SpiceServer
+from .Server import SpiceServer, AsyncSpiceServer, spice_version
+from .Sweep import ParameterGrid, CircuitParameterSetter, sweep_control_commands
 
 ####################################################################################################
 
@@ -34,6 +43,15 @@ _module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
+def _timed_call(function, *args):
+
+    """Call the function and return its result and the duration of the call."""
+
+    start_time = time.monotonic()
+    return function(*args), time.monotonic() - start_time
+
+####################################################################################################
+
 class CircuitSimulation:
 
     """Define and generate the spice instruction to perform a circuit simulation.
@@ -58,7 +76,9 @@ class CircuitSimulation:
         self._options = {} # .options
         self._initial_condition = {} # .ic
         self._saved_nodes = ()
+        self._automatic_saved_nodes = () # set by the simulator for the next run
         self._analysis_parameters = {}
+        self._control_commands = [] # .control
         
         self.temperature = temperature
         self.nominal_temperature = nominal_temperature
@@ -155,9 +175,19 @@ class CircuitSimulation:
 
     ##############################################
 
+    def control(self, *commands):
+
+        """Append commands to the *.control* block."""
+
+        self._control_commands.extend(commands)
+
+    ##############################################
+
     def reset_analysis(self):
 
         self._analysis_parameters.clear()
+        self._control_commands.clear()
+        self._automatic_saved_nodes = ()
 
     ##############################################
 
@@ -327,10 +357,13 @@ class CircuitSimulation:
                     netlist += '.options {}\n'.format(key)
         if self.initial_condition:
             netlist += '.ic ' + join_dict(self._initial_condition) + '\n'
-        if self._saved_nodes:
-            netlist += '.save ' + join_list(self._saved_nodes) + '\n'
+        saved_nodes = self._saved_nodes or self._automatic_saved_nodes
+        if saved_nodes:
+            netlist += '.save ' + join_list(saved_nodes) + '\n'
         for analysis, analysis_parameters in self._analysis_parameters.items():
             netlist += '.' + analysis + ' ' + join_list(analysis_parameters) + '\n'
+        if self._control_commands:
+            netlist += '.control\n' + '\n'.join(self._control_commands) + '\n.endc\n'
         netlist += '.end\n'
         return netlist
 
@@ -343,23 +376,212 @@ class CircuitSimulator(CircuitSimulation):
 
     For *ac* and *transient* analyses, the user must specify a list of nodes using the *probes* key
     argument.
+
+    By default ngspice saves all the node voltages and the branch currents.  The saved vectors are
+    pruned if one of these is given, in the order of precedence:
+
+     * the *save* lines set by :meth:`save` or the *probes* key argument,
+     * the outputs declared by :meth:`outputs`,
+     * the waveforms which were read from the analysis of a previous identical run, if
+       :attr:`record_outputs` is set.
+
+    The *timeout* key argument sets a wall-clock timeout in seconds and the *cancellation_token* key
+    argument a :obj:`PySpice.Spice.Cancellation.CancellationToken` instance, cf.
+    :mod:`PySpice.Spice.Cancellation`.
     """
 
     _logger = _module_logger.getChild('CircuitSimulator')
 
+    _timeout = None
+    _outputs = None
+    _recorded_outputs = None # desk -> set of the accessed waveform names
+
+    ##############################################
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    ##############################################
+
+    def outputs(self, *names):
+
+        """Declare the nodes and the elements which are read from the analyses, so as only their
+        voltages and branch currents are saved.  Call this method without argument to save all the
+        vectors.
+
+        """
+
+        self._outputs = list(names) or None
+
+    ##############################################
+
+    @property
+    def record_outputs(self):
+
+        """If set, the names of the waveforms read from an analysis are recorded, then an identical
+        run only saves these vectors.
+
+        A waveform which was not read before is thus missing in the analysis, but it is recorded
+        for the next run.
+
+        """
+
+        return self._recorded_outputs is not None
+
+    @record_outputs.setter
+    def record_outputs(self, value):
+        if value:
+            if self._recorded_outputs is None:
+                self._recorded_outputs = {}
+        else:
+            self._recorded_outputs = None
+
+    ##############################################
+
+    def _save_vectors(self, names, known_only=False):
+
+        """Return the list of the vectors to save for the given node and element names, the other
+        names are vector names like *v(out)* or *@r1[i]*, they are dropped if *known_only* is set.
+
+        """
+
+        node_names = set(str(node_name) for node_name in self._circuit.node_names())
+        element_names = set(self._circuit.element_names())
+        vectors = []
+        for name in names:
+            name = str(name)
+            if name in node_names:
+                if name != '0':
+                    vectors.append(name)
+            elif name in element_names:
+                vectors.append('i({})'.format(name))
+            elif not known_only:
+                vectors.append(name)
+        return vectors
+
+    ##############################################
+
+    def _prune_saved_vectors(self, analysis_method):
+
+        """Set the automatic *save* line and return the set where the accessed waveform names must be
+        recorded, or :obj:`None`.
+
+        """
+
+        if self._saved_nodes:
+            return None
+        if self._outputs is not None:
+            self._automatic_saved_nodes = self._save_vectors(self._outputs)
+            return None
+        if self._recorded_outputs is not None:
+            key = (analysis_method, str(self))
+            accessed_names = self._recorded_outputs.setdefault(key, set())
+            self._automatic_saved_nodes = self._save_vectors(sorted(accessed_names), known_only=True)
+            return accessed_names
+        return None
+
+    ##############################################
+
+    @staticmethod
+    def _record_accesses(analysis, accessed_names):
+
+        if accessed_names is not None:
+            analysis.record_accesses(accessed_names)
+        return analysis
+
+    ##############################################
+
+    def _pop_run_options(self, kwargs):
+
+        """Pop the timeout and the cancellation token from the key arguments."""
+
+        timeout = kwargs.pop('timeout', None)
+        if timeout is None:
+            timeout = self._timeout
+        cancellation_token = kwargs.pop('cancellation_token', None)
+        return timeout, cancellation_token
+
     ##############################################
 
     def _run(self, analysis_method, *args, **kwargs):
 
+        """Set up the analysis and return the set where the accessed waveform names must be recorded,
+        cf. :meth:`_prune_saved_vectors`.
+
+        """
+
         self.reset_analysis()
         if 'probes' in kwargs:
-            self.save(* kwargs.pop('probes'))
+            self.save(* self._save_vectors(kwargs.pop('probes')))
 
         method = getattr(CircuitSimulation, analysis_method)
         method(self, *args, **kwargs)
+        accessed_names = self._prune_saved_vectors(analysis_method)
 
         self._logger.debug('desk\n' + str(self))
 
+        return accessed_names
+
+    ##############################################
+
+    def _analysis_commands(self, analyses):
+
+        """Return the list of (analysis method, ngspice command) pairs for *analyses*, cf.
+        :meth:`analyses`.
+
+        """
+
+        self.reset_analysis()
+        commands = []
+        for analysis_method, parameters in analyses.items():
+            if isinstance(parameters, dict):
+                args, kwargs = (), parameters
+            else:
+                args, kwargs = tuple(parameters), {}
+            method = getattr(CircuitSimulation, analysis_method)
+            method(self, *args, **kwargs)
+            for analysis, analysis_parameters in self._analysis_parameters.items():
+                commands.append((analysis_method, (analysis + ' ' + join_list(analysis_parameters)).strip()))
+            self._analysis_parameters.clear()
+
+        return commands
+
+    ##############################################
+
+    def _run_analyses(self, commands, timeout=None, cancellation_token=None):
+
+        raise NotImplementedError
+
+    ##############################################
+
+    def analyses(self, **analyses):
+
+        """Run several analyses on the circuit loaded once and return a dictionary which maps each
+        analysis method to its analysis.
+
+        The keywords are analysis methods and the values are their parameters, a dictionary of
+        keyword arguments or a tuple of positional arguments, for example::
+
+            analyses = simulator.analyses(
+                operating_point=(),
+                ac=dict(start_frequency=1, stop_frequency=mega(1), number_of_points=10, variation='dec'),
+                transient=dict(step_time=micro(1), end_time=milli(1)),
+            )
+
+        The analyses are run in the given order in the same ngspice session, thus the AC analysis
+        is performed on the circuit state left by the operating point.  The saved vectors must be set
+        using :meth:`save`.
+
+        """
+
+        timeout, cancellation_token = self._pop_run_options(analyses)
+        commands = self._analysis_commands(analyses)
+        self._logger.debug('analyses\n' + '\n'.join(command for method, command in commands))
+        results = self._run_analyses(commands, timeout, cancellation_token)
+        return OrderedDict((analysis_method, analysis)
+                           for (analysis_method, command), analysis in zip(commands, results))
+
     ##############################################
 
     def operating_point(self, *args, **kwargs):
@@ -394,40 +616,561 @@ class CircuitSimulator(CircuitSimulation):
 
 class SubprocessCircuitSimulator(CircuitSimulator):
 
+    """This class implements a circuit simulator which runs ngspice as a subprocess.
+
+    By default a :obj:`PySpice.Spice.Server.SpiceServer` instance is created for the
+    *spice_command*, but a :obj:`PySpice.Spice.ServerPool.SpiceServerPool` instance can be passed
+    using the *spice_server* parameter so as to reuse long-lived ngspice processes.
+
+    A :obj:`PySpice.Spice.Cache.SimulationCache` instance can be passed using the *cache* parameter,
+    then the output of a desk which was already simulated by the same ngspice version is returned
+    from the cache.
+
+    The *timeout* parameter sets the default wall-clock timeout of a simulation in seconds.
+
+    """
+
     _logger = _module_logger.getChild('SubprocessCircuitSimulator')
 
+    BATCH_RAW_FILE_NAME = 'output.raw'
+
     ##############################################
 
     def __init__(self, circuit,
                  temperature=27,
                  nominal_temperature=27,
                  spice_command='ngspice',
+                 spice_server=None,
+                 cache=None,
+                 timeout=None,
                 ):
 
         # Fixme: kwargs
 
         super().__init__(circuit, temperature, nominal_temperature, pipe=True)
         
-        self._spice_server = SpiceServer()
+        if spice_server is None:
+            self._spice_server = SpiceServer(spice_command=spice_command)
+        else:
+            self._spice_server = spice_server
+        self._cache = cache
+        self._timeout = timeout
+
+    ##############################################
+
+    def _cache_key(self, analysis_method, desk):
+
+        return self._cache.key(spice_version(self._spice_server.spice_command), analysis_method, desk)
+
+    ##############################################
+
+    def _run_desk(self, analysis_method, desk, timeout=None, cancellation_token=None):
+
+        """Simulate the desk, look up the cache if any."""
+
+        if self._cache is not None:
+            return self._cache.get_or_run(self._cache_key(analysis_method, desk),
+                                          lambda: self._spice_server(desk, timeout, cancellation_token),
+                                          metadata=dict(analysis=analysis_method))
+        else:
+            return self._spice_server(desk, timeout, cancellation_token)
 
     ##############################################
 
     def _run(self, analysis_method, *args, **kwargs):
 
-        super()._run(analysis_method, *args, **kwargs)
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+        accessed_names = super()._run(analysis_method, *args, **kwargs)
         
-        raw_file = self._spice_server(str(self))
+        raw_file = self._run_desk(analysis_method, str(self), timeout, cancellation_token)
         self.reset_analysis()
         
         # for field in raw_file.variables:
         #     print field
         
-        return raw_file.to_analysis(self._circuit)
+        return self._record_accesses(raw_file.to_analysis(self._circuit), accessed_names)
+
+    ##############################################
+
+    def sweep_desks(self, param_grid, analysis_method, *args, **kwargs):
+
+        """Return the list of desks for the given parameter grid and analysis, cf.
+        :mod:`PySpice.Spice.Sweep`.  The circuit parameters are restored at the end.
+
+        """
+
+        return self.parameter_set_desks(ParameterGrid(param_grid), analysis_method, *args, **kwargs)
+
+    ##############################################
+
+    def parameter_set_desks(self, parameter_sets, analysis_method, *args, **kwargs):
+
+        """Return the list of desks for the given parameter sets, an iterable of dictionaries, and
+        analysis.  The circuit parameters are restored at the end.
+
+        """
+
+        desks = []
+        with CircuitParameterSetter(self._circuit) as setter:
+            for parameters in parameter_sets:
+                setter.update(parameters)
+                CircuitSimulator._run(self, analysis_method, *args, **dict(kwargs))
+                desks.append(str(self))
+        self.reset_analysis()
+
+        return desks
+
+    ##############################################
+
+    def sweep(self, param_grid, analysis_method, *args, executor=None, straggler_factor=None, **kwargs):
+
+        """Run the analysis for each point of the parameter grid and return the list of analyses in
+        the grid order, cf. :mod:`PySpice.Spice.Sweep`.
+
+        The simulations are dispatched using the *executor*, any :obj:`concurrent.futures.Executor`
+        instance.  If it is not specified, a thread pool is used where each thread runs a ngspice
+        process.  Notice a :obj:`PySpice.Spice.ServerPool.SpiceServerPool` instance can only be
+        used with a thread pool.
+
+        The *timeout* key argument applies to each simulation, the analysis of a simulation which
+        timed out is :obj:`None`.  If *straggler_factor* is set, a simulation which runs longer than
+        this factor times the median duration is dispatched once more, cf. :meth:`_dispatch`.  The
+        cancellation and the stragglers require a thread pool.
+
+        Usage::
+
+            analyses = simulator.sweep({'R1.resistance': (kilo(1), kilo(2))},
+                                       'transient', step_time=micro(1), end_time=milli(1))
+
+        """
+
+        return self.run_parameter_sets(ParameterGrid(param_grid), analysis_method, *args,
+                                       executor=executor, straggler_factor=straggler_factor, **kwargs)
+
+    ##############################################
+
+    def run_parameter_sets(self, parameter_sets, analysis_method, *args,
+                           executor=None, straggler_factor=None, **kwargs):
+
+        """Run the analysis for each parameter set, an iterable of dictionaries, and return the list
+        of analyses, cf. :meth:`sweep`.
+
+        """
+
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+        desks = self.parameter_set_desks(parameter_sets, analysis_method, *args, **kwargs)
+
+        if executor is None:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                raw_files = self._run_desks(analysis_method, desks, executor,
+                                            timeout, cancellation_token, straggler_factor)
+        else:
+            raw_files = self._run_desks(analysis_method, desks, executor,
+                                        timeout, cancellation_token, straggler_factor)
+
+        return [raw_file.to_analysis(self._circuit) if raw_file is not None else None
+                for raw_file in raw_files]
+
+    ##############################################
+
+    def batched_sweep(self, param_grid, analysis_method, *args, **kwargs):
+
+        """Sweep the parameter grid in a single ngspice process and return the list of analyses in
+        the order of the grid, cf. :func:`PySpice.Spice.Sweep.sweep_control_commands`.
+
+        The circuit is parsed once and the parameters are updated by *alter* commands, thus this
+        mode is suited to cheap simulations where the process startup dominates.  The parameters must
+        be alterable, i.e. the principal value or a key-value parameter of an element, a model
+        parameter or an already defined circuit parameter.
+
+        """
+
+        desk, number_of_plots, timeout, cancellation_token = self._batched_sweep_desk(
+            param_grid, analysis_method, *args, **kwargs)
+        raw_files = self._run_batch_desk(analysis_method, desk, number_of_plots,
+                                         timeout, cancellation_token)
+
+        return [raw_file.to_analysis(self._circuit) for raw_file in raw_files]
+
+    ##############################################
+
+    def _batched_sweep_desk(self, param_grid, analysis_method, *args, **kwargs):
+
+        """Return the desk of a batched sweep, the number of plots and the run options."""
+
+        param_grid = ParameterGrid(param_grid)
+
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+        CircuitSimulator._run(self, analysis_method, *args, **kwargs)
+        self.control(*sweep_control_commands(self._circuit, param_grid, self.BATCH_RAW_FILE_NAME))
+        desk = str(self)
+        self.reset_analysis()
+
+        return desk, len(param_grid), timeout, cancellation_token
+
+    ##############################################
+
+    def _run_batch_desk(self, analysis_method, desk, number_of_plots,
+                        timeout=None, cancellation_token=None):
+
+        """Simulate the desk in batch mode and return the list of raw files, look up the cache if
+        any.
+
+        """
+
+        def run_batch():
+            return self._spice_server.batch(desk, self.BATCH_RAW_FILE_NAME, timeout, cancellation_token)
+        if self._cache is not None:
+            raw_files = self._cache.get_or_run(self._cache_key(analysis_method, desk),
+                                               run_batch,
+                                               metadata=dict(analysis=analysis_method))
+        else:
+            raw_files = run_batch()
+
+        if len(raw_files) != number_of_plots:
+            raise NameError("Expected {} plots instead of {}".format(number_of_plots, len(raw_files)))
+
+        return raw_files
+
+    ##############################################
+
+    def _analyses_desk(self, commands):
+
+        """Return the analysis methods, used for the cache key, and the desk which runs the
+        commands.
+
+        """
+
+        control = ['set appendwrite']
+        for analysis_method, command in commands:
+            control += [command, 'write ' + self.BATCH_RAW_FILE_NAME]
+        self.reset_analysis()
+        self.control(*control)
+        desk = str(self)
+        self.reset_analysis()
+
+        analysis_methods = ','.join(analysis_method for analysis_method, command in commands)
+        return analysis_methods, desk
+
+    ##############################################
+
+    def _run_analyses(self, commands, timeout=None, cancellation_token=None):
+
+        analysis_methods, desk = self._analyses_desk(commands)
+        raw_files = self._run_batch_desk(analysis_methods, desk, len(commands),
+                                         timeout, cancellation_token)
+
+        return [raw_file.to_analysis(self._circuit) for raw_file in raw_files]
+
+    ##############################################
+
+    def _run_desks(self, analysis_method, desks, executor,
+                   timeout=None, cancellation_token=None, straggler_factor=None):
+
+        """Simulate the desks using the executor and return the list of raw files.  The cache is
+        looked up in the calling thread, thus the executor only receives the missing desks.
+
+        """
+
+        if self._cache is None:
+            return self._dispatch(desks, executor, timeout, cancellation_token, straggler_factor)
+
+        keys = [self._cache_key(analysis_method, desk) for desk in desks]
+        raw_files = {}
+        missing_desks = OrderedDict()
+        for key, desk in zip(keys, desks):
+            if key not in raw_files and key not in missing_desks:
+                raw_file = self._cache.get(key, count_miss=True)
+                if raw_file is None:
+                    missing_desks[key] = desk
+                else:
+                    raw_files[key] = raw_file
+        results = self._dispatch(list(missing_desks.values()), executor,
+                                 timeout, cancellation_token, straggler_factor)
+        for key, raw_file in zip(missing_desks.keys(), results):
+            raw_files[key] = raw_file
+            if raw_file is not None:
+                self._cache.put(key, raw_file, metadata=dict(analysis=analysis_method))
+
+        return [raw_files[key] for key in keys]
+
+    ##############################################
+
+    def _dispatch(self, desks, executor, timeout=None, cancellation_token=None, straggler_factor=None):
+
+        """Simulate the desks using the executor and return the list of raw files, where the raw file
+        of a simulation which timed out is :obj:`None`.
+
+        If *straggler_factor* is set, once half of the simulations are completed, a simulation which
+        runs longer than *straggler_factor* times the median duration is dispatched once more.  The
+        first result wins and the other simulation is cancelled.  Notice the start time of a
+        simulation is polled, thus it is only accurate to 100 ms.
+
+        """
+
+        use_tokens = cancellation_token is not None or straggler_factor is not None
+        poll_interval = None if straggler_factor is None else .1
+
+        results = [None] * len(desks)
+        done = [False] * len(desks)
+        number_of_attempts = [0] * len(desks)
+        durations = []
+        pending = {} # future -> [desk index, cancellation token, start time]
+
+        def submit(index):
+            token = None
+            if use_tokens:
+                if cancellation_token is not None:
+                    token = cancellation_token.child()
+                else:
+                    token = CancellationToken()
+                future = executor.submit(_timed_call, self._spice_server, desks[index], timeout, token)
+            else:
+                future = executor.submit(_timed_call, self._spice_server, desks[index], timeout)
+            pending[future] = [index, token, None]
+            number_of_attempts[index] += 1
+
+        def cancel(future):
+            token = pending[future][1]
+            future.cancel()
+            if token is not None:
+                token.cancel()
+
+        try:
+            for index in range(len(desks)):
+                submit(index)
+
+            while pending:
+                finished, not_finished = concurrent.futures.wait(
+                    pending, timeout=poll_interval, return_when=concurrent.futures.FIRST_COMPLETED)
+                now = time.monotonic()
+
+                for future in finished:
+                    index, token, start_time = pending.pop(future)
+                    if token is not None:
+                        token.release()
+                    if done[index] or future.cancelled():
+                        continue
+                    try:
+                        raw_file, duration = future.result()
+                    except SimulationCancelled:
+                        if cancellation_token is not None:
+                            cancellation_token.raise_if_cancelled()
+                        continue
+                    except SimulationTimeout:
+                        if all(item[0] != index for item in pending.values()):
+                            self._logger.warning("Simulation {} timed out".format(index))
+                            done[index] = True
+                        continue
+                    results[index] = raw_file
+                    done[index] = True
+                    durations.append(duration)
+                    for other_future, item in list(pending.items()):
+                        if item[0] == index:
+                            cancel(other_future)
+
+                if straggler_factor is not None:
+                    for future, item in pending.items():
+                        if item[2] is None and future.running():
+                            item[2] = now
+                    if durations and len(durations) >= len(desks) // 2:
+                        threshold = straggler_factor * statistics.median(durations)
+                        for future, (index, token, start_time) in list(pending.items()):
+                            if (start_time is not None
+                                and number_of_attempts[index] == 1
+                                and not done[index]
+                                and now - start_time > threshold):
+                                self._logger.info("Dispatch again the straggler simulation {}".format(index))
+                                submit(index)
+        finally:
+            for future in list(pending.keys()):
+                cancel(future)
+
+        if cancellation_token is not None:
+            cancellation_token.raise_if_cancelled()
+
+        return results
+
+####################################################################################################
+
+class AsyncSubprocessCircuitSimulator(SubprocessCircuitSimulator):
+
+    """This class implements an asyncio variant of :class:`SubprocessCircuitSimulator`.  The analysis
+    methods, :meth:`sweep`, :meth:`run_parameter_sets`, :meth:`batched_sweep` and :meth:`analyses`
+    return a coroutine, for example::
+
+        simulator = circuit.simulator(simulator='async')
+        analysis = await simulator.transient(step_time=micro(1), end_time=milli(1))
+
+    The spice server must be asynchronous, like :class:`PySpice.Spice.Server.AsyncSpiceServer`.
+
+    """
+
+    _logger = _module_logger.getChild('AsyncSubprocessCircuitSimulator')
+
+    ##############################################
+
+    def __init__(self, circuit,
+                 temperature=27,
+                 nominal_temperature=27,
+                 spice_command='ngspice',
+                 spice_server=None,
+                 cache=None,
+                 timeout=None,
+                ):
+
+        if spice_server is None:
+            spice_server = AsyncSpiceServer(spice_command=spice_command)
+        elif not inspect.iscoroutinefunction(spice_server.__call__):
+            raise NameError("The spice server {} is not asynchronous, use AsyncSpiceServer".format(
+                type(spice_server).__name__))
+
+        super().__init__(circuit, temperature, nominal_temperature,
+                         spice_server=spice_server, cache=cache, timeout=timeout)
+
+    ##############################################
+
+    def _run(self, analysis_method, *args, **kwargs):
+
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+        accessed_names = CircuitSimulator._run(self, analysis_method, *args, **kwargs)
+
+        # the desk must be generated before to return the coroutine
+        desk = str(self)
+        self.reset_analysis()
+
+        return self._run_analysis(analysis_method, desk, timeout, cancellation_token, accessed_names)
+
+    ##############################################
+
+    async def _run_desk(self, analysis_method, desk, timeout=None, cancellation_token=None):
+
+        """Simulate the desk, look up the cache if any, identical requests in flight share the same
+        simulation.
+
+        """
+
+        if self._cache is not None:
+            return await self._cache.get_or_run_async(self._cache_key(analysis_method, desk),
+                                                      lambda: self._spice_server(desk, timeout, cancellation_token),
+                                                      metadata=dict(analysis=analysis_method))
+        else:
+            return await self._spice_server(desk, timeout, cancellation_token)
+
+    ##############################################
+
+    async def _run_analysis(self, analysis_method, desk, timeout=None, cancellation_token=None,
+                            accessed_names=None):
+
+        raw_file = await self._run_desk(analysis_method, desk, timeout, cancellation_token)
+        return self._record_accesses(raw_file.to_analysis(self._circuit), accessed_names)
+
+    ##############################################
+
+    async def sweep(self, param_grid, analysis_method, *args, max_concurrency=None, **kwargs):
+
+        """Run the analysis for each point of the parameter grid and return the list of analyses in
+        the grid order, at most *max_concurrency* simulations run at the same time (default to the
+        number of CPU).
+
+        The *timeout* key argument applies to each simulation, the analysis of a simulation which
+        timed out is :obj:`None`.
+
+        """
+
+        return await self.run_parameter_sets(ParameterGrid(param_grid), analysis_method, *args,
+                                             max_concurrency=max_concurrency, **kwargs)
+
+    ##############################################
+
+    async def run_parameter_sets(self, parameter_sets, analysis_method, *args,
+                                 max_concurrency=None, **kwargs):
+
+        """Run the analysis for each parameter set, an iterable of dictionaries, and return the list
+        of analyses, cf. :meth:`sweep`.
+
+        """
+
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+
+        async def run_desk(index, desk):
+            async with semaphore:
+                try:
+                    return await self._run_desk(analysis_method, desk, timeout, cancellation_token)
+                except SimulationTimeout:
+                    self._logger.warning("Simulation {} timed out".format(index))
+                    return None
+
+        desks = self.parameter_set_desks(parameter_sets, analysis_method, *args, **kwargs)
+        raw_files = await asyncio.gather(*[run_desk(index, desk) for index, desk in enumerate(desks)])
+
+        return [raw_file.to_analysis(self._circuit) if raw_file is not None else None
+                for raw_file in raw_files]
+
+    ##############################################
+
+    async def batched_sweep(self, param_grid, analysis_method, *args, **kwargs):
+
+        """Asyncio variant of :meth:`SubprocessCircuitSimulator.batched_sweep`."""
+
+        desk, number_of_plots, timeout, cancellation_token = self._batched_sweep_desk(
+            param_grid, analysis_method, *args, **kwargs)
+        raw_files = await self._run_batch_desk(analysis_method, desk, number_of_plots,
+                                               timeout, cancellation_token)
+
+        return [raw_file.to_analysis(self._circuit) for raw_file in raw_files]
+
+    ##############################################
+
+    async def _run_batch_desk(self, analysis_method, desk, number_of_plots,
+                              timeout=None, cancellation_token=None):
+
+        def run_batch():
+            return self._spice_server.batch(desk, self.BATCH_RAW_FILE_NAME, timeout, cancellation_token)
+        if self._cache is not None:
+            raw_files = await self._cache.get_or_run_async(self._cache_key(analysis_method, desk),
+                                                           run_batch,
+                                                           metadata=dict(analysis=analysis_method))
+        else:
+            raw_files = await run_batch()
+
+        if len(raw_files) != number_of_plots:
+            raise NameError("Expected {} plots instead of {}".format(number_of_plots, len(raw_files)))
+
+        return raw_files
+
+    ##############################################
+
+    async def analyses(self, **analyses):
+
+        """Asyncio variant of :meth:`CircuitSimulator.analyses`."""
+
+        timeout, cancellation_token = self._pop_run_options(analyses)
+        commands = self._analysis_commands(analyses)
+        analysis_methods, desk = self._analyses_desk(commands)
+        raw_files = await self._run_batch_desk(analysis_methods, desk, len(commands),
+                                               timeout, cancellation_token)
+
+        return OrderedDict((analysis_method, raw_file.to_analysis(self._circuit))
+                           for (analysis_method, command), raw_file in zip(commands, raw_files))
 
 ####################################################################################################
 
 class NgSpiceSharedCircuitSimulator(CircuitSimulator):
 
+    """This class implements a circuit simulator which uses the ngspice shared library.
+
+    The circuit is loaded in ngspice for the first simulation.  For the next simulations, if only
+    element parameters or circuit parameters were modified, cf.
+    :meth:`PySpice.Spice.Netlist.Circuit.parameter`, the simulator sends *alter* and *alterparam*
+    commands instead of loading the circuit again.  Else the circuit is reloaded.
+
+    """
+
     _logger = _module_logger.getChild('NgSpiceSharedCircuitSimulator')
 
     ##############################################
@@ -436,6 +1179,7 @@ class NgSpiceSharedCircuitSimulator(CircuitSimulator):
                  temperature=27,
                  nominal_temperature=27,
                  ngspice_shared=None,
+                 timeout=None,
                 ):
 
         # Fixme: kwargs
@@ -447,27 +1191,134 @@ class NgSpiceSharedCircuitSimulator(CircuitSimulator):
         else:
             self._ngspice_shared = ngspice_shared
 
+        self._loaded_desk = None
+        self._altered_elements = {} # element name -> {attribute name: command}
+        self._timeout = timeout
+
+    ##############################################
+
+    def _alter_commands(self, desk):
+
+        """Return the list of commands to update the loaded circuit to the given desk, or :obj:`None`
+        if the circuit must be reloaded.
+
+        """
+
+        if self._loaded_desk is None:
+            return None
+
+        circuit = self._circuit
+        modified_parameters = circuit.modified_parameters
+        modified_elements = {element.name.lower():element
+                             for element in circuit.element_iterator()
+                             if element.modified_parameters}
+
+        # Check the desks only differ by the modified parameters
+        loaded_lines = self._loaded_desk.splitlines()
+        lines = desk.splitlines()
+        if len(loaded_lines) != len(lines):
+            return None
+        for loaded_line, line in zip(loaded_lines, lines):
+            if loaded_line != line:
+                words = line.split()
+                if line.startswith('.param '):
+                    name = line[len('.param '):].split('=')[0]
+                    if name not in modified_parameters:
+                        return None
+                elif not words or words[0].lower() not in modified_elements:
+                    return None
+
+        altered_elements = {}
+        for element in modified_elements.values():
+            commands = {}
+            for attribute_name in element.modified_parameters:
+                command = element.alter_command(attribute_name)
+                if command is None:
+                    return None
+                commands[attribute_name] = command
+            altered_elements[element.name] = commands
+
+        for element_name, element_commands in altered_elements.items():
+            self._altered_elements.setdefault(element_name, {}).update(element_commands)
+
+        commands = []
+        if modified_parameters:
+            parameters = circuit.parameters
+            commands += ['alterparam {} = {}'.format(name, parameters[name])
+                         for name in sorted(modified_parameters)]
+            # reset parses the circuit again and thus reverts the previous alter commands
+            commands.append('reset')
+            altered_elements = self._altered_elements
+        for element_commands in altered_elements.values():
+            commands += element_commands.values()
+
+        return commands
+
+    ##############################################
+
+    def _load_desk(self, desk):
+
+        """Load the desk or alter the loaded circuit."""
+
+        commands = self._alter_commands(desk)
+        if commands is None:
+            self._ngspice_shared.load_circuit(desk)
+            self._altered_elements.clear()
+        else:
+            for command in commands:
+                self._ngspice_shared.exec_command(command)
+        self._loaded_desk = desk
+        self._circuit.clear_modified_parameters()
+
     ##############################################
 
     def _run(self, analysis_method, *args, **kwargs):
 
-        super()._run(analysis_method, *args, **kwargs)
+        timeout, cancellation_token = self._pop_run_options(kwargs)
+        accessed_names = super()._run(analysis_method, *args, **kwargs)
         
-        self._ngspice_shared.load_circuit(str(self))
-        self._ngspice_shared.run()
+        self._load_desk(str(self))
+        
+        # apply the retention policy now, so as the plot names are not reused during the run
+        self._ngspice_shared.collect_garbage()
+        plot_names = set(self._ngspice_shared.plot_names)
+        self._ngspice_shared.run(timeout=timeout, cancellation_token=cancellation_token)
         self._logger.debug(str(self._ngspice_shared.plot_names))
         self.reset_analysis()
         
-        if analysis_method == 'dc':
-            plot_name = 'dc1'
-        elif analysis_method == 'ac':
-            plot_name = 'ac1'
-        elif analysis_method == 'transient':
-            plot_name = 'tran1'
-        else:
-            raise NotImplementedError
-        
-        return self._ngspice_shared.plot(plot_name).to_analysis()
+        return self._record_accesses(self._new_plot(plot_names).to_analysis(), accessed_names)
+
+    ##############################################
+
+    def _new_plot(self, plot_names):
+
+        """Return the plot created by the last command, *plot_names* is the list of the plots before
+        the command.
+
+        """
+
+        # the plot names are numbered, e.g. tran1, tran2, ...
+        plot_name = self._ngspice_shared.current_plot
+        if plot_name in plot_names:
+            raise NameError("The simulation did not create a plot, the current plot is {}".format(plot_name))
+        return self._ngspice_shared.plot(plot_name)
+
+    ##############################################
+
+    def _run_analyses(self, commands, timeout=None, cancellation_token=None):
+
+        self.reset_analysis()
+        self._load_desk(str(self))
+
+        self._ngspice_shared.collect_garbage(number_of_new_plots=len(commands))
+        analyses = []
+        for analysis_method, command in commands:
+            plot_names = set(self._ngspice_shared.plot_names)
+            # the timeout applies to each analysis
+            self._ngspice_shared.exec_background_command(command, timeout, cancellation_token)
+            analyses.append(self._new_plot(plot_names).to_analysis())
+
+        return analyses
 
 ####################################################################################################
 #
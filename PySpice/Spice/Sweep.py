@@ -0,0 +1,260 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the machinery to sweep circuit parameters.
+
+A parameter grid is a dictionary which maps a parameter name to a sequence of values, for example::
+
+    param_grid = {
+        'R1.resistance': (kilo(1), kilo(2), kilo(5)),
+        'C1.capacitance': (nano(1), nano(10)),
+        'gain': (1, 10),
+    }
+
+A parameter name of the form *element.attribute* refers to an element parameter, or a model
+parameter if the first part is a model name, else it refers to a circuit parameter defined by
+:meth:`PySpice.Spice.Netlist.Circuit.parameter`.
+
+The grid points are the cartesian product of the values and are iterated in the declaration order
+of the dictionary, the last parameter varies fastest (like the C order of a Numpy array).
+
+A sweep can also be compiled to a *.control* block, cf. :func:`sweep_control_commands`, so as to
+run all the points in a single ngspice process::
+
+    .control
+    set appendwrite
+    foreach pyspice_sweep_0 1k 2k 5k
+      foreach pyspice_sweep_1 1n 10n
+        alter R1 = $pyspice_sweep_0
+        alter C1 = $pyspice_sweep_1
+        run
+        write output.raw
+        destroy all
+      end
+    end
+    .endc
+
+"""
+
+####################################################################################################
+
+from collections import OrderedDict
+import itertools
+import logging
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class ParameterGrid:
+
+    """This class implements a grid of parameters.
+
+    Public Attributes:
+
+      :attr:`names`
+        list of the parameter names
+
+      :attr:`shape`
+        number of values for each parameter
+
+    """
+
+    ##############################################
+
+    def __init__(self, param_grid):
+
+        self._grid = OrderedDict((str(name), list(values)) for name, values in param_grid.items())
+
+    ##############################################
+
+    @property
+    def names(self):
+        return list(self._grid.keys())
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self._grid.values())
+
+    ##############################################
+
+    def items(self):
+
+        """Return the list of (name, values) pairs."""
+
+        return list(self._grid.items())
+
+    ##############################################
+
+    def __len__(self):
+
+        size = 1
+        for values in self._grid.values():
+            size *= len(values)
+        return size
+
+    ##############################################
+
+    def __iter__(self):
+
+        """Yield a dictionary for each point of the grid."""
+
+        names = self.names
+        for values in itertools.product(*self._grid.values()):
+            yield OrderedDict(zip(names, values))
+
+####################################################################################################
+
+def sweep_control_commands(circuit, param_grid, raw_file_name):
+
+    """Return the list of ngspice commands which sweep the parameter grid using nested *foreach*
+    loops and write the plots in the file *raw_file_name*, one plot for each point in the order of
+    the grid.
+
+    An element parameter is set using *alter*, a model parameter using *altermod* and a circuit
+    parameter using *alterparam* followed by a *reset*.
+
+    """
+
+    if not isinstance(param_grid, ParameterGrid):
+        param_grid = ParameterGrid(param_grid)
+
+    commands = ['set appendwrite']
+    parameter_commands = []
+    alter_commands = []
+    for depth, (name, values) in enumerate(param_grid.items()):
+        variable = 'pyspice_sweep_{}'.format(depth)
+        commands.append('  '*depth + 'foreach {} {}'.format(variable, ' '.join(str(value) for value in values)))
+        value = '$' + variable
+        if '.' in name:
+            element_name, attribute_name = name.split('.', 1)
+            command = circuit[element_name].alter_command(attribute_name, value)
+            if command is None:
+                raise NameError("Parameter {} cannot be altered".format(name))
+            alter_commands.append(command)
+        elif name in circuit.parameters:
+            parameter_commands.append('alterparam {} = {}'.format(name, value))
+        else:
+            raise NameError("Undefined circuit parameter {}".format(name))
+
+    # reset reverts the alter commands, thus it must come first
+    body = parameter_commands
+    if parameter_commands:
+        body.append('reset')
+    body += alter_commands
+    body += ['run', 'write ' + raw_file_name, 'destroy all']
+    depth = len(param_grid.names)
+    commands += ['  '*depth + command for command in body]
+    commands += ['  '*i + 'end' for i in reversed(range(depth))]
+
+    return commands
+
+####################################################################################################
+
+class CircuitParameterSetter:
+
+    """This class sets parameters on a circuit and restores their initial values.
+
+    Usage::
+
+        with CircuitParameterSetter(circuit) as setter:
+            setter['R1.resistance'] = kilo(2)
+            desk = str(simulator)
+
+    """
+
+    ##############################################
+
+    def __init__(self, circuit):
+
+        self._circuit = circuit
+        self._initial_values = OrderedDict()
+
+    ##############################################
+
+    def _split_name(self, name):
+
+        if '.' in name:
+            element_name, attribute_name = name.split('.', 1)
+            return self._circuit[element_name], attribute_name
+        else:
+            return None, name
+
+    ##############################################
+
+    def __getitem__(self, name):
+
+        element, attribute_name = self._split_name(name)
+        if element is not None:
+            return getattr(element, attribute_name)
+        else:
+            return self._circuit.parameters.get(attribute_name, None)
+
+    ##############################################
+
+    def __setitem__(self, name, value):
+
+        if name not in self._initial_values:
+            self._initial_values[name] = self[name]
+
+        element, attribute_name = self._split_name(name)
+        if element is not None:
+            setattr(element, attribute_name, value)
+        else:
+            self._circuit.parameter(attribute_name, value)
+
+    ##############################################
+
+    def update(self, parameters):
+
+        for name, value in parameters.items():
+            self[name] = value
+
+    ##############################################
+
+    def restore(self):
+
+        """Restore the initial values."""
+
+        for name, value in self._initial_values.items():
+            element, attribute_name = self._split_name(name)
+            if element is not None:
+                setattr(element, attribute_name, value)
+            elif value is None:
+                del self._circuit.parameters[attribute_name]
+            else:
+                self._circuit.parameters[attribute_name] = value
+        self._initial_values.clear()
+
+    ##############################################
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.restore()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -32,6 +32,7 @@
 
 import numbers
 import math
+import re
 
 ####################################################################################################
 
@@ -519,6 +520,30 @@ __units__ = (tera,
              femto,
 )
 __power_to_unit__ = {unit.__power__:unit for unit in __units__}
+__suffix_to_unit__ = {unit.__spice_suffix__.lower():unit for unit in __units__ if unit.__spice_suffix__}
+
+####################################################################################################
+
+_spice_number_re = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)([a-zA-Z]*)\s*$')
+
+def parse_spice_number(string):
+
+    """ Convert a Spice number like "2.5n" or "10kOhm" to a unit instance.
+
+    As in Spice, the scale suffix is case insensitive, thus "M" is milli and "Meg" is mega, and the
+    letters following the suffix are ignored.
+    """
+
+    match = _spice_number_re.match(string)
+    if match is None:
+        raise ValueError("Invalid Spice number {}".format(string))
+    number, suffix = match.groups()
+    number = float(number)
+    suffix = suffix.lower()
+    if suffix.startswith('meg'):
+        return mega(number)
+    else:
+        return __suffix_to_unit__.get(suffix[:1], Unit)(number)
 
 ####################################################################################################
 
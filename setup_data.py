@@ -99,6 +99,7 @@ setup_dict = dict(
               'PySpice.Plot',
               'PySpice.Probe',
               'PySpice.Spice',
+              'PySpice.Spice.LTspice',
               'PySpice.Spice.NgSpice',
               'PySpice.Tools',
               'PySpice.Unit',
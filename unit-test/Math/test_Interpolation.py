@@ -0,0 +1,120 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Math.Interpolation import (_group_by_abscissa, cubic_interpolation, interval_indexes,
+                                        linear_interpolation, resample)
+
+####################################################################################################
+
+class TestInterpolation(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        # non-uniform abscissa
+        self.x = np.cumsum(np.linspace(.01, .03, 51)) - .01
+        self.grid = np.linspace(0, self.x[-1], 101)
+
+    ##############################################
+
+    def test_interval_indexes(self):
+
+        x = np.array((0., 1., 3., 4.))
+        indexes, valid = interval_indexes(x, (-1, 0, .5, 1, 3.5, 4, 5))
+        np.testing.assert_array_equal(indexes, (0, 0, 0, 1, 2, 2, 2))
+        np.testing.assert_array_equal(valid, (False, True, True, True, True, True, False))
+
+    ##############################################
+
+    def test_interpolation(self):
+
+        x, grid = self.x, self.grid
+        np.testing.assert_allclose(linear_interpolation(x, 2*x + 1, grid), 2*grid + 1)
+        np.testing.assert_allclose(linear_interpolation(x, np.sin(x), grid), np.sin(grid), atol=1e-4)
+        # the Hermite spline with three-point slopes is exact for a parabola, except at the ends
+        inner = (grid >= x[1]) & (grid <= x[-2])
+        np.testing.assert_allclose(cubic_interpolation(x, x**2, grid)[inner], grid[inner]**2, atol=1e-12)
+        np.testing.assert_allclose(cubic_interpolation(x, np.sin(x), grid), np.sin(grid), atol=1e-4)
+        values = np.stack((x, 1j*x))
+        np.testing.assert_allclose(linear_interpolation(x, values, grid), np.stack((grid, 1j*grid)))
+
+    ##############################################
+
+    def test_resample(self):
+
+        x, grid = self.x, self.grid
+        values = np.stack((np.sin(x), np.cos(x)))
+        array = resample(grid, x, values)
+        self.assertEqual(array.shape, (2, grid.size))
+        np.testing.assert_allclose(array, np.stack((np.sin(grid), np.cos(grid))), atol=1e-4)
+
+        abscissas = (x, grid, x[:-10])
+        waveforms = (np.sin(x), np.sin(grid), np.sin(x[:-10]))
+        array = resample(grid, abscissas, waveforms, method='cubic')
+        np.testing.assert_array_equal(array[1], np.sin(grid))
+        np.testing.assert_allclose(array[0], np.sin(grid), atol=1e-4)
+        out_of_range = grid > x[-11]
+        self.assertTrue(np.all(np.isnan(array[2][out_of_range])))
+        np.testing.assert_allclose(array[2][~out_of_range], np.sin(grid[~out_of_range]), atol=1e-4)
+
+        array = resample(grid, abscissas, waveforms, fill_value=None)
+        np.testing.assert_allclose(array[2][out_of_range], np.sin(x[-11]))
+
+        # the rows of a 2-D array are temporary objects whose id can be reused
+        warped_x = x**1.5 / x[-1]**.5
+        abscissas = np.stack((x, x, warped_x, warped_x**2 / x[-1]))
+        waveforms = np.stack((np.sin(x), np.cos(x), np.sin(x), np.cos(x)))
+        expected = np.stack([np.interp(grid, abscissa, waveform)
+                             for abscissa, waveform in zip(abscissas, waveforms)])
+        np.testing.assert_allclose(resample(grid, abscissas, waveforms), expected)
+        np.testing.assert_allclose(resample(grid, list(abscissas), waveforms), expected)
+
+        with self.assertRaises(ValueError):
+            resample(grid, x, values, method='quadratic')
+
+    ##############################################
+
+    def test_group_by_abscissa(self):
+
+        x = self.x
+        groups = _group_by_abscissa((x, x.copy(), 2*x, x, list(x)))
+        self.assertEqual([group for abscissa, group in groups], [[0, 1, 3, 4], [2]])
+        np.testing.assert_array_equal(groups[1][0], 2*x)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,115 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Probe.Measurement import (average, crossing_time, delay, duty_cycle, fall_time,
+                                       frequency, overshoot, peak_to_peak, rise_time, rms,
+                                       settling_time)
+from PySpice.Probe.WaveForm import WaveForm
+
+####################################################################################################
+
+class TestMeasurement(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self.time = np.linspace(0, 1e-3, 10001)
+        # ramp from 100 us to 200 us
+        self.ramp = np.clip((self.time - 1e-4) / 1e-4, 0, 1)
+        self.sine = np.sin(2*np.pi*10e3*self.time)
+
+    ##############################################
+
+    def test_crossing(self):
+
+        time = self.time
+        self.assertAlmostEqual(crossing_time(self.ramp, .5, x=time), 1.5e-4)
+        self.assertTrue(np.isnan(crossing_time(self.ramp, .5, direction='fall', x=time)))
+        self.assertAlmostEqual(crossing_time(self.sine, 0, direction='fall', x=time), .5e-4)
+        self.assertAlmostEqual(crossing_time(self.sine, 0, occurrence=-1, x=time), 9e-4)
+        self.assertAlmostEqual(crossing_time(self.sine, 0, direction='cross', occurrence=3, x=time), 1.5e-4)
+
+        waveform = WaveForm('out', None, self.ramp, abscissa=WaveForm('time', None, time))
+        self.assertAlmostEqual(crossing_time(waveform, .5), 1.5e-4)
+
+    ##############################################
+
+    def test_edges(self):
+
+        time = self.time
+        self.assertAlmostEqual(rise_time(self.ramp, x=time), .8e-4)
+        self.assertAlmostEqual(fall_time(1 - self.ramp, x=time), .8e-4)
+        self.assertAlmostEqual(rise_time(self.ramp, low=.2, high=.8, x=time), .6e-4)
+        self.assertAlmostEqual(delay(self.ramp, np.roll(self.ramp, 100), .5, x=time), 1e-5)
+        # the settling time is resolved to the sample
+        self.assertAlmostEqual(settling_time(self.ramp, x=time), 1.981e-4)
+        self.assertEqual(overshoot(self.ramp), 0)
+
+        step = 1 - np.exp(-time/1e-4) * np.cos(2*np.pi*2e4*time)
+        self.assertAlmostEqual(overshoot(step, initial=0), 100*(step.max() - step[-1]) / step[-1])
+
+    ##############################################
+
+    def test_statistics(self):
+
+        time = self.time
+        self.assertAlmostEqual(average(self.sine, x=time), 0)
+        self.assertAlmostEqual(average(self.ramp, x=time), .85)
+        self.assertAlmostEqual(rms(self.sine, x=time), np.sqrt(.5))
+        self.assertAlmostEqual(peak_to_peak(self.sine), 2)
+        self.assertAlmostEqual(frequency(self.sine, x=time), 10e3)
+        self.assertAlmostEqual(duty_cycle(self.sine, x=time), .5)
+        self.assertAlmostEqual(duty_cycle(self.sine, level=.5, x=time), 1/3, places=5)
+
+    ##############################################
+
+    def test_batch(self):
+
+        time = self.time
+        batch = np.stack([self.sine, 2*self.sine, np.zeros_like(self.sine)])
+        np.testing.assert_allclose(frequency(batch, x=time)[:2], (10e3, 10e3))
+        self.assertTrue(np.isnan(frequency(batch, x=time)[2]))
+        np.testing.assert_allclose(rms(batch, x=time), (np.sqrt(.5), np.sqrt(2), 0))
+        np.testing.assert_allclose(peak_to_peak(batch), (2, 4, 0))
+
+        ramps = np.stack([self.ramp, 2*self.ramp])
+        np.testing.assert_allclose(rise_time(ramps, x=time), (.8e-4, .8e-4))
+        np.testing.assert_allclose(crossing_time(ramps, (.5, .5), x=time), (1.5e-4, 1.25e-4))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,141 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+####################################################################################################
+
+from PySpice.Probe.WaveForm import (Analysis, OperatingPoint, TransientAnalysis,
+                                    WaveForm, WaveFormArray)
+
+####################################################################################################
+
+def make_transient_analysis():
+
+    time = WaveForm('time', 's', np.linspace(0, 1e-3, 101))
+    nodes = [WaveForm(name, 'V', i*np.sin(time), abscissa=time) for i, name in enumerate(('in', 'out'))]
+    branches = [WaveForm('vinput', 'A', np.cos(time), abscissa=time)]
+    return TransientAnalysis(time, nodes, branches)
+
+####################################################################################################
+
+class TestWaveForm(unittest.TestCase):
+
+    ##############################################
+
+    def test_pickle(self):
+
+        analysis = pickle.loads(pickle.dumps(make_transient_analysis()))
+        self.assertEqual(analysis.out.name, 'out')
+        self.assertEqual(analysis.out.unit, 'V')
+        self.assertIs(analysis.out.abscissa, analysis.time)
+        np.testing.assert_array_equal(analysis.out, np.sin(analysis.time))
+
+    ##############################################
+
+    def test_waveform_array(self):
+
+        time = WaveForm('time', 's', np.linspace(0, 1, 11))
+        array = np.array((time, 2*time, 3*time))
+        nodes = WaveFormArray(array, ('a', 'b', 'c'), ('V', 'V', 'V'), abscissa=time)
+        analysis = TransientAnalysis(time, nodes, ())
+        self.assertEqual(list(analysis.nodes), ['a', 'b', 'c'])
+        # the waveforms are created at their first access
+        self.assertNotIn('b', nodes._waveforms)
+        self.assertEqual(list(nodes.copy()), ['a', 'b', 'c'])
+        self.assertEqual(list(dict(nodes)), ['a', 'b', 'c'])
+        self.assertFalse(hasattr(nodes, 'pop'))
+        waveform = analysis.b
+        self.assertEqual(waveform.unit, 'V')
+        self.assertIs(waveform.abscissa, time)
+        self.assertTrue(np.shares_memory(waveform, array))
+        self.assertIs(analysis['b'], waveform)
+        np.testing.assert_array_equal(nodes.to_array(('c', 'a')), array[[2, 0]])
+        with self.assertRaises(AttributeError):
+            analysis.d
+
+    ##############################################
+
+    def test_resample(self):
+
+        analysis = make_transient_analysis()
+        grid = np.linspace(0, 1e-3, 11)
+        waveform = analysis.out.resample(grid, method='cubic')
+        self.assertEqual(waveform.name, 'out')
+        self.assertEqual(waveform.unit, 'V')
+        self.assertEqual(waveform.abscissa.name, 'time')
+        np.testing.assert_array_equal(waveform.abscissa, grid)
+        np.testing.assert_allclose(waveform, np.sin(grid))
+
+    ##############################################
+
+    @unittest.skipIf(h5py is None, "h5py is not installed")
+    def test_hdf5(self):
+
+        analysis = make_transient_analysis()
+        operating_point = OperatingPoint(nodes=[WaveForm('out', 'V', 1.5)], branches=[])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'analysis.h5')
+            analysis.save(path, desk='.title test\n.end\n', metadata=dict(run=12))
+            for lazy in (True, False):
+                loaded_analysis = Analysis.load(path, lazy=lazy)
+                self.assertIsInstance(loaded_analysis, TransientAnalysis)
+                self.assertEqual(loaded_analysis.desk, '.title test\n.end\n')
+                self.assertEqual(loaded_analysis.metadata['run'], 12)
+                self.assertEqual(list(loaded_analysis.nodes), ['in', 'out'])
+                self.assertEqual(loaded_analysis.vinput.unit, 'A')
+                self.assertIs(loaded_analysis.out.abscissa, loaded_analysis.time)
+                np.testing.assert_array_equal(loaded_analysis.out, analysis.out)
+                loaded_analysis.close()
+
+            with Analysis.load(path) as loaded_analysis:
+                out = loaded_analysis.out
+            with self.assertRaises(NameError):
+                loaded_analysis.vinput
+            np.testing.assert_array_equal(out, analysis.out)
+            loaded_analysis.close()
+
+            operating_point.save(path)
+            loaded_operating_point = Analysis.load(path, lazy=False)
+            self.assertEqual(float(loaded_operating_point.out), 1.5)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,160 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import asyncio
+import concurrent.futures
+import os
+import tempfile
+import threading
+import unittest
+
+####################################################################################################
+
+from PySpice.Spice.Cache import SimulationCache
+
+####################################################################################################
+
+class TestSimulationCache(unittest.TestCase):
+
+    ##############################################
+
+    def test_memory_budget(self):
+
+        cache = SimulationCache(memory_budget=300)
+        for i in range(10):
+            cache.put(cache.key('desk', i), b'x'*100)
+        self.assertLessEqual(cache.memory_size, 300)
+        self.assertIsNone(cache.get(cache.key('desk', 0)))
+        self.assertEqual(cache.get(cache.key('desk', 9)), b'x'*100)
+
+    ##############################################
+
+    def test_disk(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SimulationCache(directory=directory)
+            key = cache.key('ngspice-26', 'transient', '.title test\n.end\n')
+            cache.put(key, {'v(out)': [1, 2, 3]})
+            self.assertEqual(sorted(os.listdir(directory)), [key + '.json', key + '.pickle.z'])
+            cache = SimulationCache(directory=directory)
+            self.assertIn(key, cache)
+            self.assertEqual(cache.get(key), {'v(out)': [1, 2, 3]})
+            cache.clear(disk=True)
+            self.assertNotIn(key, cache)
+            self.assertEqual(os.listdir(directory), [])
+
+    ##############################################
+
+    def test_io_outside_lock(self):
+
+        acquired = []
+
+        def acquire():
+            if cache._lock.acquire(timeout=1):
+                cache._lock.release()
+                acquired.append(True)
+
+        class Cache(SimulationCache):
+            @staticmethod
+            def _write_file(path, data, mode='wb'):
+                # the lock can be acquired by another thread during the I/O
+                thread = threading.Thread(target=acquire)
+                thread.start()
+                thread.join()
+                SimulationCache._write_file(path, data, mode)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = Cache(directory=directory)
+            cache.put(cache.key('desk'), 'output')
+            self.assertEqual(acquired, [True, True])
+
+    ##############################################
+
+    def test_in_flight(self):
+
+        cache = SimulationCache()
+        key = cache.key('desk')
+        calls = []
+        barrier = threading.Barrier(4)
+
+        def simulate():
+            calls.append(1)
+            return 'output'
+
+        def request():
+            barrier.wait()
+            return cache.get_or_run(key, simulate)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: request(), range(4)))
+        self.assertEqual(results, ['output']*4)
+        self.assertEqual(len(calls), 1)
+
+    ##############################################
+
+    def test_async_in_flight(self):
+
+        cache = SimulationCache()
+        key = cache.key('desk')
+        calls = []
+
+        async def simulate():
+            calls.append(1)
+            await asyncio.sleep(.01)
+            return 'output'
+
+        async def main():
+            return await asyncio.gather(*[cache.get_or_run_async(key, simulate) for i in range(4)])
+
+        self.assertEqual(asyncio.run(main()), ['output']*4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.misses, cache.hits), (1, 3))
+
+    ##############################################
+
+    def test_store_error(self):
+
+        class Cache(SimulationCache):
+            @staticmethod
+            def _write_file(path, data, mode='wb'):
+                raise OSError('No space left on device')
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = Cache(directory=directory)
+            key = cache.key('desk')
+            with self.assertLogs(SimulationCache._logger, level='ERROR'):
+                self.assertEqual(cache.get_or_run(key, lambda: 'output'), 'output')
+            self.assertEqual(cache.get(key), 'output')
+            self.assertIsNone(cache.get(cache.key('other desk'), count_miss=True))
+            self.assertEqual((cache.misses, cache.hits), (2, 1))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,215 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import concurrent.futures
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+####################################################################################################
+
+from PySpice.Spice.Cancellation import CancellationToken, SimulationCancelled, SimulationTimeout, registered
+from PySpice.Spice.RawFile import RawFile
+from PySpice.Spice.Server import SpiceServer
+from PySpice.Unit.Units import *
+
+from test_Simulation import make_circuit, make_output, resistance
+
+####################################################################################################
+
+class TestCancellationToken(unittest.TestCase):
+
+    ##############################################
+
+    def test_token(self):
+
+        calls = []
+        token = CancellationToken()
+        child = token.child()
+        with registered(child, lambda: calls.append('registered')):
+            pass
+        child.register(lambda: calls.append('child'))
+        token.register(lambda: calls.append('parent'))
+        child.raise_if_cancelled()
+
+        token.cancel()
+        token.cancel()
+        self.assertTrue(token.cancelled)
+        self.assertTrue(child.cancelled)
+        self.assertEqual(calls, ['child', 'parent'])
+        with self.assertRaises(SimulationCancelled):
+            child.raise_if_cancelled()
+
+        # a callback registered after the cancellation is called immediately
+        token.register(lambda: calls.append('late'))
+        self.assertEqual(calls[-1], 'late')
+
+    ##############################################
+
+    def test_child_release(self):
+
+        token = CancellationToken()
+        children = [token.child() for i in range(10)]
+        for child in children[:5]:
+            child.release()
+        children[5].cancel()
+        self.assertEqual(len(token._callbacks), 4)
+        for child in children[6:]:
+            child.release()
+            child.release()
+        self.assertEqual(token._callbacks, [])
+        token.cancel()
+        self.assertFalse(any(child.cancelled for child in children[6:]))
+
+####################################################################################################
+
+class FakeSpiceServer:
+
+    """This class simulates a desk without ngspice, v(out) is set to the resistance of R1.
+
+    The simulation times out if the resistance is 666.  The first attempt of a simulation hangs
+    until it is cancelled if the resistance is 42.
+
+    """
+
+    spice_command = 'ngspice'
+
+    ##############################################
+
+    def __init__(self):
+
+        self.calls = []
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    ##############################################
+
+    def __call__(self, desk, timeout=None, cancellation_token=None):
+
+        value = resistance(desk)
+        with self._lock:
+            self.calls.append(value)
+            number_of_calls = self.calls.count(value)
+        if value == 666:
+            raise SimulationTimeout("Simulation timeout after {} s".format(timeout))
+        elif value == 42 and number_of_calls == 1:
+            event = threading.Event()
+            with registered(cancellation_token, event.set):
+                event.wait(10)
+            self.cancelled.append(value)
+            cancellation_token.raise_if_cancelled()
+        return RawFile(make_output(value))
+
+####################################################################################################
+
+class TestSimulationCancellation(unittest.TestCase):
+
+    ##############################################
+
+    def _popen(self, code):
+
+        return subprocess.Popen((sys.executable, '-c', code), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    ##############################################
+
+    def test_communicate(self):
+
+        spice_server = SpiceServer(timeout=.5)
+
+        stdout, stderr = spice_server._communicate(self._popen('print("done")'))
+        self.assertEqual(stdout.strip(), b'done')
+
+        # the process is killed on timeout
+        process = self._popen('import time; time.sleep(60)')
+        start_time = time.monotonic()
+        with self.assertRaises(SimulationTimeout):
+            spice_server._communicate(process)
+        self.assertLess(time.monotonic() - start_time, 10)
+        self.assertIsNotNone(process.returncode)
+
+        # and on cancellation
+        process = self._popen('import time; time.sleep(60)')
+        token = CancellationToken()
+        timer = threading.Timer(.2, token.cancel)
+        timer.start()
+        with self.assertRaises(SimulationCancelled):
+            spice_server._communicate(process, timeout=30, cancellation_token=token)
+        timer.join()
+        self.assertIsNotNone(process.poll())
+
+    ##############################################
+
+    def _run(self, values, **kwargs):
+
+        circuit = make_circuit()
+        spice_server = FakeSpiceServer()
+        simulator = circuit.simulator(spice_server=spice_server)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            analyses = simulator.run_parameter_sets([{'R1.resistance': value} for value in values],
+                                                    'transient', micro(1), milli(1),
+                                                    executor=executor, **kwargs)
+        return spice_server, analyses
+
+    ##############################################
+
+    def test_timeout(self):
+
+        # a simulation which timed out gives None
+        spice_server, analyses = self._run((1, 666, 3), timeout=10)
+        self.assertIsNone(analyses[1])
+        self.assertEqual([float(analyses[i].out[0]) for i in (0, 2)], [1, 3])
+
+    ##############################################
+
+    def test_straggler(self):
+
+        # the straggler is dispatched again and the first attempt is cancelled
+        spice_server, analyses = self._run((1, 2, 3, 42), straggler_factor=2)
+        self.assertEqual([float(analysis.out[0]) for analysis in analyses], [1, 2, 3, 42])
+        self.assertEqual(spice_server.calls.count(42), 2)
+        # the executor waits the cancelled attempt
+        self.assertEqual(spice_server.cancelled, [42])
+
+    ##############################################
+
+    def test_cancel(self):
+
+        token = CancellationToken()
+        timer = threading.Timer(.5, token.cancel)
+        timer.start()
+        with self.assertRaises(SimulationCancelled):
+            self._run((1, 42), cancellation_token=token)
+        timer.join()
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,81 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import threading
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.NgSpice.Shared import DataCapture
+
+####################################################################################################
+
+class TestDataCapture(unittest.TestCase):
+
+    ##############################################
+
+    def test_growth(self):
+
+        data_capture = DataCapture(initial_capacity=2)
+        data_capture.start()
+        data_capture.reset(('time', 'v(out)'))
+        for i in range(100):
+            data_capture.append((i, 2*i))
+        data_capture.finish()
+        self.assertEqual(data_capture.size, 100)
+        np.testing.assert_array_equal(data_capture['v(out)'], 2*np.arange(100))
+
+    ##############################################
+
+    def test_chunks(self):
+
+        data_capture = DataCapture(initial_capacity=4, chunk_size=16)
+        data_capture.start()
+        data_capture.reset(('time', 'v(out)'), is_complex=True)
+
+        def producer():
+            for i in range(1000):
+                data_capture.append((i, 1j*i))
+            data_capture.finish()
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        chunks = list(data_capture.chunks())
+        thread.join()
+
+        data = np.concatenate(chunks)
+        self.assertEqual(data.shape, (1000, 2))
+        np.testing.assert_array_equal(data[:,1], 1j*np.arange(1000))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
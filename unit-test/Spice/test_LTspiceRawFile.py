@@ -0,0 +1,142 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.LTspice.RawFile import RawFile
+
+####################################################################################################
+
+_header = """Title: * test.asc
+Date: Thu Jun  4 23:40:58 2015
+Plotname: {plot_name}
+Flags: {flags}
+No. Variables: {number_of_variables}
+No. Points: {number_of_points:>13}
+Offset:   0.0000000000000000e+000
+Command: Linear Technology Corporation LTspice XVII
+Variables:
+{variables}
+Binary:
+"""
+
+def make_raw_file(plot_name, variables, data, fastaccess=False):
+
+    """Return a LTspice raw file for the given variables, a list of (name, unit) pairs, and data, an
+    array of shape (number of variables, number of points).
+
+    """
+
+    if np.iscomplexobj(data):
+        flags = 'complex forward log'
+        dtypes = ['<c16']*len(variables)
+    else:
+        flags = 'real forward'
+        dtypes = ['<f8'] + ['<f4']*(len(variables) - 1)
+    if fastaccess:
+        flags += ' fastaccess'
+    header = _header.format(plot_name=plot_name,
+                            flags=flags,
+                            number_of_variables=len(variables),
+                            number_of_points=data.shape[1],
+                            variables='\n'.join(['\t{}\t{}\t{}'.format(i, name, unit)
+                                                 for i, (name, unit) in enumerate(variables)]))
+    if fastaccess:
+        binary_data = b''.join(np.asarray(values, dtype=dtype).tobytes()
+                               for values, dtype in zip(data, dtypes))
+    else:
+        names = ['v{}'.format(i) for i in range(len(variables))]
+        records = np.empty(data.shape[1], dtype=np.dtype(dict(names=names, formats=dtypes)))
+        for name, values in zip(names, data):
+            records[name] = values
+        binary_data = records.tobytes()
+    return header.encode('utf-16-le') + binary_data
+
+####################################################################################################
+
+class TestLTspiceRawFile(unittest.TestCase):
+
+    _variables = (('time', 'time'), ('V(out)', 'voltage'), ('I(R1)', 'device_current'))
+
+    ##############################################
+
+    def test_transient(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        data = np.array((time, np.sin(time), 2*time))
+        for fastaccess in (False, True):
+            raw_file = RawFile(make_raw_file('Transient Analysis', self._variables, data, fastaccess))
+            self.assertEqual(raw_file.title, '* test.asc')
+            self.assertEqual(raw_file.number_of_points, time.size)
+            self.assertEqual('fastaccess' in raw_file.flags, fastaccess)
+            analysis = raw_file.to_analysis()
+            np.testing.assert_array_equal(analysis.time, time)
+            self.assertEqual(analysis.out.dtype, np.float32)
+            np.testing.assert_array_equal(analysis.out, np.sin(time).astype(np.float32))
+            np.testing.assert_array_equal(analysis.R1, (2*time).astype(np.float32))
+            self.assertIs(analysis.out.abscissa, analysis.time)
+
+    ##############################################
+
+    def test_compressed_time(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        raw_data = make_raw_file('Transient Analysis', self._variables,
+                                 np.array((-time, time, time)))
+        raw_file = RawFile(raw_data)
+        np.testing.assert_array_equal(raw_file.variables['time'].data, time)
+
+    ##############################################
+
+    def test_ac(self):
+
+        frequency = np.logspace(0, 3, 7)
+        data = np.array((frequency, 1/(1 + 1j*frequency)))
+        raw_data = make_raw_file('AC Analysis', (('frequency', 'frequency'), ('V(out)', 'voltage')),
+                                 data, fastaccess=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.raw')
+            with open(path, 'wb') as f:
+                f.write(raw_data)
+            analysis = RawFile.from_file(path).to_analysis()
+            np.testing.assert_array_equal(analysis.frequency, frequency)
+            self.assertFalse(analysis.out.flags.owndata)
+            np.testing.assert_array_equal(analysis.out, data[1])
+            del analysis
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,132 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.Netlist import Circuit
+from PySpice.Spice.MonteCarlo import GaussianTolerance, UniformTolerance, MonteCarlo, MonteCarloResult
+from PySpice.Spice.Sweep import CircuitParameterSetter
+from PySpice.Unit.Units import *
+
+####################################################################################################
+
+class TestMonteCarlo(unittest.TestCase):
+
+    ##############################################
+
+    def _make_circuit(self):
+
+        circuit = Circuit('test')
+        circuit.R(1, 'a', 'b', kilo(1))
+        circuit.D(1, 'b', circuit.gnd, model='Diode')
+        model = circuit.model('Diode', 'D', IS='4.352n', RS=0.6458)
+        circuit.R1.set_tolerance('resistance', UniformTolerance(10))
+        model.set_tolerance('IS', GaussianTolerance(30))
+        return circuit
+
+    ##############################################
+
+    def test_sample(self):
+
+        circuit = self._make_circuit()
+        monte_carlo = MonteCarlo(circuit, 1000, 'operating_point', seed=1)
+        self.assertEqual(list(monte_carlo.tolerances.keys()), ['R1.resistance', 'Diode.IS'])
+        parameters = monte_carlo.sample()
+        resistance = parameters['R1.resistance']
+        self.assertEqual(resistance.shape, (1000,))
+        self.assertTrue(np.all(resistance >= 900) and np.all(resistance <= 1100))
+        self.assertAlmostEqual(parameters['Diode.IS'].mean() / 4.352e-9, 1, places=1)
+        np.testing.assert_array_equal(resistance, monte_carlo.sample()['R1.resistance'])
+
+        parameter_set = next(monte_carlo.parameter_sets(parameters))
+        with CircuitParameterSetter(circuit) as setter:
+            setter.update(parameter_set)
+            self.assertEqual(circuit.Diode.IS, parameters['Diode.IS'][0])
+        self.assertEqual(circuit.Diode.IS, '4.352n')
+        self.assertEqual(str(circuit.R1), 'R1 a b 1k')
+
+    ##############################################
+
+    class Analysis(dict):
+        def __init__(self, time, out):
+            super().__init__(out=out)
+            self.time = time
+
+    ##############################################
+
+    def test_result(self):
+
+        time = np.linspace(0, 1, 11)
+        analyses = (self.Analysis(time, time), self.Analysis(time[::2], 2*time[::2]))
+        result = MonteCarloResult({}, analyses, {})
+        out = result['out']
+        self.assertEqual(out.shape, (2, time.size))
+        np.testing.assert_allclose(out[1], 2*time)
+        self.assertEqual(result.failed.size, 0)
+
+    ##############################################
+
+    def test_failed_runs(self):
+
+        time = np.linspace(0, 1, 11)
+        Analysis = self.Analysis
+
+        class Simulator:
+            def run_parameter_sets(self, parameter_sets, analysis_method, *args, executor=None, **kwargs):
+                self.kwargs = kwargs
+                # the first run timed out
+                return [None] + [Analysis(time, np.full(time.shape, parameter_set['R1.resistance']))
+                                 for parameter_set in list(parameter_sets)[1:]]
+
+        simulator = Simulator()
+        monte_carlo = MonteCarlo(self._make_circuit(), 3, 'transient', micro(1), milli(1),
+                                 simulator=simulator, seed=1, timeout=10)
+        result = monte_carlo.run(measurements={'vmax': lambda analysis: float(analysis['out'].max())})
+        self.assertEqual(simulator.kwargs, dict(timeout=10))
+        np.testing.assert_array_equal(result.failed, [0])
+        np.testing.assert_array_equal(result.abscissa, time)
+        out = result['out']
+        self.assertEqual(out.shape, (3, time.size))
+        self.assertTrue(np.all(np.isnan(out[0])))
+        np.testing.assert_allclose(out[1:, 0], result.parameters['R1.resistance'][1:])
+        vmax = result.measurements['vmax']
+        self.assertTrue(np.isnan(vmax[0]))
+        np.testing.assert_allclose(vmax[1:], result.parameters['R1.resistance'][1:])
+
+        with self.assertRaises(NameError):
+            MonteCarloResult({}, [None], {})['out']
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -120,6 +120,52 @@ R2 out 0 1k
 
 ####################################################################################################
 
+class TestModifiedParameters(unittest.TestCase):
+
+    ##############################################
+
+    def test(self):
+
+        circuit = VoltageDividerCircuit()
+        circuit.parameter('gain', 1)
+        circuit.clear_modified_parameters()
+        self.assertFalse(circuit.R1.modified_parameters)
+
+        circuit.R1.resistance = kilo(2)
+        circuit.R2.temp = 30 # Spice alias
+        circuit.parameter('gain', 1) # same value
+        self.assertEqual(circuit.R1.modified_parameters, {'resistance'})
+        self.assertEqual(circuit.R2.modified_parameters, {'temperature'})
+        self.assertFalse(circuit.modified_parameters)
+
+        circuit.parameter('gain', 2)
+        self.assertEqual(circuit.modified_parameters, {'gain'})
+
+        circuit.clear_modified_parameters()
+        self.assertFalse(circuit.modified_parameters)
+        self.assertFalse(circuit.R1.modified_parameters)
+
+####################################################################################################
+
+class TestDeviceModel(unittest.TestCase):
+
+    ##############################################
+
+    def test(self):
+
+        model = DeviceModel('Diode', 'D', IS='4.352n', RS=0.6458)
+        model.IS = '5n'
+        self.assertEqual(model.parameters['IS'], '5n')
+        self.assertEqual(model.RS, 0.6458)
+        # only the model parameters are routed to the .model card
+        model.comment = 'a diode'
+        self.assertEqual(model.comment, 'a diode')
+        self.assertEqual(str(model), '.model Diode D (IS=5n RS=0.6458)')
+        with self.assertRaises(AttributeError):
+            model.name = 'Diode2'
+
+####################################################################################################
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,449 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import asyncio
+import threading
+import time
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.Cancellation import CancellationToken, SimulationCancelled, SimulationTimeout
+from PySpice.Spice.NgSpice.Shared import ffi, NgSpiceShared, NgSpiceSharedPool, Plot
+
+####################################################################################################
+
+class FakeNgSpiceShared(NgSpiceShared):
+
+    """This class provides the vectors of a plot and records the commands without the shared
+    library.
+
+    """
+
+    ##############################################
+
+    def __init__(self, vectors=None, plot_names=(), **kwargs):
+
+        super().__init__(**kwargs)
+        self._plot_names = list(plot_names) + ['const']
+        self.commands = []
+        self._vector_infos = {}
+        self._buffers = []
+        self.fetched_vectors = []
+        for name, (type_, values) in (vectors or {}).items():
+            vector_info = ffi.new('vector_info *')
+            vector_info.v_type = type_
+            vector_info.v_length = len(values)
+            if np.iscomplexobj(values):
+                buffer_ = ffi.new('ngcomplex_t[]', [(x.real, x.imag) for x in values])
+                vector_info.v_compdata = buffer_
+            else:
+                buffer_ = ffi.new('double[]', list(values))
+                vector_info.v_realdata = buffer_
+            self._buffers.append(buffer_)
+            self._vector_infos[name] = vector_info
+
+    ##############################################
+
+    def _load_library(self):
+        pass
+
+    def _init_ngspice(self, send_data):
+        pass
+
+    ##############################################
+
+    @property
+    def plot_names(self):
+        return list(self._plot_names)
+
+    def _vector_names(self, plot_name):
+        return list(self._vector_infos) if plot_name != 'const' else []
+
+    ##############################################
+
+    def exec_command(self, command):
+
+        self._generation += 1
+        self.commands.append(command)
+        if command.startswith('destroy'):
+            plot_name = command.split()[1]
+            if plot_name == 'all':
+                self._plot_names = ['const']
+            else:
+                self._plot_names.remove(plot_name)
+
+    ##############################################
+
+    def _get_vector_info(self, plot_name, vector_name):
+
+        self.fetched_vectors.append(vector_name)
+        return self._vector_infos[vector_name]
+
+####################################################################################################
+
+class FakeLibrary:
+
+    """This class emulates the background thread of the shared library, a simulation lasts
+    *duration* seconds unless it is halted.
+
+    """
+
+    ##############################################
+
+    def __init__(self, ngspice_shared, duration):
+
+        self._ngspice_shared = ngspice_shared
+        self._handle = ffi.new_handle(ngspice_shared)
+        self._duration = duration
+        self._halted = threading.Event()
+        self._thread = None
+        self.commands = []
+
+    ##############################################
+
+    def _background_thread(self):
+
+        NgSpiceShared._background_thread_running(False, 0, self._handle)
+        self._halted.wait(self._duration)
+        NgSpiceShared._background_thread_running(True, 0, self._handle)
+        time.sleep(.01) # the thread exits after the callback
+
+    ##############################################
+
+    def ngSpice_Command(self, command):
+
+        self.commands.append(command.decode('utf8'))
+        if command == b'bg_halt':
+            self._halted.set()
+        elif command.startswith(b'bg_'):
+            self._halted.clear()
+            self._thread = threading.Thread(target=self._background_thread)
+            self._thread.start()
+        return 0
+
+    ##############################################
+
+    def ngSpice_running(self):
+
+        return self._thread is not None and self._thread.is_alive()
+
+####################################################################################################
+
+class ThreadNgSpiceShared(FakeNgSpiceShared):
+
+    ##############################################
+
+    def __init__(self, duration, **kwargs):
+
+        super().__init__(**kwargs)
+        self._ngspice_shared = FakeLibrary(self, duration)
+
+    ##############################################
+
+    def exec_command(self, command):
+
+        super().exec_command(command)
+        self._ngspice_shared.ngSpice_Command(command.encode('utf8'))
+
+####################################################################################################
+
+class TestBackgroundThread(unittest.TestCase):
+
+    ##############################################
+
+    def test_run(self):
+
+        ngspice_shared = ThreadNgSpiceShared(.05)
+        ngspice_shared.run()
+        self.assertFalse(ngspice_shared._ngspice_shared.ngSpice_running())
+
+        ngspice_shared.run(background=True)
+        ngspice_shared.wait(timeout=10)
+        self.assertFalse(ngspice_shared._ngspice_shared.ngSpice_running())
+        self.assertEqual(ngspice_shared.commands, [])
+
+    ##############################################
+
+    def test_timeout(self):
+
+        ngspice_shared = ThreadNgSpiceShared(60)
+        start_time = time.monotonic()
+        with self.assertRaises(SimulationTimeout):
+            ngspice_shared.run(timeout=.1)
+        self.assertLess(time.monotonic() - start_time, 10)
+        self.assertEqual(ngspice_shared.commands, ['bg_halt'])
+        self.assertFalse(ngspice_shared._ngspice_shared.ngSpice_running())
+
+        token = CancellationToken()
+        timer = threading.Timer(.1, token.cancel)
+        timer.start()
+        with self.assertRaises(SimulationCancelled):
+            ngspice_shared.run(cancellation_token=token)
+        timer.join()
+
+    ##############################################
+
+    def test_run_async(self):
+
+        ngspice_shared = ThreadNgSpiceShared(.05)
+        wait_threads = []
+        wait_thread_exit = ngspice_shared._wait_thread_exit
+        def _wait_thread_exit():
+            wait_threads.append(threading.current_thread())
+            wait_thread_exit()
+        ngspice_shared._wait_thread_exit = _wait_thread_exit
+
+        async def main():
+            await asyncio.wait_for(ngspice_shared.run_async(), timeout=10)
+            return threading.current_thread()
+
+        loop_thread = asyncio.run(main())
+        self.assertFalse(ngspice_shared._ngspice_shared.ngSpice_running())
+        self.assertEqual(ngspice_shared._pending_futures, [])
+        # the wait for the end of the thread does not block the event loop
+        self.assertEqual(len(wait_threads), 1)
+        self.assertIsNot(wait_threads[0], loop_thread)
+
+####################################################################################################
+
+class TestPlot(unittest.TestCase):
+
+    ##############################################
+
+    def _make_plot(self, plot_name, vectors, ownership='owned'):
+
+        ngspice_shared = FakeNgSpiceShared(vectors)
+        return ngspice_shared, Plot(plot_name, vectors.keys(), ngspice_shared=ngspice_shared,
+                                    ownership=ownership)
+
+    ##############################################
+
+    def test_lazy_vectors(self):
+
+        time = np.linspace(0, 1, 11)
+        ngspice_shared, plot = self._make_plot('tran1', {
+            'time': (NgSpiceShared.simulation_type.time, time),
+            'out': (NgSpiceShared.simulation_type.voltage, 2*time),
+            'vinput#branch': (NgSpiceShared.simulation_type.current, 3*time),
+        })
+        self.assertEqual(list(plot), ['time', 'out', 'vinput#branch'])
+        self.assertIn('out', plot)
+        self.assertEqual(ngspice_shared.fetched_vectors, [])
+        np.testing.assert_array_equal(plot['out'].data, 2*time)
+        plot['out']
+        self.assertEqual(ngspice_shared.fetched_vectors, ['out'])
+        with self.assertRaises(KeyError):
+            plot['in']
+        analysis = plot.to_analysis()
+        np.testing.assert_array_equal(analysis.vinput, 3*time)
+
+        self.assertEqual(list(plot.copy()), ['time', 'out', 'vinput#branch'])
+        plot.pop('out')
+        self.assertNotIn('out', plot)
+        self.assertEqual(list(plot), ['time', 'vinput#branch'])
+
+    ##############################################
+
+    def test_ownership(self):
+
+        time = np.linspace(0, 1, 11)
+        vectors = {'time': (NgSpiceShared.simulation_type.time, time)}
+        ngspice_shared, plot = self._make_plot('tran1', vectors, ownership='borrowed')
+        vector = plot['time']
+        self.assertTrue(vector.is_borrowed)
+        self.assertFalse(vector.data.flags.owndata)
+        ngspice_shared._generation += 1
+        self.assertFalse(vector.is_valid)
+        with self.assertRaises(NameError):
+            vector.data
+
+        # an analysis must not wrap the memory of a borrowed plot
+        ngspice_shared, plot = self._make_plot('tran1', {
+            'time': (NgSpiceShared.simulation_type.time, time),
+            'out': (NgSpiceShared.simulation_type.voltage, 2*time),
+        }, ownership='borrowed')
+        analysis = plot.to_analysis()
+        out = ngspice_shared._get_vector_info('tran1', 'out').v_realdata
+        self.assertFalse(np.shares_memory(analysis.out, plot['out'].data))
+        ngspice_shared._generation += 1
+        out[0] = -1
+        np.testing.assert_array_equal(analysis.time, time)
+        np.testing.assert_array_equal(analysis.out, 2*time)
+
+        ngspice_shared, plot = self._make_plot('tran1', vectors)
+        vector = plot['time']
+        self.assertFalse(vector.is_borrowed)
+        self.assertTrue(vector.data.flags.owndata)
+        ngspice_shared._generation += 1
+        np.testing.assert_array_equal(vector.data, time)
+
+        # a vector cannot be retrieved after a later command, even for an owned plot
+        ngspice_shared, plot = self._make_plot('tran1', vectors)
+        self.assertTrue(plot.is_valid)
+        ngspice_shared.exec_command('tran 1u 1m')
+        self.assertFalse(plot.is_valid)
+        with self.assertRaises(NameError):
+            plot['time']
+        with self.assertRaises(NameError):
+            plot.to_array()
+
+    ##############################################
+
+    def test_to_array(self):
+
+        frequency = np.logspace(0, 3, 7)
+        ngspice_shared, plot = self._make_plot('ac1', {
+            'frequency': (NgSpiceShared.simulation_type.frequency, frequency + 0j),
+            'out': (NgSpiceShared.simulation_type.voltage, 1/(1 + 1j*frequency)),
+        })
+        self.assertEqual(plot['out'].data.dtype, np.complex128)
+        array = plot.to_array()
+        self.assertEqual(array.shape, (2, frequency.size))
+        np.testing.assert_array_equal(array[1], 1/(1 + 1j*frequency))
+        np.testing.assert_array_equal(plot.to_array(['frequency']).real, frequency[np.newaxis])
+
+class TestGarbageCollection(unittest.TestCase):
+
+    ##############################################
+
+    def test_max_plots(self):
+
+        ngspice_shared = FakeNgSpiceShared(plot_names=('tran3', 'ac1', 'tran2', 'tran1'), max_plots=2)
+        ngspice_shared.collect_garbage()
+        self.assertEqual(ngspice_shared.plot_names, ['tran3', 'const'])
+        self.assertEqual(ngspice_shared.commands, ['destroy ac1', 'destroy tran2', 'destroy tran1'])
+
+    ##############################################
+
+    def test_circuits(self):
+
+        ngspice_shared = FakeNgSpiceShared(plot_names=('tran1',), retain_circuits=False, max_plots=1)
+        ngspice_shared._number_of_circuits = 2
+        ngspice_shared.collect_garbage(circuit_loading=True)
+        self.assertEqual(ngspice_shared.number_of_circuits, 0)
+        # the plots are collected before the run
+        self.assertEqual(ngspice_shared.commands, ['remcirc', 'remcirc'])
+
+    ##############################################
+
+    def test_memory_high_water_mark(self):
+
+        # a plot has 64 points, i.e. 512 bytes
+        vectors = {'time': (NgSpiceShared.simulation_type.time, np.zeros(64))}
+        ngspice_shared = FakeNgSpiceShared(vectors, plot_names=('tran2', 'tran1'), memory_high_water_mark=1500)
+        self.assertEqual(ngspice_shared.memory_usage(), 1024)
+        self.assertEqual(len(ngspice_shared.fetched_vectors), 2)
+        ngspice_shared.collect_garbage()
+        self.assertEqual(ngspice_shared.commands, [])
+        self.assertEqual(ngspice_shared._collected_generation, ngspice_shared.generation)
+        # the size of a plot is computed once
+        self.assertEqual(len(ngspice_shared.fetched_vectors), 2)
+
+        ngspice_shared._plot_names.insert(0, 'tran3')
+        ngspice_shared.collect_garbage()
+        self.assertEqual(len(ngspice_shared.fetched_vectors), 3)
+        self.assertEqual(ngspice_shared.plot_names, ['const'])
+        self.assertEqual(ngspice_shared.commands, ['destroy all'])
+        self.assertEqual(ngspice_shared.memory_usage(), 0)
+
+        # the circuits are retained below the high-water mark
+        ngspice_shared.commands.clear()
+        ngspice_shared._number_of_circuits = 2
+        ngspice_shared._plot_names[:0] = ['tran5', 'tran4']
+        ngspice_shared.collect_garbage(circuit_loading=True)
+        self.assertEqual(ngspice_shared.commands, [])
+        self.assertEqual(ngspice_shared.number_of_circuits, 2)
+
+        # the loading of a circuit beyond the high-water mark resets ngspice
+        ngspice_shared._plot_names.insert(0, 'tran6')
+        ngspice_shared.collect_garbage(circuit_loading=True)
+        self.assertEqual(ngspice_shared.commands, ['destroy all', 'remcirc', 'remcirc'])
+        self.assertEqual(ngspice_shared.number_of_circuits, 0)
+        self.assertEqual(ngspice_shared.plot_names, ['const'])
+
+####################################################################################################
+
+class PoolNgSpiceShared(FakeNgSpiceShared):
+
+    """This class simulates a transient analysis where v(out) is the instance id times the time."""
+
+    time = np.linspace(0, 1, 11)
+
+    ##############################################
+
+    def __init__(self, ngspice_id=0, send_data=False):
+
+        super().__init__({
+            'time': (NgSpiceShared.simulation_type.time, self.time),
+            'out': (NgSpiceShared.simulation_type.voltage, ngspice_id*self.time),
+        }, ngspice_id=ngspice_id, send_data=send_data)
+
+    ##############################################
+
+    @property
+    def current_plot(self):
+        return self._plot_names[0]
+
+    def load_circuit(self, circuit):
+        self.commands.append('load')
+
+    def run(self, timeout=None, cancellation_token=None):
+        self._generation += 1
+        self._plot_names.insert(0, 'tran1')
+
+####################################################################################################
+
+class TestNgSpiceSharedPool(unittest.TestCase):
+
+    ##############################################
+
+    def test_simulate(self):
+
+        time = PoolNgSpiceShared.time
+        pool = NgSpiceSharedPool(number_of_instances=2, ngspice_shared_class=PoolNgSpiceShared)
+        plot = pool.simulate('desk')
+        instance = pool._instances[0]
+        self.assertEqual(instance.commands, ['load', 'destroy all'])
+        # the plot is usable after the reset of the instance
+        np.testing.assert_array_equal(plot['out'].data, time)
+        np.testing.assert_array_equal(plot.to_array(), np.stack((time, time)))
+        np.testing.assert_array_equal(plot.to_analysis().out, time)
+
+        plots = pool.map(['desk'] * 4)
+        for plot in plots:
+            out = plot['out'].data
+            self.assertTrue(np.array_equal(out, time) or np.array_equal(out, 2*time))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
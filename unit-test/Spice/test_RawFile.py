@@ -0,0 +1,310 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.Netlist import Circuit
+from PySpice.Spice.RawFile import RawFile, map_raw_file
+
+####################################################################################################
+
+_server_header = """Circuit: test
+
+Doing analysis at TEMP = 25.000000 and TNOM = 25.000000
+
+"""
+
+_header = """Title: test
+Date: Thu Jun  4 23:40:58  2015
+Plotname: {plot_name}
+Flags: {flags}
+No. Variables: {number_of_variables}
+No. Points: {number_of_points}
+Variables:
+{variables}
+Binary:
+"""
+
+def make_raw_file(plot_name, variables, data, server_mode=False, header_number_of_points=None):
+
+    """Return the binary output of ngspice for the given variables, a list of (name, unit) pairs,
+    and data, an array of shape (number of variables, number of points).
+
+    """
+
+    number_of_points = data.shape[1]
+    if header_number_of_points is None:
+        header_number_of_points = number_of_points
+    flags = 'complex' if np.iscomplexobj(data) else 'real'
+    header = _header.format(plot_name=plot_name,
+                            flags=flags,
+                            number_of_variables=len(variables),
+                            number_of_points=header_number_of_points,
+                            variables='\n'.join(['\t{}\t{}\t{}'.format(i, name, unit)
+                                                 for i, (name, unit) in enumerate(variables)]))
+    if server_mode:
+        header = _server_header + header
+    if flags == 'complex':
+        data = np.asarray(data, dtype=np.complex128)
+    else:
+        data = np.asarray(data, dtype=np.float64)
+    return header.encode('utf-8') + data.transpose().tobytes()
+
+def make_ascii_raw_file(plot_name, variables, data):
+
+    """Return the ASCII output of ngspice, cf. :func:`make_raw_file`."""
+
+    header = _header.replace('Binary:', 'Values:')
+    header = header.format(plot_name=plot_name,
+                           flags='complex' if np.iscomplexobj(data) else 'real',
+                           number_of_variables=len(variables),
+                           number_of_points=data.shape[1],
+                           variables='\n'.join(['\t{}\t{}\t{}'.format(i, name, unit)
+                                                for i, (name, unit) in enumerate(variables)]))
+    if np.iscomplexobj(data):
+        to_str = lambda x: '{:.15e},{:.15e}'.format(x.real, x.imag)
+    else:
+        to_str = lambda x: '{:.15e}'.format(x)
+    lines = []
+    for i, point in enumerate(data.transpose()):
+        lines.append(' {}\t{}'.format(i, to_str(point[0])))
+        lines += ['\t{}'.format(to_str(x)) for x in point[1:]]
+    return (header + '\n'.join(lines) + '\n').encode('utf-8')
+
+####################################################################################################
+
+class TestRawFile(unittest.TestCase):
+
+    ##############################################
+
+    def test_server_mode(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        data = np.array((time, np.sin(time), 2*time))
+        stdout = make_raw_file('Transient Analysis',
+                               (('time', 'time'), ('v(in)', 'voltage'), ('i(vinput)', 'current')),
+                               data,
+                               server_mode=True, header_number_of_points=0)
+        raw_file = RawFile(stdout, number_of_points=time.size)
+        self.assertEqual(raw_file.circuit, 'test')
+        self.assertEqual(raw_file.plot_name, 'Transient Analysis')
+        self.assertEqual(raw_file.number_of_points, time.size)
+        np.testing.assert_array_equal(raw_file.variables['v(in)'].data, data[1])
+        np.testing.assert_array_equal(raw_file.variables['i(vinput)'].data, data[2])
+
+    ##############################################
+
+    def test_written_raw_file(self):
+
+        frequency = np.logspace(0, 3, 7)
+        data = np.array((frequency, 1/(1 + 1j*frequency)))
+        raw_data = make_raw_file('AC Analysis', (('frequency', 'frequency'), ('v(out)', 'voltage')), data)
+        raw_file = RawFile(raw_data)
+        self.assertEqual(raw_file.title, 'test')
+        self.assertEqual(raw_file.flags, 'complex')
+        self.assertEqual(raw_file.number_of_points, frequency.size)
+        v_out = raw_file.variables['v(out)'].data
+        self.assertEqual(v_out.dtype, np.complex128)
+        self.assertFalse(v_out.flags.owndata)
+        np.testing.assert_array_equal(v_out, data[1])
+
+    ##############################################
+
+    def test_read_plots(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        raw_data = b''.join(make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                                          np.array((time[:i], i*time[:i])))
+                            for i in (5, 11, 7))
+        raw_files = RawFile.read_plots(raw_data)
+        self.assertEqual([raw_file.number_of_points for raw_file in raw_files], [5, 11, 7])
+        for i, raw_file in zip((5, 11, 7), raw_files):
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, i*time[:i])
+        self.assertEqual(raw_files[-1].end, len(raw_data))
+
+    ##############################################
+
+    def test_find_data_section(self):
+
+        time = np.linspace(0, 1e-3, 100000)
+        raw_data = make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                                 np.array((time, time)))
+        header_size = raw_data.index(b'Binary:\n')
+
+        # only the header lines must be read
+        class Buffer:
+            def __len__(self):
+                return len(raw_data)
+            def __getitem__(self, key):
+                if key.start > header_size:
+                    raise AssertionError("The data section is read")
+                return raw_data[key]
+
+        self.assertEqual(RawFile._find_data_section(Buffer()), (header_size, b'Binary:\n'))
+        self.assertEqual(RawFile._find_data_section(raw_data[:header_size]), (-1, None))
+
+    ##############################################
+
+    def test_header(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        raw_data = make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                                 np.array((time, time)))
+        raw_data = raw_data.replace(b'Title: test', b'Warning: singular matrix\nTitle: test: a title')
+        raw_file = RawFile(raw_data)
+        self.assertEqual(raw_file.title, 'test: a title')
+        self.assertEqual(raw_file.circuit, raw_file.title)
+        self.assertEqual(raw_file.date, 'Thu Jun  4 23:40:58  2015')
+        self.assertEqual(raw_file.warnings, ['singular matrix'])
+        self.assertIsNone(raw_file.temperature)
+        self.assertEqual(list(raw_file.variables.keys()), ['time', 'v(out)'])
+        with self.assertRaises(NameError):
+            RawFile(raw_data.replace(b'Flags: real\n', b''))
+
+    ##############################################
+
+    def test_lazy_decoding(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        plots = [make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                               np.array((time[:i], i*time[:i])))
+                 for i in (5, 11)]
+        raw_data = b''.join(plots)
+        first, second = RawFile.read_plots(raw_data)
+        self.assertEqual((first.offset, second.offset), (0, len(plots[0])))
+        self.assertEqual(second.data_offset, len(plots[0]) + raw_data[len(plots[0]):].index(b'Binary:\n') + 8)
+        self.assertFalse(first.decoded)
+        self.assertFalse(second.decoded)
+        np.testing.assert_array_equal(second.variables['v(out)'].data, 11*time)
+        self.assertFalse(first.decoded)
+        self.assertTrue(second.decoded)
+        first = pickle.loads(pickle.dumps(first))
+        np.testing.assert_array_equal(first.variables['v(out)'].data, 5*time[:5])
+
+    ##############################################
+
+    def test_pickle(self):
+
+        time = np.linspace(0, 1, 10000)
+        raw_file = RawFile(make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                                         np.array((time, 2*time))))
+        data = pickle.dumps(raw_file)
+        # the variable data are views on the data matrix which is pickled once
+        self.assertLess(len(data), 1.1*raw_file.data.nbytes)
+        raw_file = pickle.loads(data)
+        self.assertTrue(np.shares_memory(raw_file.variables['v(out)'].data, raw_file.data))
+        np.testing.assert_array_equal(raw_file.variables['v(out)'].data, 2*time)
+
+    ##############################################
+
+    def test_to_analysis(self):
+
+        circuit = Circuit('test')
+        circuit.V('input', 'in', circuit.gnd, 1)
+        circuit.R(1, 'in', 'out', 1)
+        circuit.R(2, 'out', circuit.gnd, 1)
+        time = np.linspace(0, 1e-3, 11)
+        data = np.array((time, np.sin(time), np.cos(time), 2*time))
+        raw_file = RawFile(make_raw_file('Transient Analysis',
+                                         (('time', 'time'), ('v(in)', 'voltage'),
+                                          ('i(vinput)', 'current'), ('v(out)', 'voltage')),
+                                         data))
+        analysis = raw_file.to_analysis(circuit)
+        self.assertEqual(analysis.nodes.index, {'in': 1, 'out': 3})
+        # the waveforms are views on the data
+        self.assertIs(analysis.nodes.array, analysis.branches.array)
+        self.assertTrue(np.shares_memory(analysis.nodes.array, raw_file.data))
+        self.assertTrue(np.shares_memory(analysis.out, raw_file.data))
+        np.testing.assert_array_equal(analysis.nodes.to_array().max(axis=1), (np.sin(time[-1]), 2*time[-1]))
+        np.testing.assert_array_equal(analysis.Vinput, np.cos(time))
+        self.assertIs(analysis.out.abscissa, analysis.time)
+
+    ##############################################
+
+    def test_ascii(self):
+
+        time = np.linspace(0, 1e-3, 11)
+        raw_data = make_ascii_raw_file('Transient Analysis',
+                                       (('time', 'time'), ('v(out)', 'voltage')),
+                                       np.array((time, np.sin(time))))
+        frequency = np.logspace(0, 3, 7)
+        raw_data += make_ascii_raw_file('AC Analysis',
+                                        (('frequency', 'frequency'), ('v(out)', 'voltage')),
+                                        np.array((frequency, 1/(1 + 1j*frequency))))
+        transient, ac = RawFile.read_plots(raw_data)
+        self.assertFalse(transient.binary)
+        np.testing.assert_allclose(transient.variables['v(out)'].data, np.sin(time), rtol=1e-14)
+        self.assertEqual(ac.number_of_points, frequency.size)
+        np.testing.assert_allclose(ac.variables['v(out)'].data, 1/(1 + 1j*frequency), rtol=1e-14)
+
+        # CRLF line endings
+        raw_file = RawFile(raw_data.replace(b'\n', b'\r\n'))
+        self.assertFalse(raw_file.binary)
+        self.assertEqual(raw_file.plot_name, 'Transient Analysis')
+        self.assertEqual(list(raw_file.variables.keys()), ['time', 'v(out)'])
+        np.testing.assert_allclose(raw_file.variables['v(out)'].data, np.sin(time), rtol=1e-14)
+
+    ##############################################
+
+    def test_memory_map(self):
+
+        # a large plot so as the second header is found after several chunks
+        time = np.linspace(0, 1, 10000)
+        raw_data = b''.join(make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                                          np.array((time, i*time)))
+                            for i in (1, 2))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'output.raw')
+            with open(path, 'wb') as f:
+                f.write(raw_data)
+            raw_file = RawFile.from_file(path)
+            self.assertFalse(raw_file.variables['v(out)'].data.flags.writeable)
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, time)
+            circuit = Circuit('test')
+            circuit.R(1, 'out', circuit.gnd, 1)
+            analysis = raw_file.to_analysis(circuit)
+            # the waveforms are read-only views on the map
+            self.assertFalse(analysis.out.flags.writeable)
+            self.assertTrue(np.shares_memory(analysis.nodes.array, raw_file.data))
+            raw_files = RawFile.read_plots(map_raw_file(path))
+            self.assertEqual(len(raw_files), 2)
+            np.testing.assert_array_equal(raw_files[1].variables['v(out)'].data, 2*time)
+            del raw_file, raw_files, analysis
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
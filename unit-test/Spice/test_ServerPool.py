@@ -0,0 +1,218 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Spice.Cancellation import CancellationToken, SimulationCancelled, SimulationTimeout
+from PySpice.Spice.ServerPool import SpiceServerPool, SpiceWorker
+from PySpice.Unit.Units import *
+
+from test_Simulation import make_circuit
+
+####################################################################################################
+
+# This script emulates ngspice in pipe mode: v(out) is set to the resistance of R1, or to the plot
+# index for the write commands of a .control block.  The run hangs if the resistance is 666 and
+# fails if it is 13.
+FAKE_NGSPICE = '''#!{executable}
+import re, sys, time
+sys.path[:0] = {path!r}
+import numpy as np
+from test_RawFile import make_raw_file
+
+def output(value):
+    time = np.linspace(0, 1, 5)
+    return make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                         np.array((time, np.full(time.shape, value))))
+
+def resistance():
+    return float(re.search(r'^R1 \\S+ \\S+ (\\S+)$', desk, re.M).group(1))
+
+desk = ''
+for line in sys.stdin:
+    command, _, argument = line.strip().partition(' ')
+    if command == 'source':
+        desk = open(argument).read()
+        if '.control' in desk:
+            control = [line.split() for line in desk[desk.index('.control'):].splitlines()]
+            writes = [words[1] for words in control if words and words[0] == 'write']
+            foreach_sizes = [len(words) - 2 for words in control if words and words[0] == 'foreach']
+            number_of_plots = int(np.prod(foreach_sizes)) if foreach_sizes else len(writes)
+            with open(writes[0], 'ab') as f:
+                for i in range(number_of_plots):
+                    f.write(output(i))
+    elif command == 'run':
+        if resistance() == 666:
+            time.sleep(60)
+        elif resistance() == 13:
+            print('Error: singular matrix', flush=True)
+    elif command == 'write':
+        with open(argument, 'wb') as f:
+            f.write(output(resistance()))
+    elif command == 'echo':
+        print(argument, flush=True)
+    elif command == 'quit':
+        break
+'''
+
+####################################################################################################
+
+class TestSpiceServerPool(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self._directory = tempfile.mkdtemp()
+        self._spice_command = os.path.join(self._directory, 'ngspice')
+        with open(self._spice_command, 'w') as f:
+            f.write(FAKE_NGSPICE.format(executable=sys.executable,
+                                        path=[os.path.dirname(os.path.abspath(__file__))] + sys.path))
+        os.chmod(self._spice_command, stat.S_IRWXU)
+
+    ##############################################
+
+    def tearDown(self):
+
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    ##############################################
+
+    def _desk(self, resistance):
+
+        circuit = make_circuit()
+        circuit.R1.resistance = resistance
+        return str(circuit.simulator())
+
+    ##############################################
+
+    def test_worker(self):
+
+        worker = SpiceWorker(self._spice_command)
+        try:
+            raw_file = worker(self._desk(10))
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, 10)
+            process = worker._process
+            self.assertTrue(worker.is_alive())
+            self.assertEqual(worker.number_of_jobs, 1)
+
+            # the process is reused
+            worker(self._desk(20))
+            self.assertIs(worker._process, process)
+
+            # ngspice errors, the output is read up to the sentinel
+            with self.assertRaises(NameError):
+                worker(self._desk(13))
+            self.assertTrue(worker.synchronised)
+
+            # the process is restarted if it died
+            process.kill()
+            process.wait(timeout=5)
+            raw_file = worker(self._desk(40))
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, 40)
+            self.assertIsNot(worker._process, process)
+            self.assertEqual(worker.number_of_jobs, 1)
+            process = worker._process
+
+            # the process is killed on timeout and restarted for the next job
+            with self.assertRaises(SimulationTimeout):
+                worker(self._desk(666), timeout=.5)
+            self.assertFalse(worker.synchronised)
+            process.wait(timeout=5)
+            raw_file = worker(self._desk(30))
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, 30)
+            self.assertIsNot(worker._process, process)
+            self.assertEqual(worker.number_of_jobs, 1)
+
+            # likewise on cancellation
+            token = CancellationToken()
+            timer = threading.Timer(.5, token.cancel)
+            timer.start()
+            with self.assertRaises(SimulationCancelled):
+                worker(self._desk(666), cancellation_token=token)
+            timer.join()
+            with self.assertRaises(SimulationCancelled):
+                worker(self._desk(10), cancellation_token=token)
+        finally:
+            worker.close()
+        self.assertFalse(os.path.exists(worker._directory))
+
+    ##############################################
+
+    def test_pool(self):
+
+        with SpiceServerPool(self._spice_command, number_of_workers=1, max_jobs_per_worker=2,
+                             timeout=.5) as spice_server:
+            worker = spice_server._workers[0]
+            spice_server(self._desk(1))
+            process = worker._process
+            spice_server(self._desk(2))
+            # the worker is recycled after two jobs
+            self.assertIsNone(worker._process)
+            process.wait(timeout=5)
+            raw_file = spice_server(self._desk(3))
+            np.testing.assert_array_equal(raw_file.variables['v(out)'].data, 3)
+
+            # the default timeout of the pool applies, the worker is stopped
+            process = worker._process
+            with self.assertRaises(SimulationTimeout):
+                spice_server(self._desk(666))
+            self.assertIsNone(worker._process)
+            process.wait(timeout=5)
+            spice_server(self._desk(4))
+        with self.assertRaises(NameError):
+            spice_server(self._desk(5))
+
+    ##############################################
+
+    def test_batch(self):
+
+        circuit = make_circuit()
+        circuit.R1.resistance = 10
+        with SpiceServerPool(self._spice_command, number_of_workers=1) as spice_server:
+            simulator = circuit.simulator(spice_server=spice_server)
+
+            analysis = simulator.transient(micro(1), milli(1))
+            np.testing.assert_array_equal(analysis.out, 10)
+
+            analyses = simulator.batched_sweep({'R1.resistance': (1, 2, 3)}, 'transient', micro(1), milli(1))
+            self.assertEqual([float(analysis.out[0]) for analysis in analyses], [0, 1, 2])
+
+            # the raw file of the previous batch is not appended
+            analyses = simulator.analyses(operating_point=(), transient=(micro(1), milli(1)))
+            self.assertEqual(list(analyses), ['operating_point', 'transient'])
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,297 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import asyncio
+import re
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PySpice.Probe.WaveForm import TransientAnalysis, WaveForm
+from PySpice.Spice.Cancellation import SimulationTimeout
+from PySpice.Spice.MonteCarlo import MonteCarlo, UniformTolerance
+from PySpice.Spice.Netlist import Circuit
+from PySpice.Spice.RawFile import RawFile
+from PySpice.Spice.Server import SpiceServer
+from PySpice.Spice.Simulation import (AsyncSubprocessCircuitSimulator, CircuitSimulator,
+                                      NgSpiceSharedCircuitSimulator)
+from PySpice.Unit.Units import *
+
+from test_Plot import FakeLibrary, FakeNgSpiceShared, ThreadNgSpiceShared
+from test_RawFile import make_raw_file
+
+####################################################################################################
+
+def make_circuit():
+
+    circuit = Circuit('test')
+    circuit.V('input', 'a', circuit.gnd, 1)
+    circuit.R(1, 'a', 'out', kilo(1))
+    circuit.R(2, 'out', circuit.gnd, kilo(1))
+    return circuit
+
+####################################################################################################
+
+def make_output(value):
+
+    """Return a raw file where v(out) is constant."""
+
+    time = np.linspace(0, 1, 5)
+    return make_raw_file('Transient Analysis', (('time', 'time'), ('v(out)', 'voltage')),
+                         np.array((time, np.full(time.shape, value))))
+
+def resistance(desk):
+    return float(re.search(r'^R1 \S+ \S+ (\S+)$', desk, re.M).group(1))
+
+####################################################################################################
+
+class FakeAsyncSpiceServer:
+
+    """This class simulates a desk without ngspice, v(out) is set to the resistance of R1 or to the
+    plot index in batch mode.
+
+    """
+
+    spice_command = 'ngspice'
+
+    ##############################################
+
+    async def __call__(self, desk, timeout=None, cancellation_token=None):
+
+        await asyncio.sleep(0)
+        return RawFile(make_output(resistance(desk)))
+
+    ##############################################
+
+    async def batch(self, desk, raw_file_name, timeout=None, cancellation_token=None):
+
+        control = desk[desk.index('.control'):]
+        foreach_sizes = [len(line.split()) - 2 for line in control.splitlines()
+                         if line.strip().startswith('foreach')]
+        if foreach_sizes:
+            number_of_plots = int(np.prod(foreach_sizes))
+        else:
+            number_of_plots = control.count('write ')
+        return RawFile.read_plots(b''.join(make_output(i) for i in range(number_of_plots)))
+
+####################################################################################################
+
+class TestSimulation(unittest.TestCase):
+
+    ##############################################
+
+    def test_analysis_commands(self):
+
+        circuit = Circuit('test')
+        circuit.V('input', 'a', circuit.gnd, 1)
+        circuit.R(1, 'a', circuit.gnd, kilo(1))
+        simulator = circuit.simulator()
+        commands = simulator._analysis_commands(dict(
+            operating_point=(),
+            ac=dict(start_frequency=1, stop_frequency=mega(1), number_of_points=10, variation='dec'),
+            transient=(micro(1), milli(1)),
+        ))
+        self.assertEqual(commands, [('operating_point', 'op'),
+                                    ('ac', 'ac dec 10 1 1Meg'),
+                                    ('transient', 'tran 1u 1m')])
+
+        simulator.control('op', 'write output.raw')
+        desk = str(simulator)
+        self.assertNotIn('\n.op\n', desk)
+        self.assertTrue(desk.endswith('.control\nop\nwrite output.raw\n.endc\n.end\n'))
+        simulator.reset_analysis()
+        self.assertNotIn('.control', str(simulator))
+
+    ##############################################
+
+    def test_saved_vectors(self):
+
+        circuit = Circuit('test')
+        circuit.V('input', 'a', circuit.gnd, 1)
+        circuit.R(1, 'a', 'b', kilo(1))
+        circuit.R(2, 'b', circuit.gnd, kilo(1))
+        simulator = circuit.simulator()
+
+        def desk(**kwargs):
+            accessed_names = CircuitSimulator._run(simulator, 'transient', micro(1), milli(1), **kwargs)
+            return accessed_names, str(simulator)
+
+        self.assertNotIn('.save', desk()[1])
+        simulator.outputs('b', 'Vinput')
+        self.assertIn('.save b i(Vinput)\n', desk()[1])
+        simulator.outputs()
+
+        simulator.record_outputs = True
+        accessed_names, first_desk = desk()
+        self.assertNotIn('.save', first_desk)
+        time = WaveForm('time', 's', [0, 1])
+        analysis = TransientAnalysis(time, nodes=[WaveForm('a', 'V', [0, 1], abscissa=time),
+                                                  WaveForm('b', 'V', [0, 1], abscissa=time)],
+                                     branches=[])
+        analysis.record_accesses(accessed_names)
+        analysis.b
+        getattr(analysis, 'v_sweep', None)
+        self.assertIn('.save b\n', desk()[1])
+
+        self.assertIn('.save a b\n', desk(probes=('a', 'b'))[1])
+
+####################################################################################################
+
+class TestAsyncSimulator(unittest.TestCase):
+
+    ##############################################
+
+    def test_async_methods(self):
+
+        circuit = make_circuit()
+        simulator = AsyncSubprocessCircuitSimulator(circuit, spice_server=FakeAsyncSpiceServer())
+
+        async def main():
+            analyses = await simulator.run_parameter_sets([{'R1.resistance': 1}, {'R1.resistance': 2}],
+                                                          'transient', micro(1), milli(1))
+            np.testing.assert_array_equal([float(analysis.out[0]) for analysis in analyses], (1, 2))
+
+            analyses = await simulator.batched_sweep({'R1.resistance': (1, 2, 3)}, 'transient', micro(1), milli(1))
+            self.assertEqual(len(analyses), 3)
+
+            analyses = await simulator.analyses(operating_point=(), transient=(micro(1), milli(1)))
+            self.assertEqual(list(analyses), ['operating_point', 'transient'])
+
+        asyncio.run(main())
+
+    ##############################################
+
+    def test_synchronous_server(self):
+
+        with self.assertRaises(NameError):
+            AsyncSubprocessCircuitSimulator(make_circuit(), spice_server=SpiceServer())
+
+    ##############################################
+
+    def test_monte_carlo(self):
+
+        circuit = make_circuit()
+        circuit.R1.set_tolerance('resistance', UniformTolerance(10))
+        simulator = AsyncSubprocessCircuitSimulator(circuit, spice_server=FakeAsyncSpiceServer())
+        monte_carlo = MonteCarlo(circuit, 4, 'transient', micro(1), milli(1), simulator=simulator, seed=1)
+        with self.assertRaises(NameError):
+            monte_carlo.run()
+        result = asyncio.run(monte_carlo.run_async(measurements={'vout': lambda analysis: float(analysis.out[0])}))
+        np.testing.assert_allclose(result.measurements['vout'], result.parameters['R1.resistance'], rtol=1e-5)
+
+####################################################################################################
+
+class TestNgSpiceSharedSimulator(unittest.TestCase):
+
+    ##############################################
+
+    def test_alter_commands(self):
+
+        class NgSpiceShared(FakeNgSpiceShared):
+            def load_circuit(self, circuit):
+                self.commands.append('load')
+
+        circuit = make_circuit()
+        circuit.parameter('gain', 2)
+        ngspice_shared = NgSpiceShared()
+        simulator = NgSpiceSharedCircuitSimulator(circuit, ngspice_shared=ngspice_shared)
+
+        def load():
+            ngspice_shared.commands.clear()
+            simulator._load_desk(str(simulator))
+            return ngspice_shared.commands
+
+        self.assertEqual(load(), ['load'])
+        self.assertEqual(load(), [])
+
+        circuit.R1.resistance = kilo(2)
+        self.assertEqual(load(), ['alter R1 = 2k'])
+
+        # reset reverts the previous alter commands, thus they are sent again
+        circuit.parameter('gain', 3)
+        self.assertEqual(load(), ['alterparam gain = 3', 'reset', 'alter R1 = 2k'])
+
+        # a new element
+        circuit.R(3, 'out', circuit.gnd, kilo(1))
+        self.assertEqual(load(), ['load'])
+        circuit.parameter('gain', 4)
+        self.assertEqual(load(), ['alterparam gain = 4', 'reset'])
+
+        # a modified line which is not an altered parameter
+        simulator.temperature = 50
+        circuit.R2.resistance = kilo(3)
+        self.assertEqual(load(), ['load'])
+
+    ##############################################
+
+    def test_analyses(self):
+
+        class Library(FakeLibrary):
+            def ngSpice_Command(self, command):
+                # each analysis creates a plot, e.g. bg_tran -> tran1
+                analysis = command.decode('utf8').split()[0][3:]
+                if analysis != 'halt':
+                    self._ngspice_shared._plot_names.insert(0, analysis + '1')
+                return super().ngSpice_Command(command)
+
+        class NgSpiceShared(ThreadNgSpiceShared):
+            def __init__(self, duration):
+                super().__init__(duration, vectors={
+                    'time': (FakeNgSpiceShared.simulation_type.time, np.linspace(0, 1, 5)),
+                    'v(v-sweep)': (FakeNgSpiceShared.simulation_type.voltage, np.linspace(0, 1, 5)),
+                    'out': (FakeNgSpiceShared.simulation_type.voltage, np.ones(5)),
+                })
+                self._ngspice_shared = Library(self, duration)
+            @property
+            def current_plot(self):
+                return self._plot_names[0]
+            def load_circuit(self, circuit):
+                self.commands.append('load')
+
+        ngspice_shared = NgSpiceShared(.01)
+        simulator = NgSpiceSharedCircuitSimulator(make_circuit(), ngspice_shared=ngspice_shared)
+        analyses = simulator.analyses(transient=(micro(1), milli(1)), dc=dict(Vinput=slice(0, 1, .5)))
+        self.assertEqual(list(analyses), ['transient', 'dc'])
+        self.assertEqual([command.split()[0] for command in ngspice_shared._ngspice_shared.commands],
+                         ['bg_tran', 'bg_dc'])
+
+        # the analyses run in the background thread, thus they can be halted
+        ngspice_shared = NgSpiceShared(60)
+        simulator = NgSpiceSharedCircuitSimulator(make_circuit(), ngspice_shared=ngspice_shared)
+        with self.assertRaises(SimulationTimeout):
+            simulator.analyses(transient=(micro(1), milli(1)), timeout=.1)
+        self.assertEqual(ngspice_shared._ngspice_shared.commands[-1], 'bg_halt')
+        self.assertFalse(ngspice_shared._ngspice_shared.ngSpice_running())
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,99 @@
+####################################################################################################
+#
+# PySpice - A Spice Package for Python
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+####################################################################################################
+
+import PySpice.Spice
+from PySpice.Spice.Netlist import Circuit
+from PySpice.Spice.Sweep import ParameterGrid, CircuitParameterSetter, sweep_control_commands
+from PySpice.Unit.Units import *
+
+####################################################################################################
+
+class TestSweep(unittest.TestCase):
+
+    ##############################################
+
+    def test_parameter_grid(self):
+
+        grid = ParameterGrid({'R1.resistance': (1, 2), 'gain': (3, 4, 5)})
+        self.assertEqual(grid.shape, (2, 3))
+        self.assertEqual(len(grid), 6)
+        points = list(grid)
+        self.assertEqual(dict(points[0]), {'R1.resistance': 1, 'gain': 3})
+        self.assertEqual(dict(points[1]), {'R1.resistance': 1, 'gain': 4})
+        self.assertEqual(dict(points[-1]), {'R1.resistance': 2, 'gain': 5})
+
+    ##############################################
+
+    def test_parameter_setter(self):
+
+        circuit = Circuit('test')
+        circuit.R(1, 'a', circuit.gnd, kilo(1))
+        circuit.parameter('gain', 1)
+        with CircuitParameterSetter(circuit) as setter:
+            setter.update({'R1.resistance': kilo(2), 'gain': 10, 'offset': 0})
+            self.assertEqual(str(circuit.R1), 'R1 a 0 2k')
+            self.assertIn('.param gain=10\n', str(circuit))
+            self.assertIn('.param offset=0\n', str(circuit))
+        self.assertEqual(str(circuit.R1), 'R1 a 0 1k')
+        self.assertEqual(circuit.parameters, {'gain': '1'})
+
+    ##############################################
+
+    def test_control_commands(self):
+
+        circuit = Circuit('test')
+        circuit.R(1, 'a', circuit.gnd, kilo(1))
+        circuit.parameter('gain', 1)
+        commands = sweep_control_commands(circuit,
+                                          {'R1.resistance': (kilo(1), kilo(2)), 'gain': (1, 10)},
+                                          'output.raw')
+        self.assertEqual(commands, [
+            'set appendwrite',
+            'foreach pyspice_sweep_0 1k 2k',
+            '  foreach pyspice_sweep_1 1 10',
+            '    alterparam gain = $pyspice_sweep_1',
+            '    reset',
+            '    alter R1 = $pyspice_sweep_0',
+            '    run',
+            '    write output.raw',
+            '    destroy all',
+            '  end',
+            'end',
+        ])
+        with self.assertRaises(NameError):
+            sweep_control_commands(circuit, {'offset': (1, 2)}, 'output.raw')
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -104,6 +104,18 @@ class TestUnits(unittest.TestCase):
 
     ##############################################
 
+    def test_parse_spice_number(self):
+
+        self.assertEqual(parse_spice_number('2.5n'), nano(2.5))
+        self.assertEqual(float(parse_spice_number('1Meg')), 1e6)
+        self.assertEqual(float(parse_spice_number('3M')), 3e-3)
+        self.assertEqual(float(parse_spice_number('10kOhm')), 1e4)
+        self.assertEqual(float(parse_spice_number('-1.5e-3')), -1.5e-3)
+        with self.assertRaises(ValueError):
+            parse_spice_number('1k2')
+
+    ##############################################
+
     def test_frequency(self):
 
         self.assertEqual(Frequency(50).period, 1/50.)